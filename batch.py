@@ -0,0 +1,224 @@
+""" Ce fichier contient le mode de génération des rapports par lots.
+
+Le fichier csv est chargé une seule fois, puis les rapports de toutes les
+régions et de toutes les dates demandées sont générés sans interaction.
+Avec plusieurs processus, les rapports passent par les étapes de
+pipeline.py : les vues de chaque rapport sont construites dans ce
+processus, les diagrammes sont générés par un groupe de processus qui ne
+reçoit que ces vues, puis les images sont encodées dans des threads.
+"""
+
+# Importations nécessaire pour le typing
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+# Importation des modules nécessaires à la gestion des fichiers
+import os
+import glob
+import time
+import argparse
+
+# Importation des module nécessaire à la gestion du temps
+import datetime
+
+from constants import REGIONS
+from table import Table
+from render import init_worker, render_diagrams
+from main import COLORS, load_database, build_views, report_date, compose_report
+
+if TYPE_CHECKING:
+    from PIL import Image
+    from composition import Encoder
+
+# Base de données utilisée pour la génération des rapports
+_DATABASE: Optional[Table] = None
+
+def find_file() -> str:
+    """Cherche le fichier csv dans le répertoire actuel sans interaction.
+    Si plusieurs fichiers correspondent, le plus récent est utilisé.
+
+    :return: Le chemin du fichier
+    :rtype: str
+    """
+    chemins = glob.glob("./vacsi-s-a-reg-*.csv")
+    if len(chemins) == 0:
+        raise FileNotFoundError("Aucun fichier vacsi-s-a-reg-*.csv n'a été trouvé dans le répertoire actuel.")
+    return max(chemins, key=os.path.getmtime)
+
+def parse_dates(dates: Optional[str], step: str) -> List[Optional[datetime.datetime]]:
+    """Convertit l'intervalle de dates indiqué en liste de dates
+
+    :param dates: Une date ou un intervalle au format AAAA-MM-JJ..AAAA-MM-JJ,
+    si None la date la plus récente est utilisée
+    :type dates: Optional[str]
+    :param step: L'écart entre deux dates, au format 7d (en jours)
+    :type step: str
+    :return: Les dates des rapports (None pour la date la plus récente)
+    :rtype: List[Optional[datetime.datetime]]
+    """
+    if dates is None:
+        return [None]
+    if ".." not in dates:
+        return [datetime.datetime.fromisoformat(dates)]
+    debut, fin = (datetime.datetime.fromisoformat(date) for date in dates.split(".."))
+    if not step.endswith("d") or not step[:-1].isdigit() or int(step[:-1]) <= 0:
+        raise ValueError(f"L'écart {step} est invalide, il doit être au format 7d.")
+    ecart = datetime.timedelta(days=int(step[:-1]))
+    output = []
+    while debut <= fin:
+        output.append(debut)
+        debut += ecart
+    return output
+
+def report_path(output: str, reg: str, date: Optional[datetime.datetime], extension: str = ".png") -> str:
+    """Retourne l'emplacement du rapport d'une région à une date"""
+    nom_date = date.strftime("%Y-%m-%d") if date is not None else "dernier"
+    return os.path.join(output, f"rapport_{reg}_{nom_date}{extension}")
+
+def init_batch_worker(database: Table, backend: Optional[str] = None):
+    """Initialise un processus de génération des rapports"""
+    global _DATABASE
+    init_worker(backend)
+    _DATABASE = database
+
+def render_report_image(reg: str, date: Optional[datetime.datetime]) -> "Image.Image":
+    """Génère l'image du rapport d'une région à une date, sans l'encoder
+
+    :param reg: La région du rapport
+    :type reg: str
+    :param date: La date du rapport, si None la date la plus récente est utilisée
+    :type date: Optional[datetime.datetime]
+    :return: L'image du rapport
+    :rtype: Image.Image
+    """
+    filtre = (None, date) if date is not None else None
+    views = build_views(_DATABASE, reg, filtre)
+    if len(views["fall"]) == 0:
+        raise ValueError("aucune donnée avant cette date")
+    # les diagrammes d'un rapport sont générés dans ce processus, le
+    # parallélisme se fait entre les rapports
+    diagrams = render_diagrams(views, processes=1)
+    return compose_report(diagrams, reg, report_date(filtre, views["fall"]))
+
+def run_batch(
+    database: Table,
+    regions: List[str],
+    dates: List[Optional[datetime.datetime]],
+    output: str,
+    processes: Optional[int] = None,
+    encoder: Optional["Encoder"] = None,
+) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """Génère les rapports de toutes les régions à toutes les dates
+
+    :param database: La base de données complète
+    :type database: Table
+    :param regions: Les codes des régions
+    :type regions: List[str]
+    :param dates: Les dates des rapports (None pour la date la plus récente)
+    :type dates: List[Optional[datetime.datetime]]
+    :param output: Le dossier où enregistrer les rapports
+    :type output: str
+    :param processes: Le nombre de processus, par défaut None (un par cœur)
+    :type processes: Optional[int], optional
+    :param encoder: Les paramètres d'encodage des rapports, par défaut None (png)
+    :type encoder: Optional[Encoder], optional
+    :raises ValueError: Si le fichier contient plusieurs lignes le même
+    jour pour une région et une classe d'âge (voir stats.check_days)
+    :return: Les emplacements des rapports générés, et les rapports qui
+    n'ont pas pu être générés avec la raison de l'erreur
+    :rtype: Tuple[List[str], List[Tuple[str, str]]]
+    """
+    from composition import Encoder, BackgroundWriter
+    from stats import as_of_cube
+    if encoder is None:
+        encoder = Encoder()
+    os.makedirs(output, exist_ok=True)
+    # le cube des valeurs à une date est construit (ou lu sur le disque)
+    # une seule fois, avant la création des processus qui le reçoivent
+    # (voir pipeline.ReportPipeline.run)
+    as_of_cube(database)
+    taches = [(reg, date, report_path(output, reg, date, encoder.extension)) for date in dates for reg in regions]
+    if processes is None:
+        processes = min(len(taches), os.cpu_count() or 1)
+
+    generes, erreurs = [], []
+    debut = time.perf_counter()
+    def progression():
+        # les rapports en erreur sont comptés comme terminés, comme dans ReportPipeline.run
+        debit = len(generes) / (time.perf_counter() - debut)
+        print(f"\rRapports générés : {len(generes) + len(erreurs)}/{len(taches)} ({debit:.2f} rapports/s)", end="", flush=True)
+
+    if processes <= 1:
+        # pas de parallélisme, on génère les rapports dans ce processus :
+        # chaque rapport est encodé dans un thread pendant que le suivant
+        # est généré
+        init_batch_worker(database)
+        en_cours = []
+        def attendre(future, chemin):
+            try:
+                future.result()
+                generes.append(chemin)
+            except Exception as e:
+                erreurs.append((chemin, str(e)))
+            progression()
+        with BackgroundWriter(encoder) as writer:
+            for reg, date, chemin in taches:
+                try:
+                    en_cours.append((writer.submit(render_report_image(reg, date), chemin), chemin))
+                except Exception as e:
+                    erreurs.append((chemin, str(e)))
+                    progression()
+                # on compte les rapports déjà enregistrés
+                while en_cours and en_cours[0][0].done():
+                    attendre(*en_cours.pop(0))
+            for future, chemin in en_cours:
+                attendre(future, chemin)
+    else:
+        # les étapes de chaque rapport (filtre, rendu et encodage) sont
+        # exécutées en même temps sur des rapports différents
+        from pipeline import ReportPipeline
+        def progression_pipeline(termines: int, total: int, debit: float):
+            print(f"\rRapports générés : {termines}/{total} ({debit:.2f} rapports/s)", end="", flush=True)
+        pipeline = ReportPipeline(database, encoder, processes)
+        generes, erreurs, debit = pipeline.run(taches, progression_pipeline)
+    print()
+    return generes, erreurs
+
+def run_batch_command(arguments: argparse.Namespace):
+    """Exécute la commande batch avec les arguments de la ligne de commande
+
+    :param arguments: Les arguments lus par main.parse_arguments
+    :type arguments: argparse.Namespace
+    """
+    chemin = arguments.file if arguments.file is not None else find_file()
+    print(f"Chargement du fichier {chemin}...", end=" ", flush=True)
+    database = load_database(chemin)
+    print(f"{COLORS['fg']['green']}Fait{COLORS['reset']}")
+
+    if arguments.regions == "all":
+        regions = [reg for reg in REGIONS if database.has_region(reg)]
+    else:
+        regions = arguments.regions.split(",")
+        for reg in regions:
+            if not database.has_region(reg) or reg not in REGIONS:
+                raise SystemExit(f"{COLORS['fg']['red']}La région {reg} est invalide.{COLORS['reset']}")
+    try:
+        dates = parse_dates(arguments.dates, arguments.step)
+    except ValueError as e:
+        raise SystemExit(f"{COLORS['fg']['red']}{e}{COLORS['reset']}")
+
+    from composition import encoder_from_arguments
+    try:
+        encoder = encoder_from_arguments(arguments)
+    except ValueError as e:
+        raise SystemExit(f"{COLORS['fg']['red']}{e}{COLORS['reset']}")
+
+    print(f"Génération de {len(regions) * len(dates)} rapports dans le dossier {arguments.output}...")
+    debut = time.perf_counter()
+    try:
+        generes, erreurs = run_batch(database, regions, dates, arguments.output, arguments.processes, encoder)
+    except ValueError as e:
+        raise SystemExit(f"{COLORS['fg']['red']}Le fichier {chemin} est invalide : {e}{COLORS['reset']}")
+    duree = time.perf_counter() - debut
+    for chemin, erreur in erreurs:
+        print(f"{COLORS['fg']['red']}Impossible de générer {chemin} : {erreur}{COLORS['reset']}")
+    print(f"{COLORS['fg']['green']}{len(generes)} rapports générés en {duree:.1f} s ({len(generes) / duree:.2f} rapports/s){COLORS['reset']}")
@@ -0,0 +1,79 @@
+""" Mesure le gain apporté par le cache des dates (table.parse_datetime
+et table.parse_day) par rapport à la conversion de chaque ligne avec
+fromisoformat, sur un fichier synthétique de la taille du fichier
+national.
+
+La conversion avec fromisoformat est déjà rapide, le cache évite surtout
+de créer un objet date par ligne : la mémoire utilisée par la colonne
+convertie est mesurée avec tracemalloc.
+"""
+
+# Importation des modules nécessaires à la mesure
+import csv
+import os
+import tempfile
+import time
+import tracemalloc
+
+# Importation des module nécessaire à la gestion du temps
+import datetime
+
+from synthetic import generate_file
+
+import table
+
+def read_rows(chemin: str):
+    """Lit toutes les lignes du fichier csv, sans les headers"""
+    with open(chemin, encoding="utf-8", newline="") as file:
+        reader = csv.reader(file, delimiter=";")
+        next(reader)
+        return list(reader)
+
+def mesure(fonction, rows, repetitions: int = 3):
+    """Retourne le meilleur temps d'exécution de la fonction sur les
+    lignes ainsi que la mémoire occupée par son résultat"""
+    meilleur = None
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction(rows)
+        duree = time.perf_counter() - debut
+        if meilleur is None or duree < meilleur:
+            meilleur = duree
+    tracemalloc.start()
+    resultat = fonction(rows)
+    memoire = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del resultat
+    return meilleur, memoire
+
+# Conversion vers des objets datetime.datetime (convert_database, filter_check)
+def datetime_sans_cache(rows):
+    return [datetime.datetime.fromisoformat(row[2]) for row in rows]
+
+def datetime_avec_cache(rows):
+    return [table.parse_datetime(row[2]) for row in rows]
+
+# Conversion vers des numéros de jour (chargement de la table)
+def jour_sans_cache(rows):
+    return [datetime.date.fromisoformat(row[2]).toordinal() for row in rows]
+
+def jour_avec_cache(rows):
+    return [table.parse_day(row[2]) for row in rows]
+
+def compare(nom: str, sans_cache, avec_cache, rows):
+    temps_sans_cache, memoire_sans_cache = mesure(sans_cache, rows)
+    temps_avec_cache, memoire_avec_cache = mesure(avec_cache, rows)
+    print(f"{nom} :")
+    print(f"  sans cache : {temps_sans_cache:.3f} s, {memoire_sans_cache / 1e6:.1f} Mo")
+    print(f"  avec cache : {temps_avec_cache:.3f} s, {memoire_avec_cache / 1e6:.1f} Mo")
+    print(f"  accélération : x{temps_sans_cache / temps_avec_cache:.2f}, mémoire : x{memoire_sans_cache / memoire_avec_cache:.2f}")
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "vacsi-s-a-reg-synthetique.csv")
+        generate_file(chemin)
+        rows = read_rows(chemin)
+
+    print(f"{len(rows)} lignes, {len(set(row[2] for row in rows))} dates différentes")
+    compare("Conversion en datetime", datetime_sans_cache, datetime_avec_cache, rows)
+    compare("Conversion en numéro de jour", jour_sans_cache, jour_avec_cache, rows)
@@ -0,0 +1,83 @@
+""" Compare l'ancienne exportation des diagrammes (enregistrement en png
+dans la mémoire puis relecture, sans fermer les figures) avec
+l'exportation directe des pixels de diagrams.export_plot_to_image.
+
+Chaque méthode est mesurée dans un processus séparé pour que le pic de
+mémoire (RSS) de l'une ne fausse pas la mesure de l'autre.
+"""
+
+# Importation des modules nécessaires à la mesure
+import io
+import os
+import sys
+import json
+import time
+import resource
+import tempfile
+import subprocess
+
+# on permet l'importation des fichiers du programme depuis ce dossier
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Nombre de rapports générés pour chaque méthode
+REPETITIONS = 10
+
+def export_png(fig=None):
+    """Ancienne version de export_plot_to_image"""
+    import matplotlib.pyplot as plt
+    from PIL import Image
+    buffer = io.BytesIO()
+    if fig is None:
+        plt.savefig(buffer, format='png')
+    else:
+        fig.savefig(buffer, format='png')
+    img = Image.open(buffer)
+    img.load() # la lecture de l'image est faite au moment du collage dans le programme
+    return img
+
+def mesure(methode: str, chemin: str) -> dict:
+    """Génère les diagrammes avec la méthode indiquée et retourne le
+    temps moyen par diagramme et le pic de mémoire du processus"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import diagrams
+    from main import load_file, build_views
+
+    if methode == "png":
+        diagrams.export_plot_to_image = export_png
+
+    views = build_views(load_file(chemin), "11", None)
+    temps = {diagram.__name__: 0. for diagram, view in diagrams.DIAGRAMS}
+    for _ in range(REPETITIONS):
+        for diagram, view in diagrams.DIAGRAMS:
+            debut = time.perf_counter()
+            diagram(views[view])
+            temps[diagram.__name__] += time.perf_counter() - debut
+    return {
+        "temps": {nom: duree / REPETITIONS for nom, duree in temps.items()},
+        # ru_maxrss est en kilo-octets sous linux
+        "rss_max": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3: # exécution d'une mesure dans un processus séparé
+        print(json.dumps(mesure(sys.argv[1], sys.argv[2])))
+        sys.exit()
+
+    from synthetic import generate_file
+
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "vacsi-s-a-reg-synthetique.csv")
+        generate_file(chemin)
+        resultats = {}
+        for methode in ("png", "rgba"):
+            sortie = subprocess.run(
+                [sys.executable, __file__, methode, chemin],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            resultats[methode] = json.loads(sortie.splitlines()[-1])
+
+    print(f"{'diagramme':<16}{'png (ms)':>10}{'rgba (ms)':>11}")
+    for nom in resultats["png"]["temps"]:
+        print(f"{nom:<16}{resultats['png']['temps'][nom] * 1000:>10.1f}{resultats['rgba']['temps'][nom] * 1000:>11.1f}")
+    print(f"{'pic RSS (Mo)':<16}{resultats['png']['rss_max'] / 1e6:>10.1f}{resultats['rgba']['rss_max'] / 1e6:>11.1f}")
@@ -0,0 +1,209 @@
+""" Mesure chaque étape de la génération d'un rapport (lecture du
+fichier, filtres, conversion, chaque diagramme et assemblage de l'image)
+sur des fichiers synthétiques de plusieurs tailles : 1, 10 ou 100 fois
+le nombre de jours du fichier national.
+
+Pour chaque étape, le temps d'exécution et le pic de mémoire (mesuré
+avec tracemalloc lors d'une première exécution, tracemalloc ralentissant
+le programme) sont enregistrés dans un fichier json. Ce fichier peut être
+comparé à celui d'une exécution précédente avec l'option --compare : les
+étapes devenues plus lentes ou plus gourmandes que la tolérance sont
+signalées et le programme s'arrête avec le code 1.
+
+Chaque taille est mesurée dans un processus séparé pour que la mémoire
+d'une mesure ne fausse pas la suivante. Le rapport est assemblé avec la
+police arial.ttf, qui doit se trouver dans le dossier courant.
+"""
+
+# Importations nécessaire pour le typing
+from typing import Any, Callable, Dict, List, Tuple
+
+# Importation des modules nécessaires à la mesure
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+
+# Importation des module nécessaire à la gestion du temps
+import datetime
+
+# on permet l'importation des fichiers du programme depuis ce dossier
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Région utilisée pour les rapports mesurés
+REGION = "11"
+# Tailles mesurées par défaut (multiplicateurs du nombre de jours)
+ECHELLES = [1, 10]
+# Augmentation relative au-delà de laquelle une étape est signalée
+TOLERANCE = 0.2
+# Durée en dessous de laquelle une étape n'est pas comparée (en secondes),
+# les mesures trop courtes variant trop d'une exécution à l'autre
+DUREE_MIN = 0.005
+# Pic de mémoire en dessous duquel une étape n'est pas comparée (en octets)
+MEMOIRE_MIN = 1 << 20
+
+def mesure(fonction: Callable[[], Any]) -> Tuple[Any, Dict[str, float]]:
+    """Exécute la fonction deux fois : une fois pour mesurer le pic de
+    mémoire, puis une fois pour mesurer le temps (la première exécution
+    charge les modules et les polices utilisés, qui ne sont donc pas
+    comptés dans le temps)
+
+    :param fonction: L'étape à mesurer, sans paramètre
+    :type fonction: Callable[[], Any]
+    :return: Le résultat de la fonction et la mesure (temps en secondes
+    et pic de mémoire en octets)
+    :rtype: Tuple[Any, Dict[str, float]]
+    """
+    tracemalloc.start()
+    resultat = fonction()
+    memoire = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del resultat
+
+    debut = time.perf_counter()
+    resultat = fonction()
+    temps = time.perf_counter() - debut
+    return resultat, {"temps": temps, "memoire": memoire}
+
+def run_phases(chemin: str, backend: str) -> Dict[str, Any]:
+    """Génère le rapport de la région REGION à partir du fichier en
+    mesurant chaque étape
+
+    :param chemin: L'emplacement du fichier csv
+    :type chemin: str
+    :param backend: Le moteur de dessin des diagrammes (voir render.BACKENDS)
+    :type backend: str
+    :return: Le nombre de lignes du fichier, la mesure de chaque étape et
+    le pic de mémoire du processus
+    :rtype: Dict[str, Any]
+    """
+    from main import load_file, apply_filter, convert_database, compose_report, report_date
+    from render import get_diagrams
+
+    diagrams = get_diagrams(backend)
+    phases = {}
+    database, phases["load_file"] = mesure(lambda: load_file(chemin))
+    views, phases["apply_filter"] = mesure(lambda: {
+        "fall": apply_filter(database, REGION, None, False),
+        "fage": apply_filter(database, REGION, None, True),
+        "freg": apply_filter(database, None, None, False),
+    })
+    views, phases["convert_database"] = mesure(lambda: {
+        name: convert_database(view) for name, view in views.items()
+    })
+    images = []
+    for diagram, view in diagrams:
+        image, phases[diagram.__name__] = mesure(lambda: diagram(views[view]))
+        images.append(image)
+    try:
+        image, phases["compose_report"] = mesure(
+            lambda: compose_report(images, REGION, report_date(None, views["fall"]))
+        )
+    except OSError as e: # la police arial.ttf n'a pas été trouvée
+        print(f"compose_report n'a pas pu être mesuré : {e}", file=sys.stderr)
+    return {
+        "lignes": len(database),
+        "phases": phases,
+        # ru_maxrss est en kilo-octets sous linux
+        "rss_max": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+def compare(actuel: Dict[str, Any], ancien: Dict[str, Any], tolerance: float) -> List[str]:
+    """Compare deux fichiers de résultats et retourne les régressions
+
+    :param actuel: Les résultats de cette exécution
+    :type actuel: Dict[str, Any]
+    :param ancien: Les résultats d'une exécution précédente
+    :type ancien: Dict[str, Any]
+    :param tolerance: L'augmentation relative tolérée, par exemple 0.2 pour 20%
+    :type tolerance: float
+    :return: La description de chaque régression
+    :rtype: List[str]
+    """
+    regressions = []
+    for echelle, resultat in actuel["echelles"].items():
+        precedent = ancien["echelles"].get(echelle)
+        if precedent is None: # taille non mesurée lors de l'exécution précédente
+            continue
+        for phase, valeurs in resultat["phases"].items():
+            anciennes = precedent["phases"].get(phase)
+            if anciennes is None:
+                continue
+            for grandeur, minimum, unite, facteur in (
+                ("temps", DUREE_MIN, "ms", 1000),
+                ("memoire", MEMOIRE_MIN, "Mo", 1e-6),
+            ):
+                if anciennes[grandeur] < minimum:
+                    continue
+                if valeurs[grandeur] > anciennes[grandeur] * (1 + tolerance):
+                    regressions.append(
+                        f"x{echelle} {phase} : {grandeur} {anciennes[grandeur] * facteur:.1f} -> "
+                        f"{valeurs[grandeur] * facteur:.1f} {unite} "
+                        f"(+{(valeurs[grandeur] / anciennes[grandeur] - 1) * 100:.0f}%)"
+                    )
+    return regressions
+
+def print_results(resultats: Dict[str, Any]):
+    """Affiche les mesures de chaque taille"""
+    for echelle, resultat in resultats["echelles"].items():
+        print(f"x{echelle} : {resultat['lignes']} lignes, pic RSS {resultat['rss_max'] / 1e6:.1f} Mo")
+        print(f"  {'étape':<20}{'temps (ms)':>12}{'mémoire (Mo)':>14}")
+        for phase, valeurs in resultat["phases"].items():
+            print(f"  {phase:<20}{valeurs['temps'] * 1000:>12.1f}{valeurs['memoire'] / 1e6:>14.1f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "mesure": # exécution d'une mesure dans un processus séparé
+        print(json.dumps(run_phases(sys.argv[2], sys.argv[3])))
+        sys.exit()
+
+    from synthetic import generate_file, NB_JOURS_NATIONAL
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--echelles", type=int, nargs="+", default=ECHELLES, help=f"les tailles mesurées, en multiples du fichier national (par défaut, {' '.join(map(str, ECHELLES))})")
+    parser.add_argument("--jours", type=int, default=NB_JOURS_NATIONAL, help=f"le nombre de jours à l'échelle 1 (par défaut, {NB_JOURS_NATIONAL})")
+    parser.add_argument("--backend", default="matplotlib", help="le moteur de dessin des diagrammes (par défaut, matplotlib)")
+    parser.add_argument("--output", default="bench_pipeline.json", help="le fichier json des résultats (par défaut, bench_pipeline.json)")
+    parser.add_argument("--compare", default=None, help="le fichier json d'une exécution précédente à comparer")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help=f"l'augmentation relative tolérée par --compare (par défaut, {TOLERANCE})")
+    arguments = parser.parse_args()
+
+    resultats = {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "backend": arguments.backend,
+        "jours": arguments.jours,
+        "echelles": {},
+    }
+    with tempfile.TemporaryDirectory() as dossier:
+        for echelle in arguments.echelles:
+            chemin = os.path.join(dossier, f"vacsi-s-a-reg-x{echelle}.csv")
+            print(f"Génération du fichier x{echelle}...", file=sys.stderr)
+            generate_file(chemin, arguments.jours, echelle)
+            sortie = subprocess.run(
+                [sys.executable, __file__, "mesure", chemin, arguments.backend],
+                check=True, stdout=subprocess.PIPE, text=True,
+            ).stdout
+            resultats["echelles"][str(echelle)] = json.loads(sortie.splitlines()[-1])
+            os.remove(chemin)
+
+    with open(arguments.output, "w", encoding="utf-8") as file:
+        json.dump(resultats, file, indent=2)
+    print_results(resultats)
+    print(f"Résultats enregistrés dans {arguments.output}")
+
+    if arguments.compare is not None:
+        with open(arguments.compare, encoding="utf-8") as file:
+            ancien = json.load(file)
+        regressions = compare(resultats, ancien, arguments.tolerance)
+        for regression in regressions:
+            print(f"Régression : {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"Aucune régression par rapport à {arguments.compare}")
@@ -0,0 +1,91 @@
+""" Mesure le temps de démarrage du programme avec python -X importtime,
+et vérifie que les modules lourds (dessin, calcul, téléchargement,
+processus) ne sont plus importés au démarrage : ils ne sont chargés qu'à
+leur première utilisation.
+
+Le programme s'arrête avec le code 1 si le temps d'importation de main
+dépasse le seuil, ou si un module lourd est importé, ce qui permet de
+l'utiliser pour détecter une régression.
+"""
+
+# Importations nécessaire pour le typing
+from typing import Dict, List, Tuple
+
+# Importation des modules nécessaires à la mesure
+import os
+import sys
+import argparse
+import subprocess
+
+# Dossier du programme, depuis lequel main est importé
+DOSSIER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Nombre de mesures, la meilleure est gardée
+REPETITIONS = 5
+# Temps d'importation maximal de main (en millisecondes)
+SEUIL = 150
+# Modules qui ne doivent pas être importés au démarrage
+MODULES_LOURDS = ("matplotlib", "PIL", "numpy", "downloader", "concurrent.futures.process")
+
+def importtime(module: str = "main") -> Dict[str, Tuple[int, int]]:
+    """Importe le module dans un nouveau processus avec python -X importtime
+
+    :param module: Le module à importer, par défaut "main"
+    :type module: str, optional
+    :return: Pour chaque module importé, le temps propre et le temps
+    cumulé (en microsecondes)
+    :rtype: Dict[str, Tuple[int, int]]
+    """
+    sortie = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=DOSSIER, check=True, capture_output=True, text=True,
+    ).stderr
+    output = {}
+    for ligne in sortie.splitlines():
+        # format : "import time:      self |  cumulative | module"
+        if not ligne.startswith("import time:") or "|" not in ligne:
+            continue
+        propre, cumule, nom = ligne[len("import time:"):].split("|")
+        if not propre.strip().isdigit(): # ligne des titres
+            continue
+        output[nom.strip()] = (int(propre), int(cumule))
+    return output
+
+def heavy_modules(modules: Dict[str, Tuple[int, int]]) -> List[str]:
+    """Retourne les modules lourds importés"""
+    return sorted(
+        nom for nom in modules
+        if any(nom == lourd or nom.startswith(lourd + ".") for lourd in MODULES_LOURDS)
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seuil", type=float, default=SEUIL, help=f"le temps d'importation maximal de main en ms (par défaut, {SEUIL})")
+    parser.add_argument("--repetitions", type=int, default=REPETITIONS, help=f"le nombre de mesures (par défaut, {REPETITIONS})")
+    parser.add_argument("--top", type=int, default=10, help="le nombre de modules les plus lents affichés (par défaut, 10)")
+    arguments = parser.parse_args()
+
+    # la première mesure remplit les fichiers .pyc, elle n'est pas gardée
+    importtime()
+    meilleur = None
+    for _ in range(arguments.repetitions):
+        modules = importtime()
+        if meilleur is None or modules["main"][1] < meilleur["main"][1]:
+            meilleur = modules
+
+    total = meilleur["main"][1] / 1000
+    print(f"{len(meilleur)} modules importés, import main : {total:.1f} ms (seuil : {arguments.seuil:.0f} ms)")
+    print(f"{'module':<40}{'propre (ms)':>12}{'cumulé (ms)':>12}")
+    lents = sorted(meilleur.items(), key=lambda item: item[1][0], reverse=True)
+    for nom, (propre, cumule) in lents[:arguments.top]:
+        print(f"{nom:<40}{propre / 1000:>12.1f}{cumule / 1000:>12.1f}")
+
+    erreurs = []
+    if total > arguments.seuil:
+        erreurs.append(f"l'importation de main dépasse le seuil ({total:.1f} ms > {arguments.seuil:.0f} ms)")
+    lourds = heavy_modules(meilleur)
+    if lourds:
+        erreurs.append(f"modules lourds importés au démarrage : {', '.join(lourds)}")
+    for erreur in erreurs:
+        print(erreur)
+    sys.exit(1 if erreurs else 0)
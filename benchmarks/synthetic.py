@@ -0,0 +1,96 @@
+""" Ce fichier permet de générer des fichiers vacsi-s-a-reg synthétiques
+pour mesurer les performances du programme sans télécharger le vrai
+fichier. Les fichiers générés ont les mêmes colonnes que le vrai fichier.
+"""
+
+# Importations nécessaire pour le typing
+from typing import List, Optional
+
+# Importation des modules nécessaires à l'écriture du fichier
+import csv
+import os
+import sys
+
+# Importation des module nécessaire à la gestion du temps
+import datetime
+
+# on permet l'importation des fichiers du programme depuis ce dossier
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from constants import AGES, REGIONS
+
+# Date de début du vrai fichier
+PREMIER_JOUR = datetime.date(2020, 12, 27)
+# Nombre de jours dans le fichier national complet
+NB_JOURS_NATIONAL = 730
+
+# Les classes d'âge du fichier : la classe 0 regroupe tous les âges
+CLASSES_AGE = ["0"] + [code for code, label in AGES]
+
+def headers() -> List[str]:
+    """Retourne les noms des colonnes du fichier vacsi-s-a-reg"""
+    output = ["reg", "clage_vacsi", "jour"]
+    for sexe in ("h", "f", "e"): # hommes, femmes, ensemble
+        output += [
+            f"n_dose1_{sexe}", f"n_complet_{sexe}", f"n_rappel_{sexe}", f"n_2_rappel_{sexe}",
+            f"n_cum_dose1_{sexe}", f"n_cum_complet_{sexe}", f"n_cum_rappel_{sexe}", f"n_cum_2_rappel_{sexe}",
+            f"couv_dose1_{sexe}", f"couv_complet_{sexe}", f"couv_rappel_{sexe}", f"couv_2_rappel_{sexe}",
+        ]
+    return output
+
+def generate_row(reg: str, age: str, jour: int, nb_jours: int) -> List[str]:
+    """Génère une ligne plausible : la couverture augmente avec le temps
+
+    :param reg: Le code de la région
+    :type reg: str
+    :param age: Le code de la classe d'âge
+    :type age: str
+    :param jour: L'indice du jour depuis le début du fichier
+    :type jour: int
+    :param nb_jours: Le nombre total de jours du fichier
+    :type nb_jours: int
+    :return: La ligne, sous forme de texte
+    :rtype: List[str]
+    """
+    avancement = (jour + 1) / nb_jours
+    # on décale un peu chaque région et chaque classe d'âge pour avoir des valeurs différentes
+    decalage = (int(reg) % 7 + len(age)) / 100
+    row = [reg, age, (PREMIER_JOUR + datetime.timedelta(days=jour)).isoformat()]
+    for sexe in range(3):
+        couv = [
+            min(95., 95 * avancement + decalage + sexe),
+            min(90., 90 * avancement ** 2 + decalage),
+            min(70., 70 * avancement ** 3),
+            min(20., 20 * avancement ** 4),
+        ]
+        row += [str(int(100 * avancement))] * 4 # vaccinations du jour
+        row += [str(int(10000 * value)) for value in couv] # vaccinations cumulées
+        row += [f"{value:.1f}" for value in couv] # couverture vaccinale
+    return row
+
+def generate_file(chemin: str, nb_jours: int = NB_JOURS_NATIONAL, echelle: int = 1):
+    """Génère un fichier vacsi-s-a-reg synthétique contenant toutes les
+    régions et toutes les classes d'âge. Le fichier est trié par région,
+    classe d'âge puis date, comme le vrai fichier.
+
+    :param chemin: L'emplacement du fichier à créer
+    :type chemin: str
+    :param nb_jours: Le nombre de jours à l'échelle 1, par défaut NB_JOURS_NATIONAL
+    :type nb_jours: int, optional
+    :param echelle: Le multiplicateur du nombre de jours, par défaut 1
+    :type echelle: int, optional
+    """
+    nb_jours *= echelle
+    with open(chemin, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file, delimiter=";")
+        writer.writerow(headers())
+        for reg in REGIONS:
+            for age in CLASSES_AGE:
+                for jour in range(nb_jours):
+                    writer.writerow(generate_row(reg, age, jour, nb_jours))
+
+if __name__ == "__main__":
+    chemin = sys.argv[1] if len(sys.argv) > 1 else "vacsi-s-a-reg-synthetique.csv"
+    echelle = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    generate_file(chemin, echelle=echelle)
+    print(f"Fichier {chemin} généré.")
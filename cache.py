@@ -0,0 +1,418 @@
+""" Ce fichier gère le cache de la base de données sur le disque.
+
+La table lue dans un fichier csv est enregistrée dans un fichier binaire
+placé à côté (``vacsi-s-a-reg-XXX.csv.cache``). Les colonnes y sont
+stockées telles quelles, le fichier est ensuite ouvert avec mmap et les
+colonnes sont lues directement depuis le disque sans aucune conversion.
+
+Le cache est associé à la taille, à la date de modification et à
+l'empreinte sha256 du fichier csv, il est ignoré si le fichier change.
+Un cache qui ne correspond plus à son fichier peut cependant servir de
+base à une mise à jour incrémentale (voir load_base et
+main.load_database) : chaque nouvelle version du fichier ne fait
+normalement qu'ajouter des dates, seules les lignes plus récentes que le
+cache ont donc besoin d'être lues. Le cache enregistre pour cela
+l'empreinte sha256 du contenu du fichier d'où il provient : le fichier
+est tout de même relu entièrement si ses lignes jusqu'à la dernière date
+du cache ne sont plus exactement celles-ci (voir main.update_database).
+
+Le cube des valeurs à une date (voir stats.AsOfCube) est lui aussi
+enregistré à côté du fichier csv (``vacsi-s-a-reg-XXX.csv.cube``), avec
+l'empreinte du fichier d'où il a été calculé.
+"""
+
+# Importations nécessaire pour le typing
+from typing import Any, Dict, Optional, Tuple
+
+# Importation des modules nécessaires à la lecture et à l'écriture du cache
+import os
+import glob
+import json
+import mmap
+import shutil
+import struct
+import hashlib
+import threading
+import contextlib
+
+# Importation du module des tableaux typés
+from array import array
+
+from table import Table
+
+# Début de chaque fichier de cache, à changer si le format change
+MAGIC = b"VACSICACHE1\n"
+EXTENSION = ".cache"
+# Les colonnes sont alignées sur 8 octets dans le fichier
+ALIGNEMENT = 8
+# Taille des blocs lus pour calculer l'empreinte du fichier csv
+TAILLE_BLOC = 1 << 20
+# Extension du fichier contenant les informations du serveur sur un
+# fichier téléchargé (voir downloader.py)
+EXTENSION_INFOS = ".http.json"
+# Début et extension des fichiers du cube des valeurs à une date
+MAGIC_CUBE = b"VACSICUBE1\n"
+EXTENSION_CUBE = ".cube"
+
+def cache_path(chemin: str) -> str:
+    """Retourne l'emplacement du cache associé au fichier csv"""
+    return chemin + EXTENSION
+
+def server_checksum(chemin: str) -> Optional[str]:
+    """Retourne l'empreinte du fichier indiquée par le serveur au moment
+    du téléchargement, si le fichier n'a pas été modifié depuis
+
+    :param chemin: L'emplacement du fichier
+    :type chemin: str
+    :return: L'empreinte, au format "sha1:...", ou None si elle n'est pas connue
+    :rtype: Optional[str]
+    """
+    try:
+        with open(chemin + EXTENSION_INFOS, encoding="utf-8") as file:
+            infos = json.load(file)
+        checksum = infos.get("checksum") or {}
+        if not infos.get("complet") or not checksum.get("type") or not checksum.get("value"):
+            return None
+        source = _source_key(chemin)
+        if infos.get("taille") != source["taille"] or infos.get("mtime") != source["mtime"]:
+            return None # le fichier a été modifié depuis le téléchargement
+        return f"{checksum['type']}:{checksum['value']}"
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def file_hash(chemin: str) -> str:
+    """Calcule l'empreinte du contenu d'un fichier. Si le fichier a été
+    téléchargé et que le serveur a indiqué son empreinte, celle-ci est
+    utilisée sans lire le fichier.
+
+    :param chemin: L'emplacement du fichier
+    :type chemin: str
+    :return: L'empreinte, au format "sha256:..." (ou celui du serveur, "sha1:...")
+    :rtype: str
+    """
+    empreinte = server_checksum(chemin)
+    if empreinte is not None:
+        return empreinte
+    return content_hash(chemin)
+
+def content_hash(chemin: str) -> str:
+    """Calcule l'empreinte sha256 du contenu d'un fichier, en le lisant
+
+    :param chemin: L'emplacement du fichier
+    :type chemin: str
+    :return: L'empreinte, au format "sha256:..."
+    :rtype: str
+    """
+    empreinte = hashlib.sha256()
+    with open(chemin, "rb") as file:
+        bloc = file.read(TAILLE_BLOC)
+        while bloc:
+            empreinte.update(bloc)
+            bloc = file.read(TAILLE_BLOC)
+    return "sha256:" + empreinte.hexdigest()
+
+def cube_path(chemin: str) -> str:
+    """Retourne l'emplacement du cube associé au fichier csv"""
+    return chemin + EXTENSION_CUBE
+
+def invalidate(chemin: str):
+    """Supprime le cache et le cube associés au fichier csv s'ils existent
+
+    :param chemin: L'emplacement du fichier csv
+    :type chemin: str
+    """
+    for chemin_cache in (cache_path(chemin), cube_path(chemin)):
+        try:
+            os.remove(chemin_cache)
+        except FileNotFoundError:
+            pass
+
+def _read_header(file, magic: bytes = MAGIC) -> Optional[Dict[str, Any]]:
+    """Lit l'en-tête d'un fichier de cache, ou retourne None s'il est invalide"""
+    if file.read(len(magic)) != magic:
+        return None
+    taille = file.read(8)
+    if len(taille) != 8:
+        return None
+    (taille,) = struct.unpack("<Q", taille)
+    try:
+        return json.loads(file.read(taille).decode("utf-8"))
+    except ValueError:
+        return None
+
+def _write_header(file, header: Dict[str, Any], magic: bytes = MAGIC):
+    """Écrit le début d'un fichier de cache : magic puis l'en-tête en
+    json, complété par des espaces pour que les données qui suivent
+    commencent sur une position alignée (le json ignore les espaces à la fin)"""
+    header = json.dumps(header).encode("utf-8")
+    remplissage = -(len(magic) + 8 + len(header)) % ALIGNEMENT
+    file.write(magic)
+    file.write(struct.pack("<Q", len(header) + remplissage))
+    file.write(header)
+    file.write(b" " * remplissage)
+
+@contextlib.contextmanager
+def _replace(chemin: str):
+    """Écrit un fichier à côté puis le renomme en chemin une fois le bloc
+    du with terminé : un fichier à moitié écrit n'est donc jamais lu. Le
+    nom du fichier temporaire contient le processus et le thread, plusieurs
+    processus peuvent donc écrire le même fichier en même temps (le dernier
+    renommé remplace les autres). Il est supprimé si l'écriture échoue.
+
+    :param chemin: L'emplacement du fichier final
+    :type chemin: str
+    :return: Le fichier temporaire ouvert en écriture binaire
+    :rtype: Iterator[BinaryIO]
+    """
+    temporaire = f"{chemin}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        with open(temporaire, "wb") as file:
+            yield file
+        os.replace(temporaire, chemin)
+    except BaseException:
+        try:
+            os.remove(temporaire)
+        except OSError:
+            pass
+        raise
+
+def _source_key(chemin: str) -> Dict[str, Any]:
+    """Retourne la taille et la date de modification du fichier csv"""
+    stat = os.stat(chemin)
+    return {"taille": stat.st_size, "mtime": stat.st_mtime_ns}
+
+def save(chemin: str, table: Table, empreinte: Optional[str] = None):
+    """Enregistre le cache d'une table lue depuis un fichier csv.
+    Le fichier est d'abord écrit à côté puis renommé, un cache à moitié
+    écrit n'est donc jamais lu.
+
+    :param chemin: L'emplacement du fichier csv d'où provient la table
+    :type chemin: str
+    :param table: La table à enregistrer
+    :type table: Table
+    :param empreinte: L'empreinte du fichier csv si elle est déjà connue, par défaut None
+    :type empreinte: Optional[str], optional
+    """
+    if empreinte is None:
+        empreinte = file_hash(chemin)
+    table.empreinte = empreinte
+    # l'empreinte du serveur n'est pas forcément un sha256 du contenu,
+    # celui-ci est nécessaire pour la mise à jour incrémentale
+    contenu = empreinte if empreinte.startswith("sha256:") else content_hash(chemin)
+
+    colonnes = table.columns()
+    # on calcule la position de chaque colonne dans la partie données
+    description = []
+    position = 0
+    for nom, colonne in colonnes.items():
+        taille = len(colonne) * colonne.itemsize
+        description.append({
+            "nom": nom,
+            "type": colonne.typecode if isinstance(colonne, array) else colonne.format,
+            "taille_element": colonne.itemsize,
+            "position": position,
+            "taille": taille,
+        })
+        position += taille + (-taille % ALIGNEMENT)
+
+    with _replace(cache_path(chemin)) as file:
+        _write_header(file, {
+            **_source_key(chemin),
+            "empreinte": empreinte,
+            "contenu": contenu,
+            "nb_lignes": len(table),
+            "dernier_jour": max(table.jour) if len(table) > 0 else None,
+            "nb_colonnes": table.nb_colonnes,
+            "regions": table.regions,
+            "ages": table.ages,
+            "colonnes": description,
+        })
+        for colonne in colonnes.values():
+            file.write(colonne)
+            file.write(b"\0" * (-len(colonne) * colonne.itemsize % ALIGNEMENT))
+
+def _open(chemin_cache: str, chemin: Optional[str] = None) -> Optional[Tuple[Dict[str, Any], Table]]:
+    """Ouvre un fichier de cache et retourne son en-tête et sa table
+
+    :param chemin_cache: L'emplacement du fichier de cache
+    :type chemin_cache: str
+    :param chemin: L'emplacement du fichier csv dont le cache doit
+    correspondre, si None le cache est ouvert sans vérification, par défaut None
+    :type chemin: Optional[str], optional
+    :return: L'en-tête et la table, ou None si le cache est invalide
+    :rtype: Optional[Tuple[Dict[str, Any], Table]]
+    """
+    try:
+        file = open(chemin_cache, "rb")
+    except FileNotFoundError:
+        return None
+
+    with file:
+        header = _read_header(file)
+        if header is None:
+            return None
+        debut = file.tell()
+
+        if chemin is not None:
+            source = _source_key(chemin)
+            if header["taille"] != source["taille"]:
+                return None
+            if header["mtime"] != source["mtime"]:
+                # le fichier a été modifié, on vérifie si le contenu a changé
+                if file_hash(chemin) != header["empreinte"]:
+                    return None
+                # le contenu est le même : on note la nouvelle date de
+                # modification pour ne pas recalculer l'empreinte la
+                # prochaine fois. Les données sont recopiées telles quelles.
+                header["mtime"] = source["mtime"]
+                file.seek(debut)
+                try:
+                    with _replace(chemin_cache) as copie:
+                        _write_header(copie, header)
+                        shutil.copyfileobj(file, copie)
+                except OSError: # le dossier n'est peut être pas accessible en écriture
+                    pass
+
+        # les tailles des types peuvent changer d'un système à l'autre
+        for description in header["colonnes"]:
+            if array(description["type"]).itemsize != description["taille_element"]:
+                return None
+
+        if header["nb_lignes"] == 0:
+            donnees = memoryview(b"")
+        else:
+            # le fichier reste ouvert tant que les colonnes sont utilisées
+            donnees = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    table = Table(header["nb_colonnes"], header["regions"], header["ages"])
+    colonnes = {}
+    for description in header["colonnes"]:
+        position = debut + description["position"]
+        colonne = donnees[position:position + description["taille"]]
+        colonnes[description["nom"]] = colonne.cast("B").cast(description["type"])
+    table.set_columns(colonnes)
+    table.empreinte = header["empreinte"]
+    return header, table
+
+def load(chemin: str) -> Optional[Table]:
+    """Charge la table depuis le cache associé au fichier csv.
+
+    Si la taille et la date de modification du fichier csv n'ont pas
+    changé, le cache est utilisé directement. Si seule la date de
+    modification a changé (fichier téléchargé à nouveau par exemple),
+    l'empreinte du fichier est recalculée pour vérifier le contenu.
+
+    :param chemin: L'emplacement du fichier csv
+    :type chemin: str
+    :return: La table, dont les colonnes sont lues depuis le disque, ou
+    None si le cache n'existe pas ou ne correspond plus au fichier
+    :rtype: Optional[Table]
+    """
+    ouvert = _open(cache_path(chemin), chemin)
+    if ouvert is None:
+        return None
+    return ouvert[1]
+
+def load_base(chemin: str, jour_max: int) -> Optional[Tuple[Table, str]]:
+    """Cherche un ancien cache pouvant servir de base à la mise à jour
+    incrémentale du fichier csv : l'ancien cache du même fichier, ou le
+    cache d'un autre fichier vacsi-s-a-reg du même dossier (même si ce
+    fichier a été supprimé depuis). Parmi les caches qui ne vont pas
+    au-delà de la dernière date du fichier, celui contenant la date la
+    plus récente est choisi.
+
+    :param chemin: L'emplacement du nouveau fichier csv
+    :type chemin: str
+    :param jour_max: Le numéro du dernier jour du fichier csv, les
+    caches plus récents proviennent d'un autre fichier et sont ignorés
+    :type jour_max: int
+    :return: La table de l'ancien cache et l'empreinte sha256 du contenu
+    du fichier d'où elle provient, ou None si aucun cache n'a été trouvé
+    :rtype: Optional[Tuple[Table, str]]
+    """
+    dossier = os.path.dirname(chemin)
+    candidats = set(glob.glob(os.path.join(dossier, "vacsi-s-a-reg-*.csv" + EXTENSION)))
+    candidats.add(cache_path(chemin))
+
+    meilleur = None
+    for chemin_cache in candidats:
+        ouvert = _open(chemin_cache)
+        if ouvert is None or ouvert[0].get("dernier_jour") is None:
+            continue
+        if ouvert[0].get("contenu") is None: # cache enregistré par une ancienne version
+            continue
+        if ouvert[0]["dernier_jour"] > jour_max:
+            continue
+        if meilleur is None or ouvert[0]["dernier_jour"] > meilleur[0]["dernier_jour"]:
+            meilleur = ouvert
+    if meilleur is None:
+        return None
+    return meilleur[1], meilleur[0]["contenu"]
+
+def save_cube(chemin: str, header: Dict[str, Any], blocs: Dict[str, memoryview]):
+    """Enregistre le cube des valeurs à une date calculé depuis un
+    fichier csv. Comme pour save, le fichier est écrit à côté puis renommé.
+
+    :param chemin: L'emplacement du fichier csv d'où provient le cube
+    :type chemin: str
+    :param header: Les informations du cube, qui doivent contenir
+    l'empreinte du fichier csv
+    :type header: Dict[str, Any]
+    :param blocs: Les tableaux du cube, avec leur nom
+    :type blocs: Dict[str, memoryview]
+    """
+    description = []
+    position = 0
+    for nom, bloc in blocs.items():
+        taille = bloc.nbytes
+        description.append({"nom": nom, "position": position, "taille": taille})
+        position += taille + (-taille % ALIGNEMENT)
+    with _replace(cube_path(chemin)) as file:
+        _write_header(file, {**header, "blocs": description}, MAGIC_CUBE)
+        for bloc in blocs.values():
+            file.write(bloc)
+            file.write(b"\0" * (-bloc.nbytes % ALIGNEMENT))
+
+def load_cube(chemin: str, empreinte: str) -> Optional[Tuple[Dict[str, Any], Dict[str, memoryview]]]:
+    """Ouvre le cube associé au fichier csv avec mmap
+
+    :param chemin: L'emplacement du fichier csv
+    :type chemin: str
+    :param empreinte: L'empreinte du fichier csv chargé
+    :type empreinte: str
+    :return: Les informations du cube et ses tableaux (en octets), ou
+    None si le cube n'existe pas ou provient d'un autre fichier
+    :rtype: Optional[Tuple[Dict[str, Any], Dict[str, memoryview]]]
+    """
+    try:
+        file = open(cube_path(chemin), "rb")
+    except FileNotFoundError:
+        return None
+    with file:
+        header = _read_header(file, MAGIC_CUBE)
+        if header is None or header.get("empreinte") != empreinte:
+            return None
+        debut = file.tell()
+        # le fichier reste ouvert tant que les tableaux sont utilisés
+        donnees = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+    blocs = {}
+    for description in header["blocs"]:
+        position = debut + description["position"]
+        blocs[description["nom"]] = donnees[position:position + description["taille"]]
+    return header, blocs
+
+def remove_orphans(dossier: str):
+    """Supprime les caches et les cubes dont le fichier csv n'existe plus.
+    Les caches ne sont gardés que jusqu'à la mise à jour incrémentale
+    suivante.
+
+    :param dossier: Le dossier contenant les fichiers csv
+    :type dossier: str
+    """
+    for extension in (EXTENSION, EXTENSION_CUBE):
+        for chemin_cache in glob.glob(os.path.join(dossier, "vacsi-s-a-reg-*.csv" + extension)):
+            if not os.path.exists(chemin_cache[:-len(extension)]):
+                try:
+                    os.remove(chemin_cache)
+                except OSError:
+                    pass
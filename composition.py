@@ -0,0 +1,288 @@
+""" Ce fichier contient l'assemblage des diagrammes dans l'image finale du
+rapport, et l'encodage de cette image (png, webp ou jpeg).
+
+Les polices et le fond du rapport (fond blanc et titre) ne dépendent que
+de la taille des diagrammes : ils sont préparés une seule fois puis
+réutilisés pour tous les rapports, seul le sous-titre (région et date)
+est dessiné à chaque fois.
+
+L'encodage d'une grande image est long (surtout en png). Pillow libère le
+GIL pendant l'encodage, il peut donc être fait dans un thread pendant que
+le rapport suivant est généré (voir BackgroundWriter).
+"""
+
+# Importations nécessaire pour le typing
+from typing import Dict, List, Optional, Tuple
+
+# Importation des modules nécessaires à l'encodage
+import io
+import time
+import argparse
+import threading
+
+# Importation des module nécessaire à la gestion du temps
+import datetime
+
+# Importation du groupe de threads utilisé pour l'encodage en arrière plan
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# On indique les modules à importer si l'importation échoue
+try:
+    # Importation des modules nécessaires au traitement de l'image
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError as e:
+    print("Vous devez installer le module pillow pour utiliser ce programme")
+    print("Pour installer le module, utilisez la commande suivante:")
+    print("pip install pillow")
+
+from constants import REGIONS
+
+# Police du titre et du sous-titre, cherchée dans le dossier actuel
+POLICE = "arial.ttf"
+# Hauteur de la bande du titre, au dessus des diagrammes
+HAUTEUR_TITRE = 64
+TITRE = "Données relatives à la COVID-19"
+
+# Formats d'image disponibles, avec le nom du format pour pillow,
+# l'extension des fichiers et le type de contenu HTTP
+FORMATS: Dict[str, Tuple[str, str, str]] = {
+    "png": ("PNG", ".png", "image/png"),
+    "webp": ("WEBP", ".webp", "image/webp"),
+    "jpeg": ("JPEG", ".jpg", "image/jpeg"),
+}
+# Niveau de compression png par défaut de pillow
+COMPRESS_LEVEL = 6
+# Qualité par défaut des formats avec perte (webp et jpeg)
+QUALITE = 90
+
+# Polices déjà chargées, pour chaque (fichier, taille)
+_POLICES: Dict[Tuple[str, int], "ImageFont.FreeTypeFont"] = {}
+# Fonds des rapports déjà préparés, pour chaque taille de diagramme
+_FONDS: Dict[Tuple[int, int], "Image.Image"] = {}
+_verrou = threading.Lock()
+
+def font(taille: int, chemin: str = POLICE) -> "ImageFont.FreeTypeFont":
+    """Retourne la police de la taille indiquée, chargée une seule fois
+
+    :param taille: La taille de la police (en pixels)
+    :type taille: int
+    :param chemin: Le fichier de la police, par défaut POLICE
+    :type chemin: str, optional
+    :return: La police
+    :rtype: ImageFont.FreeTypeFont
+    """
+    cle = (chemin, taille)
+    police = _POLICES.get(cle)
+    if police is None:
+        police = _POLICES[cle] = ImageFont.truetype(chemin, taille)
+    return police
+
+def background(diagram_size: Tuple[int, int]) -> "Image.Image":
+    """Retourne le fond du rapport : l'image blanche avec le titre, à
+    copier avant de coller les diagrammes
+
+    :param diagram_size: La taille d'un diagramme (largeur, hauteur)
+    :type diagram_size: Tuple[int, int]
+    :return: Le fond, qui ne doit pas être modifié
+    :rtype: Image.Image
+    """
+    fond = _FONDS.get(diagram_size)
+    if fond is not None:
+        return fond
+    with _verrou:
+        fond = _FONDS.get(diagram_size)
+        if fond is None: # le fond n'a pas été préparé par un autre thread entre temps
+            diagram_size_x, diagram_size_y = diagram_size
+            # on crée une image vide avec un fond blanc
+            fond = Image.new("RGB", (diagram_size_x * 2, diagram_size_y * 3 + HAUTEUR_TITRE), "white")
+            # on affiche "Données relatives à la COVID-19" en haut de l'image
+            ImageDraw.Draw(fond).text((diagram_size_x, 24), TITRE, (0, 0, 0), font=font(60), anchor="mm")
+            _FONDS[diagram_size] = fond
+    return fond
+
+def layout(diagram_size: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """Retourne la position de chaque diagramme dans le rapport : deux
+    colonnes et trois lignes, sous la bande du titre"""
+    diagram_size_x, diagram_size_y = diagram_size
+    return [
+        (x * diagram_size_x, y * diagram_size_y + HAUTEUR_TITRE)
+        for y in range(3) for x in range(2)
+    ]
+
+def compose_report(
+    diagrams: List["Image.Image"],
+    reg: str,
+    date: datetime.datetime,
+) -> "Image.Image":
+    """Assemble les six diagrammes dans l'image finale du rapport
+
+    :param diagrams: Les images des diagrammes, dans l'ordre d'affichage
+    :type diagrams: List[Image.Image]
+    :param reg: La région du rapport
+    :type reg: str
+    :param date: La date du rapport
+    :type date: datetime.datetime
+    :return: L'image du rapport
+    :rtype: Image.Image
+    """
+    diagram_size = diagrams[0].size
+    img = background(diagram_size).copy()
+
+    # on colle les diagrammes dans l'image
+    for diagram, position in zip(diagrams, layout(diagram_size)):
+        img.paste(diagram, position)
+
+    # on affiche en petit le nom de la région et la date en dessous du
+    # titre, au format "jour/mois/année"
+    formated_date = time.strftime("%d/%m/%Y", date.timetuple())
+    ImageDraw.Draw(img).text(
+        (diagram_size[0], 60),
+        f"Région : {REGIONS[reg]}, date : {formated_date}",
+        (0, 0, 0),
+        font=font(30),
+        anchor="mm",
+    )
+    return img
+
+class Encoder:
+    """Paramètres d'encodage des rapports"""
+
+    def __init__(
+        self,
+        format: str = "png",
+        compress_level: int = COMPRESS_LEVEL,
+        optimize: bool = False,
+        quality: int = QUALITE,
+    ):
+        """
+        :param format: Le format de l'image (voir FORMATS), par défaut "png"
+        :type format: str, optional
+        :param compress_level: Le niveau de compression png, de 0 (le plus
+        rapide) à 9 (le plus petit), par défaut COMPRESS_LEVEL
+        :type compress_level: int, optional
+        :param optimize: Si True, pillow cherche la plus petite image
+        possible (beaucoup plus lent), par défaut False
+        :type optimize: bool, optional
+        :param quality: La qualité des formats webp et jpeg, de 1 à 100, par défaut QUALITE
+        :type quality: int, optional
+        """
+        if format not in FORMATS:
+            raise ValueError(f"Le format {format} n'existe pas, choisissez parmi {', '.join(FORMATS)}.")
+        if not 0 <= compress_level <= 9:
+            raise ValueError(f"Le niveau de compression {compress_level} est invalide, il doit être entre 0 et 9.")
+        if not 1 <= quality <= 100:
+            raise ValueError(f"La qualité {quality} est invalide, elle doit être entre 1 et 100.")
+        self.format = format
+        self.compress_level = compress_level
+        self.optimize = optimize
+        self.quality = quality
+
+    @property
+    def extension(self) -> str:
+        """L'extension des fichiers, par exemple ".png\""""
+        return FORMATS[self.format][1]
+
+    @property
+    def content_type(self) -> str:
+        """Le type de contenu HTTP, par exemple "image/png\""""
+        return FORMATS[self.format][2]
+
+    def options(self) -> Dict[str, object]:
+        """Retourne les paramètres à donner à Image.save"""
+        if self.format == "png":
+            return {"compress_level": self.compress_level, "optimize": self.optimize}
+        if self.format == "webp":
+            # method va de 0 (rapide) à 6 (plus petit), 4 par défaut
+            return {"quality": self.quality, "method": 6 if self.optimize else 4}
+        return {"quality": self.quality, "optimize": self.optimize}
+
+    def encode(self, img: "Image.Image") -> bytes:
+        """Encode l'image
+
+        :param img: L'image à encoder
+        :type img: Image.Image
+        :return: Le contenu du fichier
+        :rtype: bytes
+        """
+        buffer = io.BytesIO()
+        img.save(buffer, format=FORMATS[self.format][0], **self.options())
+        return buffer.getvalue()
+
+    def save(self, img: "Image.Image", chemin: str) -> bytes:
+        """Encode l'image et l'enregistre
+
+        :param img: L'image à encoder
+        :type img: Image.Image
+        :param chemin: L'emplacement du fichier
+        :type chemin: str
+        :return: Le contenu du fichier
+        :rtype: bytes
+        """
+        contenu = self.encode(img)
+        with open(chemin, "wb") as file:
+            file.write(contenu)
+        return contenu
+
+class BackgroundWriter:
+    """Encode et enregistre les images dans un thread, pendant que le
+    programme génère l'image suivante.
+
+    Le nombre d'images en attente est limité : submit attend qu'une
+    image soit encodée si trop d'images attendent déjà, pour ne pas garder
+    toutes les images en mémoire.
+    """
+
+    def __init__(self, encoder: Optional[Encoder] = None, max_en_attente: int = 2, threads: int = 1):
+        """
+        :param encoder: Les paramètres d'encodage, par défaut None (png)
+        :type encoder: Optional[Encoder], optional
+        :param max_en_attente: Le nombre maximal d'images en attente, par défaut 2
+        :type max_en_attente: int, optional
+        :param threads: Le nombre de threads d'encodage, par défaut 1
+        :type threads: int, optional
+        """
+        self.encoder = encoder if encoder is not None else Encoder()
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="encodage")
+        self.places = threading.BoundedSemaphore(max_en_attente)
+
+    def _write(self, img: "Image.Image", chemin: Optional[str]) -> bytes:
+        """Encode l'image et l'enregistre (dans le thread)"""
+        try:
+            if chemin is None:
+                return self.encoder.encode(img)
+            return self.encoder.save(img, chemin)
+        finally:
+            self.places.release()
+
+    def submit(self, img: "Image.Image", chemin: Optional[str] = None) -> "Future[bytes]":
+        """Ajoute une image à encoder
+
+        :param img: L'image à encoder, qui ne doit plus être modifiée
+        :type img: Image.Image
+        :param chemin: L'emplacement où enregistrer l'image, si None
+        l'image est seulement encodée, par défaut None
+        :type chemin: Optional[str], optional
+        :return: Le résultat de l'encodage : le contenu du fichier
+        :rtype: Future[bytes]
+        """
+        self.places.acquire()
+        try:
+            return self.executor.submit(self._write, img, chemin)
+        except BaseException:
+            self.places.release()
+            raise
+
+    def close(self):
+        """Attend la fin de l'encodage des images en attente"""
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self) -> "BackgroundWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def encoder_from_arguments(arguments: argparse.Namespace) -> Encoder:
+    """Retourne les paramètres d'encodage indiqués sur la ligne de commande
+    (voir main.parse_arguments)"""
+    return Encoder(arguments.image_format, arguments.compress_level, arguments.optimize, arguments.quality)
@@ -0,0 +1,58 @@
+""" Ce fichier contient les constantes décrivant les données du fichier
+vacsi-s-a-reg. Il est mit à part pour pouvoir être utilisé par tous les
+autres fichiers du programme.
+"""
+
+# On créé quelques contantes pour gérer les données
+AGES = [
+    ('04', "0-4"),
+    ('09', "5-9"),
+    ('11', "10-11"),
+    ('17', "12-17"),
+    ('24', "18-24"),
+    ('29', "25-29"),
+    ('39', "30-39"),
+    ('49', "40-49"),
+    ('59', "50-59"),
+    ('64', "60-64"),
+    ('69', "65-69"),
+    ('74', "70-74"),
+    ('79', "75-79"),
+    ('80', "80 +"),
+]
+
+REGIONS = {
+    "01": "Guadeloupe",
+    "02": "Martinique",
+    "03": "Guyane",
+    "04": "La Réunion",
+    "11": "Ile-de-France",
+    "24": "Centre-Val de Loire",
+    "27": "Bourgogne-Franche-Comté",
+    "28": "Normandie",
+    "32": "Hauts-de-France",
+    "44": "Grand Est",
+    "52": "Pays de la Loire",
+    "53": "Bretagne",
+    "75": "Nouvelle-Aquitaine",
+    "76": "Occitanie",
+    "84": "Auvergne-Rhône-Alpes",
+    "93": "Provence-Alpes-Côte d’Azur",
+    "94": "Corse",
+}
+
+REG = 0
+AGE = 1
+JOUR = 2
+CUMULE_DOSE1_E = 31
+CUMULE_COMPLET_E = 32
+CUMULE_RAPPEL_E = 33
+CUMULE_2_RAPPEL_E = 34
+
+COUV_DOSE1_E = 35
+COUV_COMPLET_E = 36
+COUV_RAPPEL_E = 37
+COUV_2_RAPPEL_E = 38
+
+COUV_COMPLET_H = 12
+COUV_COMPLET_F = 24
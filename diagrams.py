@@ -0,0 +1,289 @@
+""" Ce fichier contient la génération des diagrammes avec matplotlib.
+Il est mit à part du reste du programme pour pouvoir générer les
+diagrammes dans d'autres processus (voir render.py).
+"""
+
+# On indique les modules à importer si une des importations échoue
+try:
+    # Importation des modules nécessaires au traitement de l'image
+    import matplotlib.pyplot as plt
+    from PIL import Image
+except ImportError as e:
+    print("Vous devez installer les modules matplotlib et pillow pour utiliser ce programme")
+    print("Pour installer les modules, utilisez la commande suivante:")
+    print("pip install pillow matplotlib")
+
+from constants import AGES, REGIONS
+from table import Table
+from profiling import profiled
+from stats import (
+    vaccinated_counts, coverage_by_sex, coverage_by_age,
+    dose_breakdown, dose_breakdown_by_age, top_regions,
+    cumulative, NON_VACCINE, UNE_DOSE, DEUX_DOSES, TROIS_DOSES,
+)
+
+# Partie de traitement des images
+@profiled()
+def export_plot_to_image(fig=None) -> Image.Image:
+    """Permet d'exporter le graphique matplotlib en image. La figure est
+    fermée après l'exportation.
+
+    :param fig: La figure matplotlib à convertir.
+    Si la figure n'est pas spécifiée, alors la figure courante est utilisée, par défaut à None
+    :type fig: pyplot.subplots()[1], optional
+    :return: L'image de la figure
+    :rtype: Image.Image
+    """
+    # si aucune figure n'est spécifiée, on utilise la figure courante
+    if fig is None:
+        fig = plt.gcf()
+
+    # on dessine la figure puis on récupère directement les pixels du
+    # dessin, sans passer par un fichier png (qui demanderait de
+    # compresser puis de décompresser l'image)
+    fig.canvas.draw()
+    pixels = fig.canvas.buffer_rgba()
+    height, width = pixels.shape[:2]
+
+    # l'image utilise la mémoire du dessin sans la copier
+    img = Image.frombuffer("RGBA", (width, height), pixels, "raw", "RGBA", 0, 1)
+
+    # on ferme la figure pour que pyplot ne la garde pas en mémoire
+    plt.close(fig)
+    
+    return img
+
+def get_diagram_1(database: Table) -> Image.Image:
+    """Retourne le prmier diagramme. Il affiche le nombre cumulé de
+    personnes vaccinées dans la région indiquée au cour du temps.
+
+    :param database: Las base de données d'où proviennent les données.
+    Elle doit être convertie avec la fonction convert_database(),
+    et doit ne contenir que les lignes de la région indiquée.
+    :type database: Table
+    :return: L'image correspondant au graphique
+    :rtype: Image.Image
+    """
+    # on récupère les données correspondant aux différents stades de
+    # vaccination
+    x_axis, (une_dose, complet, rappel, rappel_2) = vaccinated_counts(database)
+    # on créé le graphique
+    fig, ax = plt.subplots()
+    ax.set_title("Nombre cumulé de personnes vaccinées")
+    # on indique les axes
+    ax.set_ylabel("Nombre de personnes vaccinées")
+    # on tourne les valeurs de l'axe X de 30°
+    plt.xticks(rotation=30, ha="right")
+    
+    # on trace les courbes
+    ax.fill_between(x_axis, une_dose, 0, label="Une dose (partiel)", color="tab:blue")
+    ax.fill_between(x_axis, complet, 0, label="Deux doses (complet)", color="tab:orange")
+    ax.fill_between(x_axis, rappel, 0, label="Trois doses (rappel)", color="tab:green")
+    ax.fill_between(x_axis, rappel_2, 0, label="Quatre doses (rappel 2)", color="tab:olive")
+
+    # on indique l'emplacement de la légende
+    ax.legend(loc='upper left')
+    
+    return export_plot_to_image(fig)
+
+def get_diagram_2(database: Table) -> Image.Image:
+    """Retourne le second diagramme. Il affiche l'état de la
+    couverture vaccinale en fonction du sexe dans la région indiquée.
+
+    :param database: La base de données d'où proviennent les données.
+    Elle ne doit contenir que les données de la région indiquée.
+    :type database: Table
+    :return: L'image correspondant au graphique
+    :rtype: Image.Image
+    """
+    # on indique les étiquettes
+    axes = ['Hommes', 'Femmes', 'Couverture totale']
+    # on récupère les valeurs du jour le plus récent (voir stats.latest_row,
+    # les lignes peuvent être dans n'importe quel ordre)
+    values = list(coverage_by_sex(database))
+
+    # on créé le graphique
+    fig, ax = plt.subplots()
+    # on indique le titre
+    ax.set_title(f"Couverture vaccinale")
+    # on indique les axes
+    ax.set_ylabel("Couverture vaccinale (en %)")
+
+    # on affiche le graphique
+    ax.bar(axes, values, label="Couverture vaccinale", color=["tab:red", "tab:green", "tab:grey"])
+
+    # on paramètre les axes pour une meilleur lisibilité
+    ax.axis([-1, 3, 0, 100])
+
+    return export_plot_to_image(fig)
+
+def get_diagram_3(database: Table) -> Image.Image:
+    """Retourne le troisième diagramme. Il affiche l'état de la
+    couverture vaccinale en fonction de la classe d'âge dans la
+    région indiquée.
+
+    :param database: La base de données d'où proviennent les données.
+    Elle doit être convertie avec la fonction convert_database(),
+    et ne doit contenir que les lignes de la région indiquée, tout en
+    conservant les données de la classe d'âge.
+    :type database: Table
+    :return: L'image correspondant au graphique
+    :rtype: Image.Image
+    """
+    # on créé le graphique
+    fig, ax = plt.subplots()
+    # on indique un titre
+    ax.set_title("Évolution de la couverture vaccinale")
+    # on indique les axes
+    ax.set_ylabel("Pourcentage de population vaccinée")
+    # on tourne les valeurs de l'axe X de 30°
+    plt.xticks(rotation=30, ha="right")
+    
+    # on récupère une liste de 14 couleurs
+    colors = plt.cm.brg([
+        0.,
+        0.07692308,
+        0.15384615,
+        0.23076923,
+        0.30769231,
+        0.38461538,
+        0.46153846,
+        0.53846154,
+        0.61538462,
+        0.69230769,
+        0.76923077,
+        0.84615385,
+        0.92307692,
+        1.
+    ])
+
+    # on récupère la couverture vaccinale de chaque classe d'âges, dans
+    # l'ordre de AGES
+    series = coverage_by_age(database)
+    for i, ((code, dates, couv), (code, label)) in enumerate(zip(series, AGES)):
+        # on affiche le graphique
+        ax.plot(dates, couv, label=label, color=colors[i])
+    
+    # on indique l'emplacement de la légende
+    ax.legend(loc='upper left', fontsize=7)
+    
+    return export_plot_to_image(fig)
+
+def get_diagram_4(database: Table) -> Image.Image:
+    """Retourne le quatrième diagramme. Il affiche l'état de la
+    vaccination dans un diagrame camembert dans la région indiquée.
+
+    :param database: La base de données d'où proviennent les données.
+    Elle ne doit contenir que les informations de la région indiquée.
+    :type database: Table
+    :return: L'image correspondant au graphique
+    :rtype: Image.Image
+    """
+    # on créé le graphique
+    fig, ax = plt.subplots()
+    # on indique le titre
+    ax.set_title(f"État de la vaccination")
+
+    # on récupère la répartition la plus récente de la seule région et
+    # classe d'âge de la base de données (non vacciné, 1, 2, 3 et 4 doses)
+    data = dose_breakdown(database)
+
+    # on créé le diagramme camembert
+    ax.pie(
+        data,
+        colors=["tab:red", "tab:blue", "tab:orange", "tab:green", "tab:olive"],
+        # on spécifie la mise en forme des labels
+        textprops={'size': 'large', 'fontweight': 'bold', 'color': 'white'},
+        autopct = lambda value: f"{value:.1f}%",
+    )
+
+    # on affiche le graphique
+    ax.legend(
+        labels=["Pas vacciné", "Une dose (partiel)", "Deux doses (complet)", "Trois doses (rappel)", "Quatre doses (rappel 2)"],
+        loc="lower left",
+        bbox_to_anchor=(-0.3, 0.)
+    )
+
+    return export_plot_to_image(fig)
+
+def get_diagram_5(database: Table) -> Image.Image:
+    """Retourne le diagramme cinq. Il affiche la répartition de la
+    vaccination en fonction de la classe d'âge dans la région
+    indiquée.
+
+    :param database: La base de données d'où proviennent les données.
+    Elle ne doit contenir que les informations de la région indiquée,
+    et contenir les informations de la classe d'âge.
+    :type database: Table
+    :return: L'image correspondant au graphique
+    :rtype: Image.Image
+    """
+    # on créé le graphique
+    fig, ax = plt.subplots()
+    # on indique le titre
+    ax.set_title("Répartition des vaccinations sur les classes d'âges")
+    # on indique les axes
+    ax.set_ylabel("Classe d'âge")
+    ax.set_xlabel("Population vaccinée (en %)")
+
+    # on récupère la répartition la plus récente de chaque classe d'âge
+    # de la seule région de la base de données, dans l'ordre de AGES
+    parts = dose_breakdown_by_age(database)
+    # on empile les parts pour tracer les barres les unes sur les autres
+    cumul = cumulative(parts)
+    classe_age = [label for code, label in AGES]
+    
+    ax.barh(classe_age, cumul[:, TROIS_DOSES], color="tab:olive", label="Quatre doses (rappel 2)")
+    ax.barh(classe_age, cumul[:, TROIS_DOSES], color="tab:green", label="Trois doses (rappel)")
+    ax.barh(classe_age, cumul[:, DEUX_DOSES], color="tab:orange", label="Deux doses (complet)")
+    ax.barh(classe_age, cumul[:, UNE_DOSE], color="tab:blue", label="Une dose (partiel)")
+    ax.barh(classe_age, cumul[:, NON_VACCINE], color="tab:red", label="Pas vacciné")
+
+    ax.legend(
+        loc="upper right",
+    )
+
+    return export_plot_to_image(fig)
+
+def get_diagram_6(database: Table) -> Image.Image:
+    """Retourne le diagramme six. Il affiche les cinq régions où la
+    couverture vaccinale est la plus élevée.
+
+    :param database: La base de données d'où proviennent les données.
+    Elle doit contenir les informations de toutes les régions.
+    :type database: Table
+    :return: L'image correspondant au graphique
+    :rtype: Image.Image
+    """
+    # on créé le graphique
+    fig, ax = plt.subplots()
+    # on indique le titre
+    ax.set_title("5 régions ayant la meilleure couverture vaccinale")
+    # on indique les axes
+    ax.set_ylabel("Couverture vaccinale (en %)")
+    # on tourne les labels de l'axe x de 10°
+    plt.xticks(rotation=10, ha="right")
+
+    # on récupère les 5 régions qui ont la plus haute couverture à la
+    # date la plus récente, les données étant limitées à la date recherchée
+    regions = top_regions(database, 5)
+    
+    # on paramétre les axes pour une meilleur lisibilité
+    ax.axis([-1, 5, 0, 100])
+
+    # on affiche la barre pour chaque région
+    for code, couv in regions:
+        ax.bar(REGIONS[code], couv)
+    
+    return export_plot_to_image(fig)
+
+# Liste des diagrammes du rapport, dans l'ordre d'affichage, avec la vue
+# de la base de données que chacun utilise (voir apply_filters)
+DIAGRAMS = [
+    (get_diagram_1, "fall"),
+    (get_diagram_2, "fall"),
+    (get_diagram_3, "fage"),
+    (get_diagram_4, "fall"),
+    (get_diagram_5, "fage"),
+    (get_diagram_6, "freg"),
+]
@@ -7,12 +7,33 @@ API_SCHEME = "https://www.data.gouv.fr/api/2/datasets/{}/resources/?page=1&type=
 
 PROXY = {}
 
+# Fichier où sont gardées les informations du fichier trouvées sur data.gouv.fr,
+# et durée (en secondes) pendant laquelle elles sont considérées à jour
+RESSOURCE_CACHE = "vacsi-s-a-reg.ressource.json"
+RESSOURCE_TTL = 3600
+# Nombre maximum de redirections suivies pour une requête
+MAX_REDIRECTIONS = 5
+
+# Taille des morceaux écrits sur le disque pendant le téléchargement
+TAILLE_BLOC = 1 << 16
+# Extensions du fichier en cours de téléchargement et du fichier
+# contenant les informations du serveur sur le fichier téléchargé
+EXTENSION_PARTIEL = ".part"
+EXTENSION_INFOS = ".http.json"
+
 # Importations nécessaire pour le typing
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 # Importation des modules nécessaires au téléchargement
-import urllib.request as request
+import http.client
+from urllib.parse import urljoin, urlsplit
 import ssl # utilisé pour stopper l'erreur de SSL sur le réseau du lycée
+import hashlib
+import time
+
+# Importation des modules nécessaires au téléchargement en parallèle de la lecture
+import queue
+import threading
 
 # Importation du module nécessaire au traitement des informations du serveur
 import json
@@ -61,49 +82,353 @@ COLORS = {
 
 # Paramétrage du proxy pour le réseau du lycée
 if False:
-    proxy_support = request.ProxyHandler(
-        {
-            'http' : 'http://172.19.255.254:3128/',
-            'https' : 'https://172.19.255.254:3128/',
-        }
-    )
-    opener = request.build_opener(proxy_support)
-    request.install_opener(opener)
+    PROXY = {
+        'http' : 'http://172.19.255.254:3128/',
+        'https' : 'http://172.19.255.254:3128/',
+    }
 
 ctx = ssl.create_default_context()
 ctx.check_hostname = False
 ctx.verify_mode = ssl.CERT_NONE
 
-def get_file() -> Dict[str, Any]:
-    with request.urlopen(
-        API_SCHEME.format(DATASET_ID),
-        context=ctx,
-    ) as response:
-        raw_json = response.read() # on lit la réponse du serveur de data.gouv.fr
-        data = json.loads(raw_json)["data"] # on récupère les fichiers disponible sur le jeu de données
+class ConnectionPool:
+    """Garde les connexions ouvertes avec chaque serveur pour les
+    réutiliser d'une requête à l'autre (keep-alive), au lieu d'ouvrir
+    une nouvelle connexion à chaque requête."""
+
+    def __init__(self):
+        self.connexions: Dict[Tuple[str, str], http.client.HTTPConnection] = {}
+        self.verrou = threading.Lock()
+
+    def _connexion(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        """Retourne la connexion au serveur, en la créant si nécessaire"""
+        with self.verrou:
+            connexion = self.connexions.get((scheme, netloc))
+            if connexion is None:
+                proxy = PROXY.get(scheme)
+                hote = urlsplit(proxy).netloc if proxy else netloc
+                if scheme == 'https':
+                    connexion = http.client.HTTPSConnection(hote, context=ctx)
+                else:
+                    connexion = http.client.HTTPConnection(hote)
+                if proxy:
+                    connexion.set_tunnel(netloc)
+                self.connexions[(scheme, netloc)] = connexion
+            return connexion
+
+    def request(self, url: str, headers: Optional[Dict[str, str]] = None) -> http.client.HTTPResponse:
+        """Envoie une requête GET et retourne la réponse, en suivant les
+        redirections. La réponse doit être lue entièrement avant la
+        requête suivante vers le même serveur.
+
+        :param url: L'url demandée
+        :type url: str
+        :param headers: Les en-têtes de la requête, par défaut None
+        :type headers: Optional[Dict[str, str]], optional
+        :return: La réponse du serveur
+        :rtype: http.client.HTTPResponse
+        """
+        headers = headers or {}
+        for _ in range(MAX_REDIRECTIONS + 1):
+            adresse = urlsplit(url)
+            chemin = adresse.path or "/"
+            if adresse.query:
+                chemin += "?" + adresse.query
+            connexion = self._connexion(adresse.scheme, adresse.netloc)
+            try:
+                connexion.request("GET", chemin, headers=headers)
+                response = connexion.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionError):
+                # le serveur a fermé la connexion gardée, on en ouvre une nouvelle
+                connexion.close()
+                connexion.request("GET", chemin, headers=headers)
+                response = connexion.getresponse()
+            if response.status in (301, 302, 303, 307, 308):
+                response.read() # on vide la réponse pour pouvoir réutiliser la connexion
+                url = urljoin(url, response.headers['Location'])
+                continue
+            return response
+        raise IOError(f"Trop de redirections pour {url}")
+
+    def close(self):
+        """Ferme toutes les connexions"""
+        with self.verrou:
+            for connexion in self.connexions.values():
+                connexion.close()
+            self.connexions.clear()
+
+POOL = ConnectionPool()
+
+def iter_resources() -> Iterator[Dict[str, Any]]:
+    """Parcourt les fichiers du jeu de données sur data.gouv.fr. Les
+    pages de résultats ne sont demandées qu'au moment où elles sont lues.
+
+    :return: Les informations de chaque fichier
+    :rtype: Iterator[Dict[str, Any]]
+    """
+    url = API_SCHEME.format(DATASET_ID)
+    while url:
+        with POOL.request(url, {'Accept': 'application/json'}) as response:
+            if response.status != 200:
+                raise IOError(f"Erreur {response.status} du serveur de data.gouv.fr")
+            page = json.loads(response.read()) # on lit la réponse du serveur de data.gouv.fr
+        yield from page["data"] # on récupère les fichiers disponible sur cette page
+        url = page.get("next_page") # None sur la dernière page
+
+def get_file(ttl: float = RESSOURCE_TTL) -> Dict[str, Any]:
+    """Retourne les informations du fichier vacsi-s-a-reg le plus récent
+    (url, title, checksum et last_modified). Les informations sont
+    gardées sur le disque et réutilisées pendant ttl secondes.
+
+    :param ttl: La durée de validité des informations gardées, par défaut RESSOURCE_TTL
+    :type ttl: float, optional
+    :return: Les informations du fichier
+    :rtype: Dict[str, Any]
+    """
+    try:
+        with open(RESSOURCE_CACHE, encoding='utf-8') as file:
+            cache = json.load(file)
+        if time.time() - cache['date'] < ttl:
+            return cache['ressource']
+    except (OSError, ValueError, KeyError):
+        pass # pas d'informations valides sur le disque
+
     target_file = None
-    for file in data: # on cherche le fichier qui nous intéresse
+    for file in iter_resources(): # on cherche le fichier qui nous intéresse
         if file['title'].startswith("vacsi-s-a-reg-") and file['title'].endswith(".csv"):
-            # on a trouvé le fichier qui nous intéresse
+            # on a trouvé le fichier qui nous intéresse, pas besoin de lire les pages suivantes
             target_file = file
+            break
     assert target_file is not None, "Impossible de récupérer les informations du serveur"
-    return target_file
 
-def download_file(file: Dict[str, Any]):
+    ressource = {
+        'url': target_file['url'],
+        'title': target_file['title'],
+        'checksum': target_file.get('checksum'), # par exemple {"type": "sha1", "value": "..."}
+        'last_modified': target_file.get('last_modified'),
+    }
+    try:
+        with open(RESSOURCE_CACHE, 'w', encoding='utf-8') as file:
+            json.dump({'date': time.time(), 'ressource': ressource}, file)
+    except OSError:
+        pass
+    return ressource
+
+def read_infos(chemin: str) -> Dict[str, Any]:
+    """Lit les informations du serveur enregistrées pour un fichier"""
+    try:
+        with open(chemin + EXTENSION_INFOS, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def write_infos(chemin: str, infos: Dict[str, Any]):
+    """Enregistre les informations du serveur pour un fichier"""
+    with open(chemin + EXTENSION_INFOS, 'w', encoding='utf-8') as file:
+        json.dump(infos, file)
+
+def open_download(file: Dict[str, Any], dossier: str = ".") -> Optional[Iterator[bytes]]:
+    """Commence le téléchargement du fichier et retourne son contenu
+    morceau par morceau. Chaque morceau est écrit dans un fichier
+    temporaire au moment où il est lu, qui remplace le fichier final
+    une fois tout le contenu lu.
+
+    Le téléchargement est évité si le fichier n'a pas changé sur le
+    serveur (en-têtes ETag et Last-Modified), et un téléchargement
+    interrompu reprend là où il s'était arrêté (en-tête Range). Dans ce
+    cas, le début déjà téléchargé est lu depuis le disque, le contenu
+    retourné est donc toujours le fichier complet.
+
+    :param file: Les informations du fichier (url et title)
+    :type file: Dict[str, Any]
+    :param dossier: Le dossier où enregistrer le fichier, par défaut "."
+    :type dossier: str, optional
+    :return: Le contenu du fichier, ou None s'il était déjà à jour
+    :rtype: Optional[Iterator[bytes]]
+    """
     url = file['url']
-    with request.urlopen(url, context=ctx) as response, open('./'+file['title'], 'bw') as file:
-        file.write(
-            response.read()
-        )
+    chemin = os.path.join(dossier, file['title'])
+    partiel = chemin + EXTENSION_PARTIEL
+    infos = read_infos(chemin)
+    if infos.get('url') != url: # les informations concernent un autre fichier
+        infos = {}
+
+    headers = {}
+    if infos.get('complet') and os.path.exists(chemin):
+        # requête conditionnelle : le serveur répond 304 si le fichier n'a pas changé
+        if infos.get('etag'):
+            headers['If-None-Match'] = infos['etag']
+        if infos.get('last_modified'):
+            headers['If-Modified-Since'] = infos['last_modified']
+    elif not infos.get('complet') and os.path.exists(partiel) and (infos.get('etag') or infos.get('last_modified')):
+        # reprise du téléchargement interrompu, si le fichier n'a pas
+        # changé sur le serveur (sinon le serveur renvoie tout le fichier)
+        headers['Range'] = f"bytes={os.path.getsize(partiel)}-"
+        headers['If-Range'] = infos.get('etag') or infos['last_modified']
+
+    response = POOL.request(url, headers)
+    if response.status == 304: # le fichier n'a pas changé
+        response.read()
+        return None
+    if response.status == 416: # la reprise est impossible, on recommence depuis le début
+        response.read()
+        os.remove(partiel)
+        return open_download(file, dossier)
+    if response.status not in (200, 206):
+        response.read()
+        raise IOError(f"Erreur {response.status} du serveur pour {url}")
+
+    reprise = response.status == 206
+    if not reprise:
+        # on enregistre les informations du serveur avant de
+        # commencer, pour pouvoir reprendre en cas d'interruption
+        infos = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'checksum': file.get('checksum'),
+            'complet': False,
+        }
+        write_infos(chemin, infos)
+    # taille attendue du fichier complet, si le serveur l'indique
+    if reprise:
+        attendu = response.headers.get('Content-Range', '').rpartition('/')[2]
+    else:
+        attendu = response.headers.get('Content-Length', '')
+
+    # on calcule l'empreinte du contenu pendant le téléchargement pour la
+    # comparer à celle indiquée par le serveur
+    checksum = infos.get('checksum') or {}
+    empreinte = hashlib.new(checksum['type']) if checksum.get('type') in hashlib.algorithms_available else None
+
+    def contenu() -> Iterator[bytes]:
+        # le cache de l'ancien fichier ne correspondra plus au nouveau fichier
+        # (voir cache.py), il servira de base à la mise à jour incrémentale
+        with response:
+            if reprise:
+                # on relit le début déjà téléchargé
+                with open(partiel, 'rb') as debut:
+                    bloc = debut.read(TAILLE_BLOC)
+                    while bloc:
+                        if empreinte is not None:
+                            empreinte.update(bloc)
+                        yield bloc
+                        bloc = debut.read(TAILLE_BLOC)
+            with open(partiel, 'ab' if reprise else 'wb') as output:
+                bloc = response.read(TAILLE_BLOC)
+                while bloc:
+                    output.write(bloc)
+                    if empreinte is not None:
+                        empreinte.update(bloc)
+                    yield bloc
+                    bloc = response.read(TAILLE_BLOC)
+                taille = output.tell()
+
+        if attendu.isdigit() and taille != int(attendu):
+            # la connexion a été coupée, le fichier partiel est gardé pour reprendre plus tard
+            raise IOError(f"Téléchargement incomplet ({taille} octets sur {attendu})")
+        if empreinte is not None and empreinte.hexdigest() != checksum.get('value'):
+            # le fichier est corrompu, on ne le garde pas
+            os.remove(partiel)
+            raise IOError("L'empreinte du fichier téléchargé ne correspond pas à celle du serveur")
+
+        # le fichier est complet, il remplace l'ancien fichier en une seule opération
+        os.replace(partiel, chemin)
+        # on note la taille et la date de modification du fichier : tant
+        # qu'elles ne changent pas, l'empreinte du serveur correspond au
+        # fichier et n'a pas besoin d'être recalculée (voir cache.py)
+        stat = os.stat(chemin)
+        infos['taille'] = stat.st_size
+        infos['mtime'] = stat.st_mtime_ns
+        infos['complet'] = True
+        write_infos(chemin, infos)
+
+    return contenu()
+
+def download_file(file: Dict[str, Any], dossier: str = ".") -> bool:
+    """Télécharge le fichier sur le disque (voir open_download)
+
+    :param file: Les informations du fichier (url et title)
+    :type file: Dict[str, Any]
+    :param dossier: Le dossier où enregistrer le fichier, par défaut "."
+    :type dossier: str, optional
+    :return: True si le fichier a été téléchargé, False s'il était déjà à jour
+    :rtype: bool
+    """
+    chunks = open_download(file, dossier)
+    if chunks is None:
+        return False
+    for _ in chunks: # chaque morceau est écrit sur le disque au moment où il est lu
+        pass
+    return True
+
+def prefetch(chunks: Iterator[bytes], taille: int = 64) -> Iterator[bytes]:
+    """Lit les morceaux dans un autre thread, pour que le téléchargement
+    continue pendant que les morceaux déjà reçus sont traités. Au plus
+    taille morceaux sont gardés en attente.
+
+    :param chunks: Les morceaux à lire
+    :type chunks: Iterator[bytes]
+    :param taille: Le nombre maximum de morceaux en attente, par défaut 64
+    :type taille: int, optional
+    :return: Les mêmes morceaux, dans le même ordre
+    :rtype: Iterator[bytes]
+    """
+    file_attente = queue.Queue(taille)
+    fin = object() # marque la fin des morceaux
+
+    def lecture():
+        try:
+            for chunk in chunks:
+                file_attente.put(chunk)
+        except BaseException as e: # l'erreur est transmise au thread qui traite les morceaux
+            file_attente.put(e)
+        else:
+            file_attente.put(fin)
+
+    thread = threading.Thread(target=lecture, daemon=True)
+    thread.start()
+    while True:
+        chunk = file_attente.get()
+        if chunk is fin:
+            break
+        if isinstance(chunk, BaseException):
+            raise chunk
+        yield chunk
+    thread.join()
+
+def start_download(parser: Optional[Callable[[str, Iterator[bytes]], Any]] = None) -> str:
+    """Télécharge automatiquement le fichier depuis data.gouv.fr
 
-def start_download() -> str:
-    """Télécharge automatiquement le fichier depuis data.gouv.fr"""
+    :param parser: Fonction appelée avec l'emplacement du fichier et son
+    contenu pendant le téléchargement, pour lire le fichier au fur et à
+    mesure de sa réception. Elle doit lire tout le contenu. Elle n'est
+    pas appelée si le fichier était déjà à jour. Par défaut None
+    :type parser: Optional[Callable[[str, Iterator[bytes]], Any]], optional
+    :return: L'emplacement du fichier téléchargé
+    :rtype: str
+    """
     old_files = glob.glob("vacsi-s-a-reg-*.csv")
     print(f"Téléchargement...", end=" ", flush=True)
     new_file = get_file()
     old_files = [filename for filename in old_files if filename != new_file['title']]
-    download_file(new_file)
-    print(f"{COLORS['fg']['green']}Fait{COLORS['reset']}")
+    chunks = open_download(new_file)
+    if chunks is None:
+        print(f"{COLORS['fg']['green']}Le fichier est déjà à jour{COLORS['reset']}")
+    else:
+        if parser is None:
+            for _ in chunks:
+                pass
+        else:
+            # le fichier est lu pendant que la suite est téléchargée
+            chunks = prefetch(chunks)
+            try:
+                parser(new_file['title'], chunks)
+            finally:
+                # on termine le téléchargement si la lecture s'est arrêtée avant la fin
+                for _ in chunks:
+                    pass
+        print(f"{COLORS['fg']['green']}Fait{COLORS['reset']}")
     if len(old_files) > 0:
         print("Des anciens fichiers ont étés trouvés.")
         response = input(f"Voulez vous les garder ({COLORS['fg']['green']}O{COLORS['reset']}/{COLORS['fg']['red']}n{COLORS['fg']['yellow']}) ? ")
@@ -111,6 +436,8 @@ def start_download() -> str:
         if response.lower() == "n":
             for filename in old_files:
                 os.remove(filename)
+                if os.path.exists(filename + EXTENSION_INFOS):
+                    os.remove(filename + EXTENSION_INFOS)
     return new_file['title']
 
 # pour télécharger manuellement lancez ce programme directement
@@ -0,0 +1,110 @@
+""" Ce fichier contient la génération des diagrammes avec le moteur de
+dessin simple de lightplot.py, sans matplotlib.
+
+Les diagrammes sont les mêmes que ceux de diagrams.py, avec les mêmes
+données, couleurs et textes. Ce moteur est choisi avec l'option
+--backend pillow (voir render.py).
+"""
+
+from PIL import Image
+
+from constants import AGES, REGIONS
+from table import Table
+from stats import (
+    vaccinated_counts, coverage_by_sex, coverage_by_age,
+    dose_breakdown, dose_breakdown_by_age, top_regions,
+    cumulative, NON_VACCINE, UNE_DOSE, DEUX_DOSES, TROIS_DOSES,
+)
+from lightplot import Chart, brg
+
+def get_diagram_1(database: Table) -> Image.Image:
+    """Retourne le premier diagramme (voir diagrams.get_diagram_1)"""
+    x_axis, (une_dose, complet, rappel, rappel_2) = vaccinated_counts(database)
+    chart = Chart("Nombre cumulé de personnes vaccinées")
+    chart.ylabel = "Nombre de personnes vaccinées"
+    chart.xticks_rotation(30)
+    chart.fill_between(x_axis, une_dose, "tab:blue", "Une dose (partiel)")
+    chart.fill_between(x_axis, complet, "tab:orange", "Deux doses (complet)")
+    chart.fill_between(x_axis, rappel, "tab:green", "Trois doses (rappel)")
+    chart.fill_between(x_axis, rappel_2, "tab:olive", "Quatre doses (rappel 2)")
+    chart.legend(loc="upper left")
+    return chart.export()
+
+def get_diagram_2(database: Table) -> Image.Image:
+    """Retourne le second diagramme (voir diagrams.get_diagram_2)"""
+    chart = Chart("Couverture vaccinale")
+    chart.ylabel = "Couverture vaccinale (en %)"
+    chart.bar(
+        ['Hommes', 'Femmes', 'Couverture totale'],
+        list(coverage_by_sex(database)),
+        ["tab:red", "tab:green", "tab:grey"],
+    )
+    chart.axis([-1, 3, 0, 100])
+    return chart.export()
+
+def get_diagram_3(database: Table) -> Image.Image:
+    """Retourne le troisième diagramme (voir diagrams.get_diagram_3)"""
+    chart = Chart("Évolution de la couverture vaccinale")
+    chart.ylabel = "Pourcentage de population vaccinée"
+    chart.xticks_rotation(30)
+    series = coverage_by_age(database)
+    for i, ((code, dates, couv), (code, label)) in enumerate(zip(series, AGES)):
+        # même palette que dans diagrams.get_diagram_3
+        chart.plot(dates, couv, brg(i / (len(AGES) - 1)), label)
+    chart.legend(loc="upper left", fontsize=9.7)
+    return chart.export()
+
+def get_diagram_4(database: Table) -> Image.Image:
+    """Retourne le quatrième diagramme (voir diagrams.get_diagram_4)"""
+    data = dose_breakdown(database)
+    chart = Chart("État de la vaccination")
+    chart.pie(
+        data,
+        ["tab:red", "tab:blue", "tab:orange", "tab:green", "tab:olive"],
+        autopct=lambda value: f"{value:.1f}%",
+        text_color="white",
+        bold=True,
+    )
+    chart.legend(
+        labels=["Pas vacciné", "Une dose (partiel)", "Deux doses (complet)", "Trois doses (rappel)", "Quatre doses (rappel 2)"],
+        loc="lower left",
+        bbox_to_anchor=(-0.3, 0.),
+    )
+    return chart.export()
+
+def get_diagram_5(database: Table) -> Image.Image:
+    """Retourne le diagramme cinq (voir diagrams.get_diagram_5)"""
+    parts = dose_breakdown_by_age(database)
+    cumul = cumulative(parts)
+    classe_age = [label for code, label in AGES]
+
+    chart = Chart("Répartition des vaccinations sur les classes d'âges")
+    chart.ylabel = "Classe d'âge"
+    chart.xlabel = "Population vaccinée (en %)"
+    chart.barh(classe_age, cumul[:, TROIS_DOSES], "tab:olive", label="Quatre doses (rappel 2)")
+    chart.barh(classe_age, cumul[:, TROIS_DOSES], "tab:green", label="Trois doses (rappel)")
+    chart.barh(classe_age, cumul[:, DEUX_DOSES], "tab:orange", label="Deux doses (complet)")
+    chart.barh(classe_age, cumul[:, UNE_DOSE], "tab:blue", label="Une dose (partiel)")
+    chart.barh(classe_age, cumul[:, NON_VACCINE], "tab:red", label="Pas vacciné")
+    chart.legend(loc="upper right")
+    return chart.export()
+
+def get_diagram_6(database: Table) -> Image.Image:
+    """Retourne le diagramme six (voir diagrams.get_diagram_6)"""
+    chart = Chart("5 régions ayant la meilleure couverture vaccinale")
+    chart.ylabel = "Couverture vaccinale (en %)"
+    chart.xticks_rotation(10)
+    chart.axis([-1, 5, 0, 100])
+    for code, couv in top_regions(database, 5):
+        chart.bar([REGIONS[code]], [couv])
+    return chart.export()
+
+# Liste des diagrammes du rapport, dans le même ordre que diagrams.DIAGRAMS
+DIAGRAMS = [
+    (get_diagram_1, "fall"),
+    (get_diagram_2, "fall"),
+    (get_diagram_3, "fage"),
+    (get_diagram_4, "fall"),
+    (get_diagram_5, "fage"),
+    (get_diagram_6, "freg"),
+]
@@ -0,0 +1,527 @@
+""" Ce fichier contient un moteur de dessin de graphiques simple, qui
+dessine directement avec ImageDraw de pillow.
+
+Il reproduit l'apparence des graphiques de matplotlib utilisés par le
+rapport (aires, courbes, barres, barres horizontales empilées et
+camemberts), sans avoir à importer matplotlib, ce qui prend beaucoup
+plus de temps que le dessin lui-même. Le dessin est fait à une taille
+plus grande puis réduit, pour lisser les bords comme le fait matplotlib.
+"""
+
+# Importations nécessaire pour le typing
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+# Importation des modules nécessaires au calcul des graduations
+import math
+import datetime
+
+from PIL import Image, ImageDraw, ImageFont
+
+from profiling import profiled
+
+# Taille des images, identique à celle des figures de matplotlib
+LARGEUR, HAUTEUR = 640, 480
+# Position de la zone de dessin dans l'image (gauche, haut, droite, bas),
+# identique aux marges par défaut de matplotlib
+ZONE = (80, 57.6, 576, 427.2)
+# Facteur d'agrandissement du dessin avant la réduction finale
+ECHELLE = 2
+
+# Tailles des textes en pixels (10 points à 100 points par pouce)
+TAILLE_TEXTE = 13.9
+TAILLE_TITRE = 16.7
+TAILLE_GRANDE = 16.7
+
+# Couleurs de matplotlib
+COULEURS = {
+    "tab:blue": (31, 119, 180),
+    "tab:orange": (255, 127, 14),
+    "tab:green": (44, 160, 44),
+    "tab:red": (214, 39, 40),
+    "tab:purple": (148, 103, 189),
+    "tab:brown": (140, 86, 75),
+    "tab:pink": (227, 119, 194),
+    "tab:grey": (127, 127, 127),
+    "tab:olive": (188, 189, 34),
+    "tab:cyan": (23, 190, 207),
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+}
+# Couleurs utilisées l'une après l'autre quand aucune couleur n'est indiquée
+CYCLE = ["tab:blue", "tab:orange", "tab:green", "tab:red", "tab:purple",
+         "tab:brown", "tab:pink", "tab:grey", "tab:olive", "tab:cyan"]
+
+Couleur = Union[str, Tuple[int, int, int]]
+
+# Polices déjà chargées, pour chaque (taille, gras)
+_POLICES: Dict[Tuple[int, bool], ImageFont.FreeTypeFont] = {}
+
+def font(taille: float, gras: bool = False) -> ImageFont.FreeTypeFont:
+    """Retourne la police de la taille indiquée (en pixels de l'image finale)
+
+    :param taille: La taille de la police
+    :type taille: float
+    :param gras: Si True, la police est en gras, par défaut False
+    :type gras: bool, optional
+    :return: La police
+    :rtype: ImageFont.FreeTypeFont
+    """
+    cle = (round(taille * ECHELLE), gras)
+    police = _POLICES.get(cle)
+    if police is None:
+        # on utilise la même police que matplotlib si elle est installée
+        for nom in (("DejaVuSans-Bold.ttf", "arialbd.ttf") if gras else ("DejaVuSans.ttf", "arial.ttf")):
+            try:
+                police = ImageFont.truetype(nom, cle[0])
+                break
+            except OSError:
+                pass
+        else:
+            police = ImageFont.load_default(cle[0])
+        _POLICES[cle] = police
+    return police
+
+def color(couleur: Couleur) -> Tuple[int, int, int]:
+    """Convertit un nom de couleur de matplotlib en couleur RGB"""
+    if isinstance(couleur, str):
+        return COULEURS[couleur]
+    return tuple(int(round(valeur * 255)) if isinstance(valeur, float) else valeur for valeur in couleur[:3])
+
+def brg(valeur: float) -> Tuple[int, int, int]:
+    """Retourne la couleur de la palette brg de matplotlib (du bleu au
+    rouge puis au vert) pour une valeur entre 0 et 1"""
+    if valeur <= 0.5:
+        rouge, vert, bleu = 2 * valeur, 0., 1 - 2 * valeur
+    else:
+        rouge, vert, bleu = 2 - 2 * valeur, 2 * valeur - 1, 0.
+    return (round(rouge * 255), round(vert * 255), round(bleu * 255))
+
+def nice_ticks(debut: float, fin: float, nombre_max: int = 9) -> List[float]:
+    """Retourne des graduations régulières et arrondies entre deux valeurs,
+    comme celles choisies par matplotlib
+
+    :param debut: La plus petite valeur de l'axe
+    :type debut: float
+    :param fin: La plus grande valeur de l'axe
+    :type fin: float
+    :param nombre_max: Le nombre maximum de graduations, par défaut 9
+    :type nombre_max: int, optional
+    :return: Les valeurs des graduations comprises entre debut et fin
+    :rtype: List[float]
+    """
+    if fin <= debut:
+        return [debut]
+    brut = (fin - debut) / (nombre_max - 1)
+    puissance = 10 ** math.floor(math.log10(brut))
+    for pas in (1, 2, 2.5, 5, 10):
+        pas *= puissance
+        if (fin - debut) / pas <= nombre_max - 1:
+            break
+    premier = math.ceil(debut / pas - 1e-9)
+    dernier = math.floor(fin / pas + 1e-9)
+    return [i * pas for i in range(premier, dernier + 1)]
+
+def date_ticks(debut: float, fin: float) -> List[Tuple[float, str]]:
+    """Retourne les graduations d'un axe de dates (en numéros de jours) :
+    le premier jour des mois, ou certains jours si l'intervalle est court
+
+    :param debut: Le premier jour de l'axe
+    :type debut: float
+    :param fin: Le dernier jour de l'axe
+    :type fin: float
+    :return: La position et le texte de chaque graduation
+    :rtype: List[Tuple[float, str]]
+    """
+    premier = datetime.date.fromordinal(max(1, math.ceil(debut)))
+    dernier = datetime.date.fromordinal(max(1, math.floor(fin)))
+    nb_mois = (dernier.year - premier.year) * 12 + dernier.month - premier.month
+    if nb_mois >= 3:
+        for intervalle in (1, 2, 3, 4, 6, 12, 24, 60):
+            if nb_mois / intervalle <= 7:
+                break
+        output = []
+        mois = premier.year * 12 + premier.month - 1
+        if premier.day != 1:
+            mois += 1
+        mois = (mois + intervalle - 1) // intervalle * intervalle
+        while True:
+            jour = datetime.date(mois // 12, mois % 12 + 1, 1)
+            if jour > dernier:
+                return output
+            output.append((jour.toordinal(), jour.strftime("%Y" if intervalle >= 12 else "%Y-%m")))
+            mois += intervalle
+    nb_jours = dernier.toordinal() - premier.toordinal()
+    for intervalle in (1, 2, 3, 7, 14):
+        if nb_jours / intervalle <= 8:
+            break
+    return [
+        (jour, datetime.date.fromordinal(jour).strftime("%m-%d"))
+        for jour in range(premier.toordinal(), dernier.toordinal() + 1, intervalle)
+    ]
+
+def format_tick(valeur: float) -> str:
+    """Retourne le texte d'une graduation numérique"""
+    if abs(valeur - round(valeur)) < 1e-9:
+        return str(int(round(valeur)))
+    return f"{valeur:g}"
+
+class Chart:
+    """Graphique dessiné avec pillow, avec une interface proche de celle
+    des axes de matplotlib"""
+
+    def __init__(self, title: str = ""):
+        self.img = Image.new("RGB", (LARGEUR * ECHELLE, HAUTEUR * ECHELLE), "white")
+        self.draw = ImageDraw.Draw(self.img, "RGBA")
+        self.title = title
+        self.xlabel = ""
+        self.ylabel = ""
+        self.xlim: Optional[Tuple[float, float]] = None
+        self.ylim: Optional[Tuple[float, float]] = None
+        # les éléments sont gardés jusqu'au dessin, qui a besoin des limites des axes
+        self.elements: List[Tuple[str, tuple]] = []
+        self.legende: Optional[Tuple[list, str, float, Optional[Tuple[float, float]]]] = None
+        # étiquettes de la légende : (texte, couleur, style du symbole)
+        self.entrees: List[Tuple[str, Tuple[int, int, int], str]] = []
+        self.xticks: Optional[List[Tuple[float, str]]] = None
+        self.yticks: Optional[List[Tuple[float, str]]] = None
+        self.x_dates = False
+        self.rotation = 0
+        self.axes_visibles = True
+        self.cycle = 0
+        # valeurs extrêmes des données, pour calculer les limites des axes
+        self.etendue_x: List[float] = []
+        self.etendue_y: List[float] = []
+        # limites qui ne reçoivent pas de marge (comme le bas des barres)
+        self.collees_x: List[float] = []
+        self.collees_y: List[float] = []
+
+    # Ajout des éléments du graphique
+    def _next_color(self, couleur: Optional[Couleur]) -> Tuple[int, int, int]:
+        """Retourne la couleur indiquée, ou la couleur suivante du cycle"""
+        if couleur is None:
+            couleur = CYCLE[self.cycle % len(CYCLE)]
+            self.cycle += 1
+        return color(couleur)
+
+    def _x_values(self, xs: Sequence) -> List[float]:
+        """Convertit les abscisses en nombres (les dates en numéros de jours)"""
+        if len(xs) and isinstance(xs[0], datetime.date):
+            self.x_dates = True
+            return [x.toordinal() for x in xs]
+        return [float(x) for x in xs]
+
+    def fill_between(self, xs: Sequence, ys: Sequence[float], couleur: Optional[Couleur] = None, label: str = ""):
+        """Remplit l'aire entre la courbe et 0"""
+        xs = self._x_values(xs)
+        couleur = self._next_color(couleur)
+        self.elements.append(("aire", (xs, list(ys), couleur)))
+        self.etendue_x += [min(xs), max(xs)] if xs else []
+        self.etendue_y += [min(min(ys), 0), max(max(ys), 0)] if len(ys) else []
+        self._legend_entry(label, couleur, "patch")
+
+    def plot(self, xs: Sequence, ys: Sequence[float], couleur: Optional[Couleur] = None, label: str = ""):
+        """Trace une courbe"""
+        xs = self._x_values(xs)
+        couleur = self._next_color(couleur)
+        self.elements.append(("courbe", (xs, list(ys), couleur)))
+        self.etendue_x += [min(xs), max(xs)] if xs else []
+        self.etendue_y += [min(ys), max(ys)] if len(ys) else []
+        self._legend_entry(label, couleur, "line")
+
+    def bar(self, labels: Sequence[str], hauteurs: Sequence[float], couleurs=None, largeur: float = 0.8, label: str = ""):
+        """Trace des barres verticales, une par étiquette"""
+        self._bars(labels, hauteurs, couleurs, largeur, label, False)
+
+    def barh(self, labels: Sequence[str], longueurs: Sequence[float], couleur: Optional[Couleur] = None, hauteur: float = 0.8, label: str = ""):
+        """Trace des barres horizontales, une par étiquette. Les barres
+        tracées ensuite sont dessinées par dessus."""
+        self._bars(labels, longueurs, [couleur] * len(labels) if couleur is not None else None, hauteur, label, True)
+
+    def _bars(self, labels, valeurs, couleurs, epaisseur, label, horizontal):
+        if couleurs is None:
+            couleurs = [self._next_color(None)] * len(labels)
+        else:
+            couleurs = [color(couleur) for couleur in couleurs]
+        # les étiquettes sont placées aux positions 0, 1, 2... dans l'ordre d'apparition
+        if self.xticks is None and not horizontal:
+            self.xticks = []
+        if self.yticks is None and horizontal:
+            self.yticks = []
+        graduations = self.yticks if horizontal else self.xticks
+        positions = []
+        for texte in labels:
+            existantes = [texte_existant for position, texte_existant in graduations]
+            if texte in existantes:
+                positions.append(graduations[existantes.index(texte)][0])
+            else:
+                positions.append(len(graduations))
+                graduations.append((len(graduations), texte))
+        self.elements.append(("barres", (positions, list(valeurs), couleurs, epaisseur, horizontal)))
+        etendue_position = [min(positions) - epaisseur / 2, max(positions) + epaisseur / 2]
+        etendue_valeur = [min(min(valeurs), 0), max(max(valeurs), 0)]
+        if horizontal:
+            self.etendue_y += etendue_position
+            self.etendue_x += etendue_valeur
+            self.collees_x.append(0)
+        else:
+            self.etendue_x += etendue_position
+            self.etendue_y += etendue_valeur
+            self.collees_y.append(0)
+        self._legend_entry(label, couleurs[0], "patch")
+
+    def pie(self, valeurs: Sequence[float], couleurs: Sequence[Couleur], autopct=None, text_color: Couleur = "black", text_size: float = TAILLE_GRANDE, bold: bool = False):
+        """Trace un camembert, en partant de la droite dans le sens inverse
+        des aiguilles d'une montre"""
+        self.elements.append(("camembert", (list(valeurs), [color(couleur) for couleur in couleurs], autopct, color(text_color), text_size, bold)))
+        self.axes_visibles = False
+
+    # Paramètres des axes
+    def axis(self, limites: Sequence[float]):
+        """Indique les limites des axes (x minimum, x maximum, y minimum, y maximum)"""
+        self.xlim = (limites[0], limites[1])
+        self.ylim = (limites[2], limites[3])
+
+    def xticks_rotation(self, rotation: float):
+        """Tourne les étiquettes de l'axe x (alignées à droite)"""
+        self.rotation = rotation
+
+    def legend(self, labels: Optional[List[str]] = None, loc: str = "upper left", fontsize: float = TAILLE_TEXTE, bbox_to_anchor: Optional[Tuple[float, float]] = None):
+        """Affiche la légende des éléments qui ont une étiquette"""
+        self.legende = (labels, loc, fontsize, bbox_to_anchor)
+
+    def _legend_entry(self, label: str, couleur, style: str):
+        if label:
+            self.entrees.append((label, couleur, style))
+
+    # Dessin
+    def _limits(self) -> Tuple[Tuple[float, float], Tuple[float, float]]:
+        """Calcule les limites des axes avec des marges de 5%, comme matplotlib"""
+        def limites(etendue, collees, fixees):
+            if fixees is not None:
+                return fixees
+            if not etendue:
+                return (0., 1.)
+            debut, fin = min(etendue), max(etendue)
+            if debut == fin:
+                debut, fin = debut - 1, fin + 1
+            marge = (fin - debut) * 0.05
+            return (
+                debut if debut in collees else debut - marge,
+                fin if fin in collees else fin + marge,
+            )
+        return limites(self.etendue_x, self.collees_x, self.xlim), limites(self.etendue_y, self.collees_y, self.ylim)
+
+    def _zone(self) -> Tuple[float, float, float, float]:
+        """Retourne la position de la zone de dessin. Comme dans
+        matplotlib, elle est carrée autour d'un camembert."""
+        gauche, haut, droite, bas = ZONE
+        if self.axes_visibles:
+            return ZONE
+        cote = min(droite - gauche, bas - haut)
+        centre_x, centre_y = (gauche + droite) / 2, (haut + bas) / 2
+        return (centre_x - cote / 2, centre_y - cote / 2, centre_x + cote / 2, centre_y + cote / 2)
+
+    def _px(self, x: float) -> float:
+        gauche, haut, droite, bas = ZONE
+        debut, fin = self._xlim
+        return (gauche + (x - debut) / (fin - debut) * (droite - gauche)) * ECHELLE
+
+    def _py(self, y: float) -> float:
+        gauche, haut, droite, bas = ZONE
+        debut, fin = self._ylim
+        return (bas - (y - debut) / (fin - debut) * (bas - haut)) * ECHELLE
+
+    def _text(self, position: Tuple[float, float], texte: str, taille: float = TAILLE_TEXTE, anchor: str = "la", couleur=(0, 0, 0), rotation: float = 0, gras: bool = False):
+        """Écrit un texte (position en pixels de l'image agrandie)"""
+        police = font(taille, gras)
+        if rotation == 0:
+            self.draw.text(position, texte, fill=couleur, font=police, anchor=anchor)
+            return
+        # le texte est écrit dans une image séparée qui est tournée puis collée
+        gauche, haut, droite, bas = police.getbbox(texte)
+        calque = Image.new("L", (droite + 2, bas + 2), 0)
+        ImageDraw.Draw(calque).text((0, 0), texte, fill=255, font=police)
+        calque = calque.rotate(rotation, resample=Image.BICUBIC, expand=True)
+        x, y = position
+        # l'ancre indique le coin du texte tourné placé à la position
+        if anchor[0] == "r":
+            x -= calque.width
+        elif anchor[0] == "m":
+            x -= calque.width / 2
+        if anchor[1] == "m":
+            y -= calque.height / 2
+        elif anchor[1] in "bd":
+            y -= calque.height
+        self.img.paste(Image.new("RGB", calque.size, couleur), (round(x), round(y)), calque)
+
+    def _draw_elements(self):
+        gauche, haut, droite, bas = (valeur * ECHELLE for valeur in ZONE)
+        for nature, parametres in self.elements:
+            if nature == "aire":
+                xs, ys, couleur = parametres
+                if not xs:
+                    continue
+                points = [(self._px(x), self._py(y)) for x, y in zip(xs, ys)]
+                points += [(self._px(xs[-1]), self._py(0)), (self._px(xs[0]), self._py(0))]
+                self.draw.polygon(points, fill=couleur)
+            elif nature == "courbe":
+                xs, ys, couleur = parametres
+                points = [(self._px(x), self._py(y)) for x, y in zip(xs, ys)]
+                if len(points) > 1:
+                    self.draw.line(points, fill=couleur, width=round(2 * ECHELLE), joint="curve")
+            elif nature == "barres":
+                positions, valeurs, couleurs, epaisseur, horizontal = parametres
+                for position, valeur, couleur in zip(positions, valeurs, couleurs):
+                    if valeur != valeur: # pas de valeur (nan)
+                        continue
+                    if horizontal:
+                        rectangle = [self._px(0), self._py(position + epaisseur / 2), self._px(valeur), self._py(position - epaisseur / 2)]
+                    else:
+                        rectangle = [self._px(position - epaisseur / 2), self._py(valeur), self._px(position + epaisseur / 2), self._py(0)]
+                    x0, y0, x1, y1 = rectangle
+                    # on limite le rectangle à la zone de dessin
+                    x0, x1 = max(min(x0, x1), gauche), min(max(x0, x1), droite)
+                    y0, y1 = max(min(y0, y1), haut), min(max(y0, y1), bas)
+                    if x1 > x0 and y1 > y0:
+                        self.draw.rectangle([x0, y0, x1, y1], fill=couleur)
+            elif nature == "camembert":
+                self._draw_pie(*parametres)
+
+    def _draw_pie(self, valeurs, couleurs, autopct, couleur_texte, taille, gras):
+        gauche, haut, droite, bas = self._zone()
+        centre_x, centre_y = (gauche + droite) / 2 * ECHELLE, (haut + bas) / 2 * ECHELLE
+        # comme matplotlib, le rayon vaut 1 dans des axes allant de -1.25 à 1.25
+        rayon = (droite - gauche) / 2.5 * ECHELLE
+        total = sum(valeurs)
+        angle = 0.
+        boite = [centre_x - rayon, centre_y - rayon, centre_x + rayon, centre_y + rayon]
+        textes = []
+        for valeur, couleur in zip(valeurs, couleurs):
+            part = valeur / total * 360
+            # pillow tourne dans le sens des aiguilles d'une montre
+            if part > 0:
+                self.draw.pieslice(boite, -(angle + part), -angle, fill=couleur)
+            milieu = math.radians(angle + part / 2)
+            if autopct is not None:
+                position = (centre_x + 0.6 * rayon * math.cos(milieu), centre_y - 0.6 * rayon * math.sin(milieu))
+                textes.append((position, autopct(valeur / total * 100)))
+            angle += part
+        for position, texte in textes:
+            self._text(position, texte, taille, "mm", couleur_texte, gras=gras)
+
+    def _draw_axes(self):
+        gauche, haut, droite, bas = (valeur * ECHELLE for valeur in ZONE)
+        epaisseur = round(0.8 * ECHELLE)
+        longueur_graduation = 3.5 * ECHELLE
+        espace = 3.5 * ECHELLE
+
+        # graduations de l'axe x
+        if self.xticks is not None:
+            graduations_x = [(x, texte) for x, texte in self.xticks]
+        elif self.x_dates:
+            graduations_x = date_ticks(*self._xlim)
+        else:
+            graduations_x = [(x, format_tick(x)) for x in nice_ticks(*self._xlim)]
+        for x, texte in graduations_x:
+            px = self._px(x)
+            if px < gauche - 1 or px > droite + 1:
+                continue
+            self.draw.line([(px, bas), (px, bas + longueur_graduation)], fill=(0, 0, 0), width=epaisseur)
+            if self.rotation:
+                self._text((px, bas + longueur_graduation + espace), texte, rotation=self.rotation, anchor="ra")
+            else:
+                self._text((px, bas + longueur_graduation + espace), texte, anchor="ma")
+
+        # graduations de l'axe y, avec un facteur commun pour les grands nombres
+        facteur = 0
+        if self.yticks is not None:
+            graduations_y = self.yticks
+        else:
+            valeurs = nice_ticks(*self._ylim)
+            plus_grande = max(abs(valeur) for valeur in valeurs)
+            if plus_grande >= 1e5:
+                facteur = int(math.floor(math.log10(plus_grande)))
+            graduations_y = [(y, format_tick(y / 10 ** facteur)) for y in valeurs]
+        largeur_textes = 0
+        police = font(TAILLE_TEXTE)
+        for y, texte in graduations_y:
+            py = self._py(y)
+            if py < haut - 1 or py > bas + 1:
+                continue
+            self.draw.line([(gauche - longueur_graduation, py), (gauche, py)], fill=(0, 0, 0), width=epaisseur)
+            self._text((gauche - longueur_graduation - espace, py), texte, anchor="rm")
+            largeur_textes = max(largeur_textes, police.getlength(texte))
+        if facteur:
+            self._text((gauche, haut - espace), f"1e{facteur}", anchor="ld")
+
+        # cadre de la zone de dessin
+        self.draw.rectangle([gauche, haut, droite, bas], outline=(0, 0, 0), width=epaisseur)
+
+        # titres des axes
+        if self.xlabel:
+            hauteur_textes = font(TAILLE_TEXTE).getbbox("0")[3]
+            self._text(((gauche + droite) / 2, bas + longueur_graduation + 2 * espace + hauteur_textes), self.xlabel, anchor="ma")
+        if self.ylabel:
+            self._text((gauche - longueur_graduation - 2 * espace - largeur_textes, (haut + bas) / 2), self.ylabel, rotation=90, anchor="rm")
+
+    def _draw_legend(self):
+        labels, loc, taille, ancre = self.legende
+        entrees = self.entrees
+        if labels is not None: # les étiquettes remplacent celles des éléments
+            if entrees:
+                entrees = [(label, couleur, style) for label, (ancien, couleur, style) in zip(labels, entrees)]
+            else:
+                camembert = next(parametres for nature, parametres in self.elements if nature == "camembert")
+                entrees = [(label, couleur, "patch") for label, couleur in zip(labels, camembert[1])]
+        if not entrees:
+            return
+        police = font(taille)
+        e = ECHELLE
+        # mêmes espacements que matplotlib, proportionnels à la taille du texte
+        hauteur_ligne = taille * 1.5 * e
+        largeur_symbole = taille * 2 * e
+        marge = taille * 0.4 * e
+        espace = taille * 0.8 * e
+        largeur = marge * 2 + largeur_symbole + espace + max(police.getlength(label) for label, couleur, style in entrees)
+        hauteur = marge * 2 + hauteur_ligne * len(entrees) - (hauteur_ligne - taille * e)
+
+        gauche, haut, droite, bas = (valeur * e for valeur in self._zone())
+        bord = 0.5 * taille * e
+        if ancre is not None: # position relative à la zone de dessin
+            x = gauche + ancre[0] * (droite - gauche)
+            y = bas - ancre[1] * (bas - haut)
+        else:
+            x = gauche + bord if "left" in loc else droite - bord
+            y = haut + bord if "upper" in loc else bas - bord
+        if "right" in loc:
+            x -= largeur
+        if "lower" in loc:
+            y -= hauteur
+        self.draw.rounded_rectangle([x, y, x + largeur, y + hauteur], radius=0.2 * taille * e, fill=(255, 255, 255, 204), outline=(204, 204, 204), width=round(e))
+        for i, (label, couleur, style) in enumerate(entrees):
+            centre_y = y + marge + i * hauteur_ligne + taille * e / 2
+            if style == "line":
+                self.draw.line([(x + marge, centre_y), (x + marge + largeur_symbole, centre_y)], fill=couleur, width=round(2 * e))
+            else:
+                self.draw.rectangle([x + marge, centre_y - 0.35 * taille * e, x + marge + largeur_symbole, centre_y + 0.35 * taille * e], fill=couleur)
+            self._text((x + marge + largeur_symbole + espace, centre_y), label, taille, "lm")
+
+    @profiled("Chart.export")
+    def export(self) -> Image.Image:
+        """Dessine le graphique et retourne l'image, à la même taille que
+        les images de matplotlib
+
+        :return: L'image du graphique
+        :rtype: Image.Image
+        """
+        self._xlim, self._ylim = self._limits()
+        self._draw_elements()
+        if self.axes_visibles:
+            self._draw_axes()
+        if self.title:
+            gauche, haut, droite, bas = (valeur * ECHELLE for valeur in ZONE)
+            self._text(((gauche + droite) / 2, haut - 6 * ECHELLE), self.title, TAILLE_TITRE, "md")
+        if self.legende is not None:
+            self._draw_legend()
+        # la réduction lisse les bords des formes et des textes
+        return self.img.reduce(ECHELLE).convert("RGBA")
@@ -1,9 +1,15 @@
 # Importation des utilitaires n'étant pas en rapports avec la logique du code
-from typing import Any, Callable, List, Optional, Tuple, Union
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 # Importation du module de lecture de base de données
 import os
+import io
 import csv
+import hashlib
+
+# Importation du module de lecture des arguments de la ligne de commande
+import argparse
+import importlib.util
 
 # Importation du module utilisé pour la détecection automatique du fichier
 import glob
@@ -12,79 +18,38 @@ import glob
 import datetime
 import time
 
-import io # nécessaire pour la conversion de l'image plot en image PIL
-
-# On indique les modules à importer si une des importations échoue
-try:
-    # Importation des modules nécessaires au traitement de l'image
-    import matplotlib.pyplot as plt
-    from PIL import Image, ImageDraw, ImageFont
-except ImportError as e:
+# Importation de la table utilisée pour stocker la base de données
+from table import Table, iter_chunks, parse_day, parse_datetime, day_to_datetime, date_bounds, CHUNK_SIZE
+import cache
+from profiling import profiled, span, write_profile, PROFILER, FORMATS as PROFILE_FORMATS
+
+# Ce module ne dépend que de la bibliothèque standard, il choisit le
+# moteur de dessin sans importer matplotlib ni pillow
+from render import render_diagrams, set_backend, BACKENDS, BACKEND
+
+# Les modules de traitement d'image et de téléchargement sont longs à
+# importer, ils ne sont importés qu'au moment où ils sont utilisés. On
+# vérifie seulement ici qu'ils sont installés, sans les importer.
+if TYPE_CHECKING:
+    from PIL import Image
+    from composition import Encoder
+if importlib.util.find_spec("PIL") is None or importlib.util.find_spec("matplotlib") is None:
     print("Vous devez installer les modules matplotlib et pillow pour utiliser ce programme")
     print("Pour installer les modules, utilisez la commande suivante:")
     print("pip install pillow matplotlib")
 
-# On essait d'importer le module de téléchargement automatique
+# On vérifie si le module de téléchargement automatique existe
 # Si il n'existe pas, on désactive le support pour le téléchargement
-try:
-    from downloader import start_download
-    DOWNLOAD_SUPPORT = True
-except ImportError:
-    DOWNLOAD_SUPPORT = False
+DOWNLOAD_SUPPORT = importlib.util.find_spec("downloader") is not None
 
 # On créé quelques contantes pour gérer les données
-AGES = [
-    ('04', "0-4"),
-    ('09', "5-9"),
-    ('11', "10-11"),
-    ('17', "12-17"),
-    ('24', "18-24"),
-    ('29', "25-29"),
-    ('39', "30-39"),
-    ('49', "40-49"),
-    ('59', "50-59"),
-    ('64', "60-64"),
-    ('69', "65-69"),
-    ('74', "70-74"),
-    ('79', "75-79"),
-    ('80', "80 +"),
-]
-
-REGIONS = {
-    "01": "Guadeloupe",
-    "02": "Martinique",
-    "03": "Guyane",
-    "04": "La Réunion",
-    "11": "Ile-de-France",
-    "24": "Centre-Val de Loire",
-    "27": "Bourgogne-Franche-Comté",
-    "28": "Normandie",
-    "32": "Hauts-de-France",
-    "44": "Grand Est",
-    "52": "Pays de la Loire",
-    "53": "Bretagne",
-    "75": "Nouvelle-Aquitaine",
-    "76": "Occitanie",
-    "84": "Auvergne-Rhône-Alpes",
-    "93": "Provence-Alpes-Côte d’Azur",
-    "94": "Corse",
-}
-
-REG = 0
-AGE = 1
-JOUR = 2
-CUMULE_DOSE1_E = 31
-CUMULE_COMPLET_E = 32
-CUMULE_RAPPEL_E = 33
-CUMULE_2_RAPPEL_E = 34
-
-COUV_DOSE1_E = 35
-COUV_COMPLET_E = 36
-COUV_RAPPEL_E = 37
-COUV_2_RAPPEL_E = 38
-
-COUV_COMPLET_H = 12
-COUV_COMPLET_F = 24
+from constants import (
+    AGES, REGIONS,
+    REG, AGE, JOUR,
+    CUMULE_DOSE1_E, CUMULE_COMPLET_E, CUMULE_RAPPEL_E, CUMULE_2_RAPPEL_E,
+    COUV_DOSE1_E, COUV_COMPLET_E, COUV_RAPPEL_E, COUV_2_RAPPEL_E,
+    COUV_COMPLET_H, COUV_COMPLET_F,
+)
 
 # Cette constante permet de gérer l'affichage en couleur
 COLORS = {
@@ -125,18 +90,267 @@ COLORS = {
 }
 
 # Section de lecture de la base de données
-def load_file(chemin: str) -> List[List[Any]]:
-    """Charge un fichier csv et retourne la base de données
+def stream_file(
+    chemin: str,
+    reg: Optional[str] = None,
+    date: Optional[Tuple[Union[datetime.datetime, None]]] = None,
+    keep_ages: bool = True,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Table]:
+    """Lit un fichier csv morceau par morceau en appliquant les filtres
+    pendant la lecture. Seules les lignes gardées sont stockées.
 
     :param chemin: L'emplacement du fichier à lire
     :type chemin: str
-    :return: La base de données convertie en liste de listes
-    :rtype: List[List[Any]]
+    :param reg: La région du filtre (si None, pas de filtre de région), par défaut None
+    :type reg: Optional[str], optional
+    :param date: Le filtre de date (si None, pas de filtre de date), par défaut None
+    :type date: Optional[Tuple[Union[datetime.datetime, None]]], optional
+    :param keep_ages: Si False, seule la classe d'âge 0 est gardée, par défaut True
+    :type keep_ages: bool, optional
+    :param chunk_size: Le nombre maximum de lignes par morceau, par défaut CHUNK_SIZE
+    :type chunk_size: int, optional
+    :return: Les morceaux successifs de la base de données
+    :rtype: Iterator[Table]
+    """
+    with open(chemin, encoding='utf-8', newline='') as file: # ouvre le fichier en encodage utf-8 (support des accents...)
+        yield from stream_text(file, reg, date, keep_ages, chunk_size)
+
+def stream_text(
+    file: Iterable[str],
+    reg: Optional[str] = None,
+    date: Optional[Tuple[Union[datetime.datetime, None]]] = None,
+    keep_ages: bool = True,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Table]:
+    """Lit le contenu d'un fichier csv déjà ouvert morceau par morceau
+    (voir stream_file)
+
+    :param file: Le fichier ouvert en mode texte, ou ses lignes
+    :type file: Iterable[str]
+    :raises ValueError: Si le fichier est vide
+    :return: Les morceaux successifs de la base de données
+    :rtype: Iterator[Table]
     """
-    with open(chemin, encoding='utf-8') as file: # ouvre le fichier en encodage utf-8 (support des accents...)
-        reader = csv.reader(file, delimiter=";") # lecture du fichier csv (le séparateur est un ;)
-        data = list(reader) # on convertir le lecteur en liste pour plus de praticité
-    data = data[1:] # on retire les headers
+    reader = csv.reader(file, delimiter=";") # lecture du fichier csv (le séparateur est un ;)
+    headers = next(reader, None) # on retire les headers
+    if headers is None: # StopIteration deviendrait une RuntimeError dans ce générateur
+        raise ValueError("le fichier est vide")
+    yield from iter_chunks(reader, reg, date, keep_ages, chunk_size, len(headers))
+
+class ChunkReader(io.RawIOBase):
+    """Fichier en lecture seule dont le contenu provient d'une suite de
+    morceaux d'octets, par exemple reçus pendant un téléchargement"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.reste = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while len(self.reste) == 0: # on attend le morceau suivant
+            self.reste = next(self.chunks, None)
+            if self.reste is None: # fin du contenu
+                self.reste = b""
+                return 0
+        taille = min(len(buffer), len(self.reste))
+        buffer[:taille] = self.reste[:taille]
+        self.reste = self.reste[taille:]
+        return taille
+
+def load_stream(
+    chunks: Iterable[bytes],
+    reg: Optional[str] = None,
+    date: Optional[Tuple[Union[datetime.datetime, None]]] = None,
+    keep_ages: bool = True,
+) -> Table:
+    """Construit la base de données à partir du contenu d'un fichier csv
+    reçu morceau par morceau. Les morceaux sont décodés et lus au fur et
+    à mesure de leur réception (voir load_file pour les filtres).
+
+    :param chunks: Le contenu du fichier, morceau par morceau
+    :type chunks: Iterable[bytes]
+    :raises ValueError: Si le contenu est vide
+    :return: La base de données sous forme de table en colonnes
+    :rtype: Table
+    """
+    # le décodage utf-8 est fait au fur et à mesure, un caractère coupé
+    # entre deux morceaux est complété avec le morceau suivant
+    file = io.TextIOWrapper(io.BufferedReader(ChunkReader(chunks)), encoding='utf-8', newline='')
+    return concat_chunks(stream_text(file, reg, date, keep_ages))
+
+def download_database() -> str:
+    """Télécharge le fichier csv en le lisant pendant le téléchargement.
+    La base de données lue est enregistrée dans le cache (voir cache.py),
+    load_database n'a donc pas besoin de relire le fichier.
+
+    :return: L'emplacement du fichier téléchargé
+    :rtype: str
+    """
+    def parser(chemin: str, chunks: Iterator[bytes]):
+        try:
+            data = load_stream(chunks)
+        except ValueError: # fichier vide, load_database signalera l'erreur en le relisant
+            return
+        try:
+            cache.save(chemin, data)
+        except OSError: # le dossier n'est peut être pas accessible en écriture
+            pass
+    from downloader import start_download
+    return start_download(parser=parser)
+
+@profiled(lignes=len)
+def load_file(
+    chemin: str,
+    reg: Optional[str] = None,
+    date: Optional[Tuple[Union[datetime.datetime, None]]] = None,
+    keep_ages: bool = True,
+) -> Table:
+    """Charge un fichier csv et retourne la base de données.
+    Les filtres sont appliqués pendant la lecture (voir stream_file),
+    par défaut toutes les lignes sont gardées.
+
+    :param chemin: L'emplacement du fichier à lire
+    :type chemin: str
+    :param reg: La région du filtre (si None, pas de filtre de région), par défaut None
+    :type reg: Optional[str], optional
+    :param date: Le filtre de date (si None, pas de filtre de date), par défaut None
+    :type date: Optional[Tuple[Union[datetime.datetime, None]]], optional
+    :param keep_ages: Si False, seule la classe d'âge 0 est gardée, par défaut True
+    :type keep_ages: bool, optional
+    :return: La base de données sous forme de table en colonnes
+    :rtype: Table
+    """
+    return concat_chunks(stream_file(chemin, reg, date, keep_ages))
+
+def concat_chunks(chunks: Iterable[Table]) -> Table:
+    """Rassemble les morceaux lus dans une seule table
+
+    :param chunks: Les morceaux de la base de données
+    :type chunks: Iterable[Table]
+    :return: La base de données complète
+    :rtype: Table
+    """
+    data = None
+    for chunk in chunks:
+        if data is None:
+            data = chunk
+        else:
+            data.extend(chunk)
+    if data is None: # aucune ligne n'a été gardée
+        data = Table()
+    return data
+
+def last_day(chemin: str) -> Optional[int]:
+    """Retourne la date de la dernière ligne d'un fichier csv, en ne
+    lisant que la fin du fichier. Les lignes sont normalement triées par
+    date, c'est donc aussi la date la plus récente du fichier.
+
+    :param chemin: L'emplacement du fichier csv
+    :type chemin: str
+    :return: Le numéro du jour de la dernière ligne, ou None si le fichier
+    n'a aucune ligne ou si la dernière ligne est invalide
+    :rtype: Optional[int]
+    """
+    with open(chemin, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        file.seek(max(0, file.tell() - 4096))
+        lignes = [ligne for ligne in file.read().decode("utf-8", errors="replace").splitlines() if ligne.strip()]
+    if not lignes:
+        return None
+    row = next(csv.reader(lignes[-1:], delimiter=";"))
+    try:
+        return parse_day(row[JOUR])
+    except (IndexError, ValueError): # ligne des headers ou ligne invalide
+        return None
+
+def update_database(base: Table, chemin: str, contenu: str) -> Table:
+    """Ajoute à la base de données les lignes d'un fichier csv plus
+    récentes que la dernière date de la base. Le fichier doit être une
+    version plus récente du fichier d'où provient la base : seules les
+    nouvelles lignes sont converties.
+
+    On vérifie que la base correspond bien au fichier : l'en-tête et les
+    lignes du fichier jusqu'à la dernière date de la base, dans l'ordre du
+    fichier, doivent être exactement le contenu du fichier d'où provient
+    la base. Ces lignes ne sont pas converties, seule leur empreinte est
+    calculée. Sinon (fichier plus ancien, autre fichier ou anciennes
+    dates modifiées), tout le fichier est relu.
+
+    :param base: La base de données à compléter
+    :type base: Table
+    :param chemin: L'emplacement du fichier à lire
+    :type chemin: str
+    :param contenu: L'empreinte sha256 du contenu du fichier d'où
+    provient la base (voir cache.save)
+    :type contenu: str
+    :return: La base de données complétée
+    :rtype: Table
+    """
+    if len(base) == 0:
+        return load_file(chemin)
+    dernier_jour = max(base.jour)
+    empreinte = hashlib.sha256()
+    nouvelles = [] # lignes plus récentes que la base
+
+    # le fichier est lu en octets : les anciennes lignes sont comparées
+    # telles quelles, sans être décodées
+    with open(chemin, "rb") as file:
+        empreinte.update(file.readline()) # headers
+        for ligne in file:
+            try:
+                jour = parse_day(ligne.split(b";", 3)[2].decode("utf-8"))
+            except (IndexError, ValueError): # ligne invalide, load_file signalera l'erreur
+                return load_file(chemin)
+            if jour <= dernier_jour:
+                empreinte.update(ligne)
+            else:
+                nouvelles.append(ligne.decode("utf-8"))
+
+    if "sha256:" + empreinte.hexdigest() != contenu:
+        return load_file(chemin)
+    reader = csv.reader(nouvelles, delimiter=";")
+    base.extend(concat_chunks(iter_chunks(reader, nb_colonnes=base.nb_colonnes)))
+    return base
+
+@profiled(lignes=len)
+def load_database(chemin: str, use_cache: bool = True) -> Table:
+    """Charge la base de données complète d'un fichier csv en utilisant
+    le cache enregistré sur le disque (voir cache.py).
+
+    Si le cache n'est plus valide, un ancien cache est utilisé comme
+    base et seules les lignes plus récentes sont lues dans le fichier
+    csv (voir update_database). S'il n'y a aucun cache, tout le fichier
+    csv est lu. Le cache est ensuite enregistré pour les prochaines fois.
+
+    :param chemin: L'emplacement du fichier à lire
+    :type chemin: str
+    :param use_cache: Si False, le fichier csv est toujours lu entièrement, par défaut True
+    :type use_cache: bool, optional
+    :return: La base de données sous forme de table en colonnes
+    :rtype: Table
+    """
+    if not use_cache:
+        return load_file(chemin)
+
+    data = cache.load(chemin)
+    if data is None:
+        jour_max = last_day(chemin)
+        base = cache.load_base(chemin, jour_max) if jour_max is not None else None
+        if base is not None:
+            table, contenu = base
+            data = update_database(table, chemin, contenu)
+        else:
+            data = load_file(chemin)
+        try:
+            cache.save(chemin, data)
+            cache.remove_orphans(os.path.dirname(chemin))
+        except OSError: # le dossier n'est peut être pas accessible en écriture, on se passe du cache
+            pass
+    # le cube des valeurs à une date est enregistré à côté du cache (voir stats.as_of_cube)
+    data.chemin = chemin
     return data
 
 def selection(data: List[List[Any]], test: Callable[[List[Any]], bool]) -> List[List[Any]]:
@@ -149,6 +363,8 @@ def selection(data: List[List[Any]], test: Callable[[List[Any]], bool]) -> List[
     :return: La base de données résultante de exécution de l'opération
     :rtype: List[List[Any]]
     """
+    if isinstance(data, Table): # la table sait effectuer la sélection elle même
+        return data.select(test)
     output = [] # on créé la liste de retour vide
     for entry in data: # on regarde chaque ligne (entry) de la base de données
         if test(entry): # on effectue le test sur la ligne
@@ -165,6 +381,8 @@ def projection(table: List[List[Any]], listeNumCol: Tuple[int]) -> List[List[Any
     :return: La base de données résultante de l'exécution de l'opération
     :rtype: List[List[Any]]
     """
+    if isinstance(table, Table):
+        return table.project(listeNumCol)
     return [[data[col] for col in listeNumCol] for data in table]
 
 # Fonction nécessaires à l'interface avec l'utilisateur
@@ -180,7 +398,7 @@ def ask_file() -> str:
     print(COLORS['reset'], end="")
 
     if chemin == 'd' and DOWNLOAD_SUPPORT:
-        chemin = start_download()
+        chemin = download_database()
     
     elif chemin == "": # on tente une détection automatique
         chemins = glob.glob("./vacsi-s-a-reg-*.csv")
@@ -286,7 +504,9 @@ def filter_check(
         check = check and row[REG] == reg
     
     if date is not None: # on vérifie qu'il faut appliquer le filtre de date
-        row_date = datetime.datetime.fromisoformat(row[2])
+        row_date = row[JOUR]
+        if not isinstance(row_date, datetime.datetime): # la ligne n'a pas encore été convertie
+            row_date = parse_datetime(row_date)
         # récupération de la date sous forme d'un objet facilement utilisable en python
         date_check = True
         # on vérifie que la date est bien comprise entre les limites
@@ -297,6 +517,7 @@ def filter_check(
     
     return check
 
+@profiled(lignes=len)
 def apply_filter(
     data: List[List[Any]],
     reg: Optional[str],
@@ -314,12 +535,63 @@ def apply_filter(
     :return: La base de données avec les filtres appliqués
     :rtype: List[List[Any]]
     """
+    if isinstance(data, Table):
+        # on compare directement les colonnes de la table, sans créer les lignes
+        debut, fin = date if date is not None else (None, None)
+        view = data.take(data.indices_where(
+            reg=reg,
+            age=None if keep_ages else "0",
+            debut=debut,
+            fin=fin,
+        ))
+        # la vue garde son filtre pour les recherches dans le cube de la base de données
+        view.origine = (data, reg, None if keep_ages else "0") + date_bounds(date)
+        return view
     # on applique le filtre en utilisant la fonction filter_check
     return selection(
         data,
         lambda row: filter_check(row, reg, date, keep_ages),
     )
 
+@profiled(lignes=lambda views: sum(len(view) for view in views.values()))
+def apply_filters(
+    data: List[List[Any]],
+    views: Dict[str, Tuple[Optional[str], Optional[Tuple[Union[datetime.datetime, None]]], bool]],
+) -> Dict[str, List[List[Any]]]:
+    """Applique plusieurs filtres sur la base de données en un seul
+    parcours. Chaque filtre produit une vue de la base de données,
+    avec les dates converties comme avec convert_database().
+
+    :param data: La base de données sur lesquelles appliquer les filtres
+    :type data: List[List[Any]]
+    :param views: Associe le nom de chaque vue à ses filtres : la région,
+    le filtre de date et keep_ages (voir filter_check)
+    :type views: Dict[str, Tuple[Optional[str], Optional[Tuple[Union[datetime.datetime, None]]], bool]]
+    :return: Associe le nom de chaque vue à la base de données filtrée
+    :rtype: Dict[str, List[List[Any]]]
+    """
+    if isinstance(data, Table):
+        indices = data.indices_views({
+            name: (reg, None if keep_ages else "0", date)
+            for name, (reg, date, keep_ages) in views.items()
+        })
+        output = {name: data.take(indices[name]) for name in views}
+        # chaque vue garde son filtre pour les recherches dans le cube de la base de données
+        for name, (reg, date, keep_ages) in views.items():
+            output[name].origine = (data, reg, None if keep_ages else "0") + date_bounds(date)
+        return output
+
+    output = {name: [] for name in views}
+    for row in data:
+        # la date n'est convertie qu'une seule fois pour toutes les vues
+        if not isinstance(row[JOUR], datetime.datetime):
+            row[JOUR] = parse_datetime(row[JOUR])
+        for name, (reg, date, keep_ages) in views.items():
+            if filter_check(row, reg, date, keep_ages):
+                output[name].append(row)
+    return output
+
+@profiled(lignes=len)
 def convert_database(
     data: List[List[Any]],
 ) -> List[List[Any]]:
@@ -330,327 +602,120 @@ def convert_database(
     :return: La base de données convertie
     :rtype: List[List[Any]]
     """
+    if isinstance(data, Table): # les colonnes de la table sont déjà typées
+        return data
     for row in data:
         # on convertit la date en objet datetime.datetime si nécessaire
         if not isinstance(row[JOUR], datetime.datetime):
-            row[JOUR] = datetime.datetime.fromisoformat(row[2])
+            row[JOUR] = parse_datetime(row[JOUR])
     
     return data
 
-# Partie de traitement des images
-def export_plot_to_image(fig=None) -> Image.Image:
-    """Permet d'exporter le graphique matplotlib en image
-
-    :param fig: La figure matplotlib à convertir.
-    Si la figure n'est pas spécifiée, alors la figure courante est utilisée, par défaut à None
-    :type fig: pyplot.subplots()[1], optional
-    :return: L'image de la figure
-    :rtype: Image.Image
-    """
-    # puisqu'on ne peut enregistrer une image que dans un fichier, on
-    # crée un fichier temporaire stocké dans la mémoire
-    buffer = io.BytesIO()
-
-    # si aucune figure n'est spécifiée, on utilise la figure courante
-    if fig is None:
-        plt.savefig(buffer, format='png')
-    else:
-        fig.savefig(buffer, format='png')
-
-    # on créé un image à partir du fichier temporaire
-    img = Image.open(buffer)
-    
-    return img
-
-def get_diagram_1(database: List[List[Any]]) -> Image.Image:
-    """Retourne le prmier diagramme. Il affiche le nombre cumulé de
-    personnes vaccinées dans la région indiquée au cour du temps.
-
-    :param database: Las base de données d'où proviennent les données.
-    Elle doit être convertie avec la fonction convert_database(),
-    et doit ne contenir que les lignes de la région indiquée.
-    :type database: List[List[Any]]
-    :return: L'image correspondant au graphique
-    :rtype: Image.Image
+# Partie de génération du rapport
+def build_views(
+    database: Table,
+    reg: str,
+    date: Optional[Tuple[Union[datetime.datetime, None]]],
+) -> Dict[str, Table]:
+    """Construit les vues de la base de données utilisées par les
+    diagrammes du rapport (voir diagrams.DIAGRAMS)
+
+    :param database: La base de données complète
+    :type database: Table
+    :param reg: La région du rapport
+    :type reg: str
+    :param date: Le filtre de date (si None, pas de filtre de date)
+    :type date: Optional[Tuple[Union[datetime.datetime, None]]]
+    :return: Associe le nom de chaque vue à la base de données filtrée
+    :rtype: Dict[str, Table]
     """
-    # on récupère les données correspondant aux différents stades de
-    # vaccination
-    une_dose = [
-        float(ligne[CUMULE_DOSE1_E]) for ligne in database
-    ]
-    complet = [
-        float(ligne[CUMULE_COMPLET_E]) for ligne in database
-    ]
-    rappel = [
-        float(ligne[CUMULE_RAPPEL_E]) for ligne in database
-    ]
-    rappel_2 = [
-        float(ligne[CUMULE_2_RAPPEL_E]) for ligne in database
-    ]
-    x_axis = [
-        ligne[JOUR] for ligne in database
-    ]
-    # on créé le graphique
-    fig, ax = plt.subplots()
-    ax.set_title("Nombre cumulé de personnes vaccinées")
-    # on indique les axes
-    ax.set_ylabel("Nombre de personnes vaccinées")
-    # on tourne les valeurs de l'axe X de 30°
-    plt.xticks(rotation=30, ha="right")
-    
-    # on trace les courbes
-    ax.fill_between(x_axis, une_dose, 0, label="Une dose (partiel)", color="tab:blue")
-    ax.fill_between(x_axis, complet, 0, label="Deux doses (complet)", color="tab:orange")
-    ax.fill_between(x_axis, rappel, 0, label="Trois doses (rappel)", color="tab:green")
-    ax.fill_between(x_axis, rappel_2, 0, label="Quatre doses (rappel 2)", color="tab:olive")
-
-    # on indique l'emplacement de la légende
-    ax.legend(loc='upper left')
-    
-    return export_plot_to_image(fig)
-
-def get_diagram_2(database: List[List[Any]]) -> Image.Image:
-    """Retourne le second diagramme. Il affiche l'état de la
-    couverture vaccinale en fonction du sexe dans la région indiquée.
+    # on applique les trois filtres en un seul parcours de la base de données
+    # (la conversion des dates est faite en même temps)
+    return apply_filters(database, {
+        "fall": (reg, date, False), # suppression des régions non sélectionnées et des dates n'étant pas dans l'interval
+        "fage": (reg, date, True), # on garde toutes les classes d'âge
+        "freg": (None, date, False), # on garde toutes les régions
+    })
+
+def report_date(
+    date: Optional[Tuple[Union[datetime.datetime, None]]],
+    database_fall: Table,
+) -> datetime.datetime:
+    """Retourne la date affichée sur le rapport : la plus grande date du
+    filtre, ou la date la plus récente des données s'il n'y a pas de filtre
 
-    :param database: La base de données d'où proviennent les données.
-    Elle ne doit contenir que les données de la région indiquée.
-    :type database: List[List[Any]]
-    :return: L'image correspondant au graphique
-    :rtype: Image.Image
-    """
-    # on récupère les données du dernier jour (en assumant que les
-    # données sont triés par date)
-    last_data = database[-1]
-    
-    # on indique les étiquettes
-    axes = ['Hommes', 'Femmes', 'Couverture totale']
-    # on récupère les valeurs
-    values = [
-        float(last_data[COUV_COMPLET_H]),
-        float(last_data[COUV_COMPLET_F]),
-        float(last_data[COUV_COMPLET_E]),
-    ]
-
-    # on créé le graphique
-    fig, ax = plt.subplots()
-    # on indique le titre
-    ax.set_title(f"Couverture vaccinale")
-    # on indique les axes
-    ax.set_ylabel("Couverture vaccinale (en %)")
-
-    # on affiche le graphique
-    ax.bar(axes, values, label="Couverture vaccinale", color=["tab:red", "tab:green", "tab:grey"])
-
-    # on paramètre les axes pour une meilleur lisibilité
-    ax.axis([-1, 3, 0, 100])
-
-    return export_plot_to_image(fig)
-
-def get_diagram_3(database: List[List[Any]]) -> Image.Image:
-    """Retourne le troisième diagramme. Il affiche l'état de la
-    couverture vaccinale en fonction de la classe d'âge dans la
-    région indiquée.
-
-    :param database: La base de données d'où proviennent les données.
-    Elle doit être convertie avec la fonction convert_database(),
-    et ne doit contenir que les lignes de la région indiquée, tout en
-    conservant les données de la classe d'âge.
-    :type database: List[List[Any]]
-    :return: L'image correspondant au graphique
-    :rtype: Image.Image
+    :param date: Le filtre de date (si None, pas de filtre de date)
+    :type date: Optional[Tuple[Union[datetime.datetime, None]]]
+    :param database_fall: La vue de la région du rapport
+    :type database_fall: Table
+    :return: La date du rapport
+    :rtype: datetime.datetime
     """
-    # on créé le graphique
-    fig, ax = plt.subplots()
-    # on indique un titre
-    ax.set_title("Évolution de la couverture vaccinale")
-    # on indique les axes
-    ax.set_ylabel("Pourcentage de population vaccinée")
-    # on tourne les valeurs de l'axe X de 30°
-    plt.xticks(rotation=30, ha="right")
-    
-    # on récupère une liste de 14 couleurs
-    colors = plt.cm.brg([
-        0.,
-        0.07692308,
-        0.15384615,
-        0.23076923,
-        0.30769231,
-        0.38461538,
-        0.46153846,
-        0.53846154,
-        0.61538462,
-        0.69230769,
-        0.76923077,
-        0.84615385,
-        0.92307692,
-        1.
-    ])
-
-    for i, (code, label) in enumerate(AGES): # pour chaque classe d'âges
-        # on récupère toutes les données de la classe d'âges
-        data = [line for line in database if line[1]==code]
-        # on récupère les valeurs de la couverture vaccinale
-        couv = [float(line[COUV_COMPLET_E]) for line in data]
-        # on récupère les dates correspondantes aux valeurs
-        dates = [line[2] for line in data]
-        # on affiche le graphique
-        ax.plot(dates, couv, label=label, color=colors[i])
-    
-    # on indique l'emplacement de la légende
-    ax.legend(loc='upper left', fontsize=7)
-    
-    return export_plot_to_image(fig)
-
-def get_diagram_4(database: List[List[Any]]) -> Image.Image:
-    """Retourne le quatrième diagramme. Il affiche l'état de la
-    vaccination dans un diagrame camembert dans la région indiquée.
-
-    :param database: La base de données d'où proviennent les données.
-    Elle ne doit contenir que les informations de la région indiquée.
-    :type database: List[List[Any]]
-    :return: L'image correspondant au graphique
+    if date is not None:
+        return date[1]
+    if isinstance(database_fall, Table): # les lignes ne sont pas forcément triées par date
+        return day_to_datetime(max(database_fall.jour))
+    return max(row[JOUR] for row in database_fall)
+
+@profiled()
+def compose_report(
+    diagrams: List["Image.Image"],
+    reg: str,
+    date: datetime.datetime,
+) -> "Image.Image":
+    """Assemble les six diagrammes dans l'image finale du rapport (voir
+    composition.compose_report)
+
+    :param diagrams: Les images des diagrammes, dans l'ordre d'affichage
+    :type diagrams: List[Image.Image]
+    :param reg: La région du rapport
+    :type reg: str
+    :param date: La date du rapport
+    :type date: datetime.datetime
+    :return: L'image du rapport
     :rtype: Image.Image
     """
-    # on créé le graphique
-    fig, ax = plt.subplots()
-    # on indique le titre
-    ax.set_title(f"État de la vaccination")
-
-    # on récupère les données en prenant en compte que les données sont triées par date
-    line = database[-1]
-    # on récupère les valeurs de la couverture vaccinale
-    dose_4 = float(line[COUV_2_RAPPEL_E])
-    dose_3 = float(line[COUV_RAPPEL_E]) - dose_4
-    dose_2 = float(line[COUV_COMPLET_E]) - dose_3 - dose_4
-    dose_1 = float(line[COUV_DOSE1_E]) - dose_2 - dose_3 - dose_4
-    data = [
-        100-float(line[COUV_DOSE1_E]),
-        dose_1, dose_2, dose_3, dose_4,
-    ]
-
-    # on créé le diagramme camembert
-    ax.pie(
-        data,
-        colors=["tab:red", "tab:blue", "tab:orange", "tab:green", "tab:olive"],
-        # on spécifie la mise en forme des labels
-        textprops={'size': 'large', 'fontweight': 'bold', 'color': 'white'},
-        autopct = lambda value: f"{value:.1f}%",
-    )
-
-    # on affiche le graphique
-    ax.legend(
-        labels=["Pas vacciné", "Une dose (partiel)", "Deux doses (complet)", "Trois doses (rappel)", "Quatre doses (rappel 2)"],
-        loc="lower left",
-        bbox_to_anchor=(-0.3, 0.)
-    )
-
-    return export_plot_to_image(fig)
+    import composition
+    return composition.compose_report(diagrams, reg, date)
 
-def get_diagram_5(database: List[List[Any]]) -> Image.Image:
-    """Retourne le diagramme cinq. Il affiche la répartition de la
-    vaccination en fonction de la classe d'âge dans la région
-    indiquée.
+def next_output_path(extension: str = ".png") -> str:
+    """Retourne le premier nom de fichier de sortie disponible
 
-    :param database: La base de données d'où proviennent les données.
-    Elle ne doit contenir que les informations de la région indiquée,
-    et contenir les informations de la classe d'âge.
-    :type database: List[List[Any]]
-    :return: L'image correspondant au graphique
-    :rtype: Image.Image
+    :param extension: L'extension du fichier, par défaut ".png"
+    :type extension: str, optional
+    :return: output.png s'il n'existe pas, sinon output_1.png, output_2.png, etc.
+    :rtype: str
     """
-    # on créé le graphique
-    fig, ax = plt.subplots()
-    # on indique le titre
-    ax.set_title("Répartition des vaccinations sur les classes d'âges")
-    # on indique les axes
-    ax.set_ylabel("Classe d'âge")
-    ax.set_xlabel("Population vaccinée (en %)")
-
-    # on récupère les données par dose
-    dose_4, dose_1, dose_2, dose_3, non_vaccine = [], [], [], [], []
-    classe_age = []
-    for code, label in AGES: # pour chaque classe d'âges
-        data = [line for line in database if line[1]==code][-1]
-        # on récupère les informations les plus récentes, en
-        # assumant que les données sont triées par date croissante
-        age_dose_4 = float(data[COUV_2_RAPPEL_E])
-        age_dose_3 = float(data[COUV_RAPPEL_E]) - age_dose_4
-        age_dose_2 = float(data[COUV_COMPLET_E]) - age_dose_3 - age_dose_4
-        age_dose_1 = float(data[COUV_DOSE1_E]) - age_dose_2 - age_dose_3 - age_dose_4
-        age_0_dose = 100 - float(data[COUV_DOSE1_E])
-
-        # on ajoute les valeurs aux listes
-        non_vaccine.append(age_0_dose)
-        dose_1.append(age_dose_1 + age_0_dose)
-        dose_2.append(age_dose_2 + age_dose_1 + age_0_dose)
-        dose_3.append(age_dose_3 + age_dose_2 + age_dose_1 + age_0_dose)
-        dose_4.append(age_dose_4 + age_dose_3 + age_dose_2 + age_dose_1 + age_0_dose)
-        # on ajoute la classe d'âge à la liste
-        classe_age.append(label)
-    
-    ax.barh(classe_age, dose_3, color="tab:olive", label="Quatre doses (rappel 2)")
-    ax.barh(classe_age, dose_3, color="tab:green", label="Trois doses (rappel)")
-    ax.barh(classe_age, dose_2, color="tab:orange", label="Deux doses (complet)")
-    ax.barh(classe_age, dose_1, color="tab:blue", label="Une dose (partiel)")
-    ax.barh(classe_age, non_vaccine, color="tab:red", label="Pas vacciné")
-
-    ax.legend(
-        loc="upper right",
-    )
-
-    return export_plot_to_image(fig)
+    # si output.png existe alors on cherche un nom de fichier au format output_1.png, output_2.png, etc.
+    # sinon on prend output.png
+    if not os.path.exists(f"output{extension}"):
+        return f"output{extension}"
+    # on cherche le premier nom de fichier disponible
+    i = 1
+    while os.path.exists(f"output_{i}{extension}"):
+        i += 1
+    return f"output_{i}{extension}"
 
-def get_diagram_6(database: List[List[Any]]) -> Image.Image:
-    """Retourne le diagramme six. Il affiche les cinq régions où la
-    couverture vaccinale est la plus élevée.
+# Partie logique du script
+def run_interactive(encoder: Optional["Encoder"] = None):
+    """Génère un rapport en demandant les paramètres à l'utilisateur
 
-    :param database: La base de données d'où proviennent les données.
-    Elle doit contenir les informations de toutes les régions.
-    :type database: List[List[Any]]
-    :return: L'image correspondant au graphique
-    :rtype: Image.Image
+    :param encoder: Les paramètres d'encodage du rapport, par défaut None (png)
+    :type encoder: Optional[Encoder], optional
     """
-    # on créé le graphique
-    fig, ax = plt.subplots()
-    # on indique le titre
-    ax.set_title("5 régions ayant la meilleure couverture vaccinale")
-    # on indique les axes
-    ax.set_ylabel("Couverture vaccinale (en %)")
-    # on tourne les labels de l'axe x de 10°
-    plt.xticks(rotation=10, ha="right")
-
-    regions = []
-    for code, nom in REGIONS.items(): # pour chaque région
-        reg_data = [data for data in database if data[0] == code]
-        # on récupère les informations les plus récentes, en assumant
-        # que les données sont triées par date croissante et limitée
-        # à la date recherchée
-        regions.append(
-            [code, float(reg_data[-1][COUV_COMPLET_E]), nom]
-        )
-    
-    # on trie les régions par ordre décroissant
-    regions.sort(key=lambda reg: reg[1], reverse=True)
-    regions = regions[:5] # on récupère les 5 régions qui ont la plus haute couverture
-    
-    # on paramétre les axes pour une meilleur lisibilité
-    ax.axis([-1, 5, 0, 100])
-
-    # on affiche la barre pour chaque région
-    for code, couv, nom in regions:
-        ax.bar(nom, couv)
-    
-    return export_plot_to_image(fig)
-
-# Partie logique du script
-if __name__ == "__main__": # on permet à un autre programme d'utiliser le code
+    from composition import Encoder
+    if encoder is None:
+        encoder = Encoder()
     database_path = ask_file()
     
     print("Chargement du fichier...", end=" ", flush=True)
     # end permet de ne pas mettre de retour à la ligne
     # flush permet d'afficher le texte immédiatement sans attendre le retour à la ligne
-    database = load_file(database_path)
+    try:
+        database = load_database(database_path)
+    except ValueError as e:
+        print(f"{COLORS['fg']['red']}Le fichier {database_path} est invalide : {e}{COLORS['reset']}")
+        return
     print(f"{COLORS['fg']['green']}Fait{COLORS['reset']}")
 
     reg = None
@@ -661,7 +726,7 @@ if __name__ == "__main__": # on permet à un autre programme d'utiliser le code
             reg = None
         else:
             print("Vérification du filtre...", end=" ", flush=True)
-            if [reg] not in projection(database, (0,)): # on valide le code de la région pour éviter de n'avoir aucunes données
+            if not database.has_region(reg): # on valide le code de la région pour éviter de n'avoir aucunes données
                 print(f"{COLORS['fg']['red']}Filtre invalide{COLORS['reset']}")
                 reg = None
             else:
@@ -691,69 +756,127 @@ if __name__ == "__main__": # on permet à un autre programme d'utiliser le code
     # date du filtre
     
     print("Application du filtre et conversion des données...", end=" ", flush=True)
-    not_filtered_database = database
-    database_fall = apply_filter(database, reg, date) # on applique le filtre (suppression des régions non sélectionnées et suppression des dates n'étant pas dans l'interval)
-    database_fage = apply_filter(database, reg, date, True) # on applique le filtre en gardant toutes les classes d'âge
-    database_freg = apply_filter(database, None, date) # on applique le filtre en gardant toutes les régions
-    # conversion des dates en objets datetime.datetime en utilisant le format ISO
-    database_fall = convert_database(database_fall)
-    database_fage = convert_database(database_fage)
-    database_freg = convert_database(database_freg)
+    views = build_views(database, reg, date)
+    if len(views["fall"]) == 0: # les diagrammes ne peuvent pas être calculés
+        print(f"{COLORS['fg']['red']}Aucune donnée pour ces dates{COLORS['reset']}")
+        return
     print(f"{COLORS['fg']['green']}Fait{COLORS['reset']}")
 
     print("Génération des images...", end=" ", flush=True)
-    diagram1 = get_diagram_1(database_fall)
-    diagram2 = get_diagram_2(database_fall)
-    diagram3 = get_diagram_3(database_fage)
-    diagram4 = get_diagram_4(database_fall)
-    diagram5 = get_diagram_5(database_fage)
-    diagram6 = get_diagram_6(database_freg)
+    # les diagrammes sont générés en parallèle dans plusieurs processus
+    diagrams = render_diagrams(views)
     print(f"{COLORS['fg']['green']}Fait{COLORS['reset']}")
 
     print("Génération de l'image finale...", end=" ", flush=True)
+    img = compose_report(diagrams, reg, report_date(date, views["fall"]))
+    output_path = next_output_path(encoder.extension)
+
+    # on enregistre l'image dans le fichier output.png
+    with span("save"):
+        encoder.save(img, output_path)
     
-    # exportation des images dans une seule image
-    diagram_size_x, diagram_size_y = diagram1.size
-
-    # on crée une image vide avec un fond blanc
-    img = Image.new("RGB", (diagram_size_x * 2, diagram_size_y * 3 + 64), "white")
-
-    # on affiche "Données relatives à la COVID-19" en haut de l'image
-    img_draw = ImageDraw.Draw(img)
-    font = ImageFont.truetype("arial.ttf", 60)
-    img_draw.text((diagram_size_x, 24), "Données relatives à la COVID-19", (0, 0, 0), font=font, anchor="mm")
-
-    # on colle les diagrammes dans l'image
-    img.paste(diagram1, (0, 64))
-    img.paste(diagram2, (diagram_size_x, 64))
-    img.paste(diagram3, (0, diagram_size_y + 64))
-    img.paste(diagram4, (diagram_size_x, diagram_size_y + 64))
-    img.paste(diagram5, (0, diagram_size_y * 2 + 64))
-    img.paste(diagram6, (diagram_size_x, diagram_size_y * 2 + 64))
-
-    # on affiche en petit le nom de la région en dessous du titre
-    # cette ligne de code risque de provoquer une erreur sur linux ou macos
-    font = ImageFont.truetype("arial.ttf", 30)
-    if date is not None:
-        # on formate la date au format "jour/mois/année"
-        formated_date = time.strftime("%d/%m/%Y", date[1].timetuple())
-    else:
-        last_date = database_fall[-1][JOUR]
-        formated_date = time.strftime("%d/%m/%Y", last_date.timetuple())
-    img_draw.text((diagram_size_x, 60), f"Région : {REGIONS[reg]}, date : {formated_date}", (0, 0, 0), font=font, anchor="mm")
+    print(f"{COLORS['fg']['green']}Fait{COLORS['reset']}")
 
-    # si output.png existe alors on cherche un nom de fichier au format output_1.png, output_2.png, etc.
-    # sinon on prend output.png
-    if not os.path.exists("output.png"):
-        output_path = "output.png"
+def parse_arguments(arguments: Optional[List[str]] = None) -> argparse.Namespace:
+    """Lit les arguments de la ligne de commande
+
+    :param arguments: Les arguments à lire, par défaut None (ceux du programme)
+    :type arguments: Optional[List[str]], optional
+    :return: Les arguments lus
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Génère des rapports sur la vaccination contre la COVID-19. Sans commande, les paramètres sont demandés à l'utilisateur.",
+    )
+    parser.add_argument("--backend", choices=list(BACKENDS), default=BACKEND, help=f"le moteur de dessin des diagrammes (par défaut {BACKEND}), pillow est plus rapide que matplotlib")
+    parser.add_argument("--profile", choices=PROFILE_FORMATS, default=None, help="mesure la durée, le temps processeur et la mémoire de chaque étape, et les affiche dans un tableau (table) ou les enregistre au format des traces de Chrome (json)")
+    parser.add_argument("--profile-output", default="profile.json", help="le fichier de la trace de --profile json (par défaut profile.json)")
+    parser.add_argument("--profile-no-memory", dest="profile_memory", action="store_false", help="ne mesure pas la mémoire avec --profile (tracemalloc ralentit le programme et fausse les durées)")
+    parser.add_argument("--image-format", choices=["png", "webp", "jpeg"], default="png", help="le format des rapports (par défaut png)")
+    parser.add_argument("--compress-level", type=int, default=6, help="le niveau de compression png, de 0 (plus rapide) à 9 (plus petit) (par défaut 6)")
+    parser.add_argument("--optimize", action="store_true", help="cherche la plus petite image possible, beaucoup plus lent")
+    parser.add_argument("--quality", type=int, default=90, help="la qualité des formats webp et jpeg, de 1 à 100 (par défaut 90)")
+    commands = parser.add_subparsers(dest="mode")
+
+    batch_parser = commands.add_parser(
+        "batch",
+        help="génère les rapports de plusieurs régions et plusieurs dates sans interaction",
+    )
+    batch_parser.add_argument("--file", help="le fichier csv à lire (par défaut, détection automatique)")
+    batch_parser.add_argument("--regions", default="all", help="les codes des régions séparés par des virgules, ou all (par défaut)")
+    batch_parser.add_argument("--dates", default=None, help="la date ou l'intervalle de dates des rapports, au format AAAA-MM-JJ..AAAA-MM-JJ (par défaut, la date la plus récente)")
+    batch_parser.add_argument("--step", default="7d", help="l'écart entre deux dates de l'intervalle, en jours (par défaut 7d)")
+    batch_parser.add_argument("--output", default="rapports", help="le dossier où enregistrer les rapports (par défaut rapports)")
+    batch_parser.add_argument("--processes", type=int, default=None, help="le nombre de processus (par défaut, un par cœur)")
+
+    serve_parser = commands.add_parser(
+        "serve",
+        help="démarre un serveur HTTP qui génère les rapports à la demande",
+    )
+    serve_parser.add_argument("--file", help="le fichier csv à servir (par défaut, le fichier le plus récent du dossier)")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="l'adresse d'écoute (par défaut 127.0.0.1)")
+    serve_parser.add_argument("--port", type=int, default=8000, help="le port d'écoute (par défaut 8000)")
+    serve_parser.add_argument("--processes", type=int, default=None, help="le nombre de processus (par défaut, un par cœur)")
+    serve_parser.add_argument("--interval", type=float, default=30, help="le temps en secondes entre deux vérifications du fichier (par défaut 30)")
+    serve_parser.add_argument("--cache-size", type=int, default=64, help="la taille maximale en Mo des images gardées en mémoire (par défaut 64)")
+    serve_parser.add_argument("--cache-dir", default=None, help="le dossier où enregistrer les images générées (par défaut, seulement en mémoire)")
+
+    validate_parser = commands.add_parser(
+        "validate",
+        help="vérifie le fichier csv sans générer de rapport",
+    )
+    validate_parser.add_argument("--file", help="le fichier csv à vérifier (par défaut, le fichier le plus récent du dossier)")
+
+    stats_parser = commands.add_parser(
+        "stats",
+        help="charge et filtre les données sans générer de rapport, et affiche la durée de chaque étape",
+    )
+    stats_parser.add_argument("--file", help="le fichier csv à lire (par défaut, le fichier le plus récent du dossier)")
+    stats_parser.add_argument("--region", default=None, help="le code de la région à filtrer (par défaut, pas de filtre)")
+    stats_parser.add_argument("--dates", default=None, help="l'intervalle de dates du filtre, au format AAAA-MM-JJ..AAAA-MM-JJ (par défaut, toutes les dates)")
+    stats_parser.add_argument(
+        "--format",
+        choices=["text", "json", "csv"],
+        default="text",
+        help="text affiche un résumé et la durée de chaque étape, json et csv écrivent les valeurs des diagrammes du rapport (par défaut, text)",
+    )
+
+    return parser.parse_args(arguments)
+
+def run_command(arguments: argparse.Namespace):
+    """Exécute la commande indiquée par les arguments de la ligne de
+    commande, ou le mode interactif s'il n'y a pas de commande
+
+    :param arguments: Les arguments lus par parse_arguments
+    :type arguments: argparse.Namespace
+    """
+    if arguments.mode == "batch":
+        from batch import run_batch_command
+        run_batch_command(arguments)
+    elif arguments.mode == "serve":
+        from server import run_serve_command
+        run_serve_command(arguments)
+    elif arguments.mode == "validate":
+        from validation import run_validate_command
+        run_validate_command(arguments)
+    elif arguments.mode == "stats":
+        from summary import run_stats_command
+        run_stats_command(arguments)
     else:
-        # on cherche le premier nom de fichier disponible
-        i = 1
-        while os.path.exists(f"output_{i}.png"):
-            i += 1
-        output_path = f"output_{i}.png"
+        from composition import encoder_from_arguments
+        try:
+            encoder = encoder_from_arguments(arguments)
+        except ValueError as e:
+            raise SystemExit(f"{COLORS['fg']['red']}{e}{COLORS['reset']}")
+        run_interactive(encoder)
 
-    # on enregistre l'image dans le fichier output.png
-    img.save(output_path)
-    
-    print(f"{COLORS['fg']['green']}Fait{COLORS['reset']}")
\ No newline at end of file
+if __name__ == "__main__": # on permet à un autre programme d'utiliser le code
+    arguments = parse_arguments()
+    set_backend(arguments.backend)
+    if arguments.profile is not None:
+        PROFILER.enable(arguments.profile_memory)
+    try:
+        run_command(arguments)
+    finally:
+        if arguments.profile is not None:
+            write_profile(arguments.profile, arguments.profile_output)
@@ -0,0 +1,251 @@
+""" Ce fichier contient la génération de nombreux rapports en chaîne.
+
+Chaque rapport passe par trois étapes, exécutées en même temps sur des
+rapports différents :
+
+1. le filtre : les vues de la base de données du rapport sont construites
+   dans ce processus (voir main.build_views) ;
+2. le rendu : les diagrammes sont générés et assemblés dans un groupe de
+   processus, qui ne reçoit que les vues du rapport ;
+3. l'encodage : l'image du rapport est encodée et enregistrée dans des
+   threads (voir composition.BackgroundWriter).
+
+Les étapes sont reliées par des files de taille limitée : quand une étape
+est plus lente que la précédente, la précédente attend. Le nombre de
+rapports en mémoire reste donc limité, même pour des milliers de rapports.
+"""
+
+# Importations nécessaire pour le typing
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+# Importation des modules nécessaires à la gestion des étapes
+import os
+import time
+import queue
+import threading
+
+# Importation des module nécessaire à la gestion du temps
+import datetime
+
+from table import Table
+from render import create_pool, render_diagrams
+from profiling import span, call_profiled, PROFILER
+from main import build_views, report_date, compose_report
+
+if TYPE_CHECKING:
+    from PIL import Image
+    from composition import Encoder
+
+# Tâche de génération d'un rapport : la région, la date du rapport (None
+# pour la date la plus récente) et l'emplacement du fichier
+Tache = Tuple[str, Optional[datetime.datetime], str]
+
+# Temps (en secondes) entre deux vérifications de l'arrêt des étapes
+# quand elles attendent une place dans une file
+ATTENTE = 0.1
+
+def render_views_report(views: Dict[str, Table], reg: str, date: datetime.datetime) -> "Image.Image":
+    """Génère les diagrammes d'un rapport et les assemble.
+    Cette fonction est exécutée dans les processus du groupe.
+
+    :param views: Les vues de la base de données du rapport
+    :type views: Dict[str, Table]
+    :param reg: La région du rapport
+    :type reg: str
+    :param date: La date affichée sur le rapport
+    :type date: datetime.datetime
+    :return: L'image du rapport
+    :rtype: Image.Image
+    """
+    return compose_report(render_diagrams(views, processes=1), reg, date)
+
+class ReportPipeline:
+    """Génère des rapports en chaîne (voir le début du fichier)"""
+
+    def __init__(
+        self,
+        database: Table,
+        encoder: Optional["Encoder"] = None,
+        processes: Optional[int] = None,
+        threads: int = 2,
+        taille_files: Optional[int] = None,
+    ):
+        """
+        :param database: La base de données complète
+        :type database: Table
+        :param encoder: Les paramètres d'encodage des rapports, par défaut None (png)
+        :type encoder: Optional[Encoder], optional
+        :param processes: Le nombre de processus de rendu, par défaut None (un par cœur)
+        :type processes: Optional[int], optional
+        :param threads: Le nombre de threads d'encodage, par défaut 2
+        :type threads: int, optional
+        :param taille_files: Le nombre maximal de rapports en attente entre
+        deux étapes, par défaut None (deux fois le nombre de processus)
+        :type taille_files: Optional[int], optional
+        """
+        from composition import Encoder
+        self.database = database
+        self.encoder = encoder if encoder is not None else Encoder()
+        self.processes = processes or os.cpu_count() or 1
+        self.threads = threads
+        self.taille_files = taille_files or 2 * self.processes
+        # demande l'arrêt des étapes exécutées dans des threads
+        self.arret = threading.Event()
+
+    def _put(self, file: "queue.Queue", element) -> bool:
+        """Ajoute un élément à une file de taille limitée, en attendant
+        une place tant que l'arrêt n'est pas demandé
+
+        :return: False si l'arrêt a été demandé avant que l'élément soit ajouté
+        :rtype: bool
+        """
+        while not self.arret.is_set():
+            try:
+                file.put(element, timeout=ATTENTE)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _filter(self, taches: List[Tache], filtres: "queue.Queue", rendus: "queue.Queue"):
+        """Étape du filtre (exécutée dans un thread) : construit les vues
+        de chaque rapport. Les rapports sans données sont envoyés
+        directement à l'étape d'encodage avec leur erreur. Une erreur
+        inattendue est envoyée à l'étape d'encodage, qui la relance."""
+        try:
+            for reg, date, chemin in taches:
+                if self.arret.is_set():
+                    return
+                filtre = (None, date) if date is not None else None
+                try:
+                    with span("filtre"):
+                        views = build_views(self.database, reg, filtre)
+                    if len(views["fall"]) == 0:
+                        raise ValueError("aucune donnée avant cette date")
+                except Exception as e:
+                    rendus.put((chemin, e))
+                    continue
+                # on attend si l'étape de rendu a déjà assez de rapports en attente
+                if not self._put(filtres, (views, reg, report_date(filtre, views["fall"]), chemin)):
+                    return
+        except BaseException as e:
+            # les rapports restants n'arriveront jamais à l'étape d'encodage
+            rendus.put((None, e))
+        finally:
+            self._put(filtres, None) # fin des rapports
+
+    def _dispatch(self, pool, filtres: "queue.Queue", rendus: "queue.Queue", places: threading.Semaphore):
+        """Étape du rendu (exécutée dans un thread) : envoie les vues des
+        rapports au groupe de processus. Le nombre de rapports envoyés et
+        pas encore encodés est limité par places. Comme pour _filter, une
+        erreur inattendue est envoyée à l'étape d'encodage."""
+        try:
+            while not self.arret.is_set():
+                try:
+                    element = filtres.get(timeout=ATTENTE)
+                except queue.Empty:
+                    continue
+                if element is None:
+                    return
+                views, reg, date, chemin = element
+                while not places.acquire(timeout=ATTENTE):
+                    if self.arret.is_set():
+                        return
+                try:
+                    if PROFILER.actif:
+                        # le rapport est mesuré dans son processus (voir profiling.call_profiled)
+                        future = pool.submit(call_profiled, render_views_report, "rapport", len(views["fall"]), PROFILER.memoire, views, reg, date)
+                    else:
+                        future = pool.submit(render_views_report, views, reg, date)
+                except Exception as e: # le groupe de processus a été arrêté
+                    places.release()
+                    rendus.put((chemin, e))
+                    continue
+                future.add_done_callback(lambda future, chemin=chemin: rendus.put((chemin, future)))
+        except BaseException as e:
+            # les rapports restants n'arriveront jamais à l'étape d'encodage
+            rendus.put((None, e))
+
+    def run(
+        self,
+        taches: List[Tache],
+        progression: Optional[Callable[[int, int, float], None]] = None,
+    ) -> Tuple[List[str], List[Tuple[str, str]], float]:
+        """Génère les rapports
+
+        :param taches: Les rapports à générer : la région, la date (None
+        pour la date la plus récente) et l'emplacement du fichier
+        :type taches: List[Tache]
+        :param progression: Fonction appelée après chaque rapport avec le
+        nombre de rapports terminés, le nombre total de rapports et le
+        débit en rapports par seconde, par défaut None
+        :type progression: Optional[Callable[[int, int, float], None]], optional
+        :return: Les emplacements des rapports générés, les rapports qui
+        n'ont pas pu être générés avec la raison de l'erreur, et le débit
+        en rapports par seconde
+        :rtype: Tuple[List[str], List[Tuple[str, str]], float]
+        :raises ValueError: Si la base de données contient plusieurs lignes
+        le même jour pour une région et une classe d'âge (voir stats.check_days)
+        """
+        from composition import BackgroundWriter
+        from stats import share_cube
+
+        generes, erreurs = [], []
+        verrou = threading.Lock()
+        debut = time.perf_counter()
+
+        def debit() -> float:
+            duree = time.perf_counter() - debut
+            return len(generes) / duree if duree > 0 else 0.
+
+        def termine(chemin: str, erreur: Optional[BaseException] = None):
+            with verrou:
+                if erreur is None:
+                    generes.append(chemin)
+                else:
+                    erreurs.append((chemin, str(erreur)))
+                if progression is not None:
+                    progression(len(generes) + len(erreurs), len(taches), debit())
+
+        self.arret.clear()
+        filtres = queue.Queue(self.taille_files)
+        rendus = queue.Queue()
+        places = threading.Semaphore(self.taille_files)
+        # le cube de la base de données est envoyé une seule fois à chaque
+        # processus, les vues reçues l'utilisent au lieu de construire le leur
+        pool = create_pool(min(self.processes, max(len(taches), 1)), share_cube(self.database))
+        etape_filtre = threading.Thread(target=self._filter, args=(taches, filtres, rendus), daemon=True)
+        etape_rendu = threading.Thread(target=self._dispatch, args=(pool, filtres, rendus, places), daemon=True)
+        etape_filtre.start()
+        etape_rendu.start()
+        try:
+            # étape de l'encodage, dans ce thread et ceux de writer
+            with BackgroundWriter(self.encoder, self.taille_files, self.threads) as writer:
+                for _ in range(len(taches)):
+                    chemin, resultat = rendus.get()
+                    if chemin is None: # une étape s'est arrêtée sur une erreur inattendue
+                        raise resultat
+                    if isinstance(resultat, BaseException): # erreur de l'étape du filtre
+                        termine(chemin, resultat)
+                        continue
+                    try:
+                        img = resultat.result()
+                        if PROFILER.actif:
+                            img, spans = img
+                            PROFILER.add(spans)
+                    except Exception as e:
+                        places.release()
+                        termine(chemin, e)
+                        continue
+                    # on attend si trop d'images attendent déjà d'être encodées
+                    future = writer.submit(img, chemin)
+                    places.release()
+                    future.add_done_callback(lambda future, chemin=chemin: termine(chemin, future.exception()))
+        finally:
+            # après une erreur (ou une interruption), les étapes peuvent
+            # attendre une place dans une file : on leur demande de s'arrêter
+            self.arret.set()
+            pool.shutdown(cancel_futures=True)
+            etape_filtre.join()
+            etape_rendu.join()
+        return generes, erreurs, debit()
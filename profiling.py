@@ -0,0 +1,314 @@
+""" Ce fichier contient la mesure des étapes du programme (option
+--profile).
+
+Chaque étape mesurée est une « span » : elle est délimitée par le
+gestionnaire de contexte span() ou par le décorateur profiled(). Pour
+chaque span, on garde le temps écoulé, le temps processeur, le pic de
+mémoire (avec tracemalloc) et le nombre de lignes traitées. Les spans
+peuvent être imbriquées : le pic de mémoire d'une span contient celui
+des spans qu'elle contient.
+
+Les mesures sont désactivées par défaut, les spans ne coûtent alors
+qu'un test. Les processus de rendu désactivent les mesures héritées du
+processus principal (voir render.init_pool_worker) : les diagrammes et les
+rapports générés dans ces processus (voir render.py et pipeline.py) sont
+mesurés avec call_profiled, puis leurs spans sont ajoutées à celles du
+processus principal.
+
+Les mesures sont affichées sous forme de tableau, ou enregistrées au
+format des traces de Chrome (chrome://tracing ou https://ui.perfetto.dev).
+"""
+
+# Importations nécessaire pour le typing
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple
+
+# Importation des modules nécessaires à la mesure
+import os
+import sys
+import json
+import time
+import functools
+import itertools
+import threading
+import contextlib
+import tracemalloc
+
+# Formats de sortie de l'option --profile
+FORMATS = ["table", "json"]
+
+# Numéros des spans du processus
+_NUMEROS = itertools.count()
+
+class Span:
+    """Une étape mesurée"""
+
+    def __init__(self, nom: str, parent: Optional["Span"], memoire: bool, lignes: Optional[int] = None):
+        self.nom = nom
+        self.parent = parent
+        self.profondeur = parent.profondeur + 1 if parent is not None else 0
+        # identifiant unique, y compris entre les processus
+        self.id = f"{os.getpid()}-{next(_NUMEROS)}"
+        # nombre de lignes traitées, peut être indiqué pendant la span
+        self.lignes = lignes
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.debut = time.perf_counter()
+        self.debut_cpu = time.process_time()
+        self.duree = 0.
+        self.cpu = 0.
+        self.memoire: Optional[int] = None
+        # pic de mémoire des spans déjà terminées à l'intérieur de celle-ci
+        self._pic = 0
+        self._base = 0
+        if memoire:
+            if parent is not None:
+                # le pic de la span parente doit être gardé avant d'être remis à zéro
+                parent._pic = max(parent._pic, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._base = tracemalloc.get_traced_memory()[0]
+
+    def finish(self):
+        """Termine la mesure de la span"""
+        self.duree = time.perf_counter() - self.debut
+        self.cpu = time.process_time() - self.debut_cpu
+        if tracemalloc.is_tracing():
+            pic = max(self._pic, tracemalloc.get_traced_memory()[1])
+            self.memoire = max(0, pic - self._base)
+            if self.parent is not None:
+                self.parent._pic = max(self.parent._pic, pic)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Retourne la span sous forme de dictionnaire, pour l'envoyer
+        d'un processus à l'autre"""
+        return {
+            "id": self.id,
+            "parent": self.parent.id if self.parent is not None else None,
+            "nom": self.nom,
+            "profondeur": self.profondeur,
+            "lignes": self.lignes,
+            "pid": self.pid,
+            "tid": self.tid,
+            "debut": self.debut,
+            "duree": self.duree,
+            "cpu": self.cpu,
+            "memoire": self.memoire,
+        }
+
+class Profiler:
+    """Collecte les spans du processus"""
+
+    def __init__(self):
+        self.actif = False
+        self.memoire = False
+        self.spans: List[Dict[str, Any]] = []
+        # spans en cours de chaque thread
+        self._local = threading.local()
+        self._verrou = threading.Lock()
+
+    def enable(self, memoire: bool = True):
+        """Active les mesures
+
+        :param memoire: Si True, le pic de mémoire de chaque span est
+        mesuré avec tracemalloc (ce qui ralentit le programme), par défaut True
+        :type memoire: bool, optional
+        """
+        self.actif = True
+        self.memoire = memoire
+        if memoire and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        """Désactive les mesures"""
+        self.actif = False
+        if self.memoire and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.memoire = False
+
+    def reset(self):
+        """Désactive les mesures et oublie les spans mesurées. Un processus
+        créé avec fork hérite des spans et de l'état du processus principal,
+        il doit donc appeler cette méthode avant ses propres mesures."""
+        self.disable()
+        self.spans = []
+        self._local = threading.local()
+
+    def _stack(self) -> List[Span]:
+        """Retourne les spans en cours du thread actuel"""
+        pile = getattr(self._local, "pile", None)
+        if pile is None:
+            pile = self._local.pile = []
+        return pile
+
+    @contextlib.contextmanager
+    def span(self, nom: str, lignes: Optional[int] = None):
+        """Mesure le bloc de code contenu dans le with
+
+        :param nom: Le nom de l'étape
+        :type nom: str
+        :param lignes: Le nombre de lignes traitées, qui peut aussi être
+        indiqué dans le bloc avec l'attribut lignes de la span, par défaut None
+        :type lignes: Optional[int], optional
+        """
+        if not self.actif:
+            yield None
+            return
+        pile = self._stack()
+        courante = Span(nom, pile[-1] if pile else None, self.memoire and tracemalloc.is_tracing(), lignes)
+        pile.append(courante)
+        try:
+            yield courante
+        finally:
+            pile.pop()
+            courante.finish()
+            with self._verrou:
+                self.spans.append(courante.to_dict())
+
+    def add(self, spans: List[Dict[str, Any]]):
+        """Ajoute des spans mesurées dans un autre processus
+
+        :param spans: Les spans (voir Span.to_dict)
+        :type spans: List[Dict[str, Any]]
+        """
+        # les spans sont placées sous la span en cours
+        pile = self._stack()
+        parent = pile[-1].id if pile else None
+        profondeur = pile[-1].profondeur + 1 if pile else 0
+        with self._verrou:
+            for span in spans:
+                self.spans.append(dict(
+                    span,
+                    parent=span["parent"] if span["parent"] is not None else parent,
+                    profondeur=span["profondeur"] + profondeur,
+                ))
+
+    def ordered(self) -> List[Dict[str, Any]]:
+        """Retourne les spans dans l'ordre de leur début, chaque span
+        étant suivie des spans qu'elle contient"""
+        enfants: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for span in sorted(self.spans, key=lambda span: span["debut"]):
+            enfants.setdefault(span["parent"], []).append(span)
+        output = []
+        pile = list(reversed(enfants.get(None, [])))
+        while pile:
+            span = pile.pop()
+            output.append(span)
+            pile.extend(reversed(enfants.get(span["id"], [])))
+        return output
+
+    def write_table(self, file: TextIO = sys.stderr):
+        """Affiche les spans sous forme de tableau (voir ordered)"""
+        file.write(f"{'étape':<32}{'lignes':>10}{'temps (ms)':>12}{'cpu (ms)':>10}{'mémoire (Mo)':>14}{'pid':>8}\n")
+        for span in self.ordered():
+            nom = "  " * span["profondeur"] + span["nom"]
+            lignes = span["lignes"] if span["lignes"] is not None else ""
+            memoire = f"{span['memoire'] / 1e6:.1f}" if span["memoire"] is not None else ""
+            file.write(f"{nom:<32}{lignes:>10}{span['duree'] * 1000:>12.1f}{span['cpu'] * 1000:>10.1f}{memoire:>14}{span['pid']:>8}\n")
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Retourne les spans au format des traces de Chrome. Les temps
+        de time.perf_counter sont communs à tous les processus (sous
+        linux), les spans des différents processus sont donc alignées.
+
+        :return: La trace, à enregistrer en json
+        :rtype: Dict[str, Any]
+        """
+        debut = min((span["debut"] for span in self.spans), default=0.)
+        evenements = []
+        for span in self.spans:
+            arguments = {"cpu_ms": round(span["cpu"] * 1000, 3)}
+            if span["lignes"] is not None:
+                arguments["lignes"] = span["lignes"]
+            if span["memoire"] is not None:
+                arguments["memoire"] = span["memoire"]
+            evenements.append({
+                "name": span["nom"],
+                "ph": "X", # évènement complet, avec sa durée
+                "ts": (span["debut"] - debut) * 1e6, # en microsecondes
+                "dur": span["duree"] * 1e6,
+                "pid": span["pid"],
+                "tid": span["tid"],
+                "args": arguments,
+            })
+        return {"traceEvents": evenements, "displayTimeUnit": "ms"}
+
+    def write_json(self, chemin: str):
+        """Enregistre les spans au format des traces de Chrome"""
+        with open(chemin, "w", encoding="utf-8") as file:
+            json.dump(self.chrome_trace(), file)
+
+# Mesures du processus
+PROFILER = Profiler()
+
+def span(nom: str, lignes: Optional[int] = None):
+    """Mesure un bloc de code avec le profiler du processus (voir Profiler.span)"""
+    return PROFILER.span(nom, lignes)
+
+def profiled(nom: Optional[str] = None, lignes: Optional[Callable[[Any], int]] = None):
+    """Décorateur mesurant chaque appel de la fonction
+
+    :param nom: Le nom de l'étape, par défaut None (le nom de la fonction)
+    :type nom: Optional[str], optional
+    :param lignes: Une fonction calculant le nombre de lignes traitées à
+    partir du résultat, par défaut None (pas de nombre de lignes)
+    :type lignes: Optional[Callable[[Any], int]], optional
+    """
+    def decorateur(fonction):
+        nom_span = nom or fonction.__name__
+        @functools.wraps(fonction)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.actif:
+                return fonction(*args, **kwargs)
+            with PROFILER.span(nom_span) as courante:
+                output = fonction(*args, **kwargs)
+                if lignes is not None:
+                    courante.lignes = lignes(output)
+                return output
+        return wrapper
+    return decorateur
+
+def call_profiled(
+    fonction: Callable[..., Any],
+    nom: str,
+    lignes: Optional[int],
+    memoire: bool,
+    *args,
+) -> Tuple[Any, List[Dict[str, Any]]]:
+    """Appelle une fonction en la mesurant, dans un autre processus.
+    Le résultat est retourné avec les spans mesurées, qui sont ensuite
+    ajoutées au profiler du processus principal avec Profiler.add.
+
+    :param fonction: La fonction à appeler
+    :type fonction: Callable[..., Any]
+    :param nom: Le nom de l'étape
+    :type nom: str
+    :param lignes: Le nombre de lignes traitées
+    :type lignes: Optional[int]
+    :param memoire: Si True, le pic de mémoire est mesuré
+    :type memoire: bool
+    :return: Le résultat de la fonction et les spans mesurées
+    :rtype: Tuple[Any, List[Dict[str, Any]]]
+    """
+    # un processus créé avec fork hérite des spans du processus principal
+    PROFILER.reset()
+    PROFILER.enable(memoire)
+    try:
+        with PROFILER.span(nom, lignes):
+            output = fonction(*args)
+        return output, PROFILER.spans
+    finally:
+        PROFILER.disable()
+
+def write_profile(format: str, chemin: str = "profile.json"):
+    """Affiche ou enregistre les mesures du processus
+
+    :param format: "table" pour afficher un tableau, "json" pour
+    enregistrer une trace au format de Chrome
+    :type format: str
+    :param chemin: L'emplacement de la trace json, par défaut "profile.json"
+    :type chemin: str, optional
+    """
+    if format == "json":
+        PROFILER.write_json(chemin)
+        print(f"Mesures enregistrées dans {chemin}", file=sys.stderr)
+    else:
+        PROFILER.write_table()
@@ -0,0 +1,163 @@
+""" Ce fichier gère la génération des diagrammes en parallèle.
+
+Chaque diagramme est indépendant des autres, ils sont donc générés en
+même temps dans plusieurs processus. Chaque processus utilise le moteur
+de rendu Agg de matplotlib (sans fenêtre), et reçoit uniquement la vue
+de la base de données dont son diagramme a besoin.
+
+Les diagrammes peuvent aussi être dessinés directement avec pillow
+(voir lightdiagrams.py), ce qui évite d'importer matplotlib. Le moteur
+est choisi avec set_backend, ou la variable d'environnement VACSI_BACKEND.
+"""
+
+# Importations nécessaire pour le typing
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+# Importation du module de gestion des processus
+import os
+import importlib
+
+from table import Table
+from profiling import span, call_profiled, PROFILER
+
+# Ces modules sont longs à importer, ils ne sont importés qu'au moment
+# du rendu : le programme peut ainsi lire et filtrer les données sans eux
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+    from PIL import Image
+    from stats import AsOfCube
+
+# Moteurs de dessin disponibles, avec le module contenant leurs diagrammes
+BACKENDS = {
+    "matplotlib": "diagrams",
+    "pillow": "lightdiagrams",
+}
+# Moteur de dessin utilisé
+BACKEND = os.environ.get("VACSI_BACKEND", "matplotlib")
+
+def set_backend(backend: str):
+    """Choisit le moteur de dessin des diagrammes
+
+    :param backend: Le nom du moteur (voir BACKENDS)
+    :type backend: str
+    """
+    global BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Le moteur {backend} n'existe pas, choisissez parmi {', '.join(BACKENDS)}.")
+    BACKEND = backend
+
+def get_diagrams(backend: Optional[str] = None) -> List[Tuple[Callable[[Table], "Image.Image"], str]]:
+    """Retourne la liste des diagrammes du rapport dessinés avec le moteur
+    indiqué. Le module du moteur n'est importé qu'à ce moment.
+
+    :param backend: Le nom du moteur, par défaut None (le moteur choisi)
+    :type backend: Optional[str], optional
+    :return: Les diagrammes avec le nom de la vue qu'ils utilisent
+    :rtype: List[Tuple[Callable[[Table], Image.Image], str]]
+    """
+    return importlib.import_module(BACKENDS[backend or BACKEND]).DIAGRAMS
+
+def init_worker(backend: Optional[str] = None):
+    """Initialise un processus de rendu : matplotlib doit utiliser le
+    moteur Agg avant la création de la première figure
+
+    :param backend: Le moteur de dessin du processus, par défaut None (le moteur choisi)
+    :type backend: Optional[str], optional
+    """
+    if backend is not None:
+        set_backend(backend)
+    if BACKEND == "matplotlib":
+        import matplotlib
+        matplotlib.use("Agg")
+
+def init_pool_worker(backend: Optional[str] = None, cube: Optional[Tuple[str, "AsOfCube"]] = None):
+    """Initialise un processus du groupe de rendu (voir init_worker). Les
+    mesures héritées du processus principal sont désactivées : les
+    fonctions exécutées dans le groupe ne sont mesurées qu'avec call_profiled.
+
+    :param backend: Le moteur de dessin du processus, par défaut None (le moteur choisi)
+    :type backend: Optional[str], optional
+    :param cube: L'empreinte de la base de données et son cube, utilisé
+    par les vues reçues (voir stats.share_cube), par défaut None
+    :type cube: Optional[Tuple[str, AsOfCube]], optional
+    """
+    PROFILER.reset()
+    init_worker(backend)
+    if cube is not None:
+        from stats import register_cube
+        register_cube(*cube)
+
+def create_pool(processes: Optional[int] = None, cube: Optional[Tuple[str, "AsOfCube"]] = None) -> "ProcessPoolExecutor":
+    """Crée un groupe de processus de rendu
+
+    :param processes: Le nombre de processus, par défaut None (un par cœur)
+    :type processes: Optional[int], optional
+    :param cube: Le cube de la base de données envoyé une seule fois à
+    chaque processus (voir stats.share_cube), par défaut None
+    :type cube: Optional[Tuple[str, AsOfCube]], optional
+    :return: Le groupe de processus
+    :rtype: ProcessPoolExecutor
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=processes, initializer=init_pool_worker, initargs=(BACKEND, cube))
+
+def render_diagrams(
+    views: Dict[str, Table],
+    diagrams: Optional[List[Tuple[Callable[[Table], "Image.Image"], str]]] = None,
+    pool: Optional["ProcessPoolExecutor"] = None,
+    processes: Optional[int] = None,
+) -> List["Image.Image"]:
+    """Génère les diagrammes en parallèle et retourne les images dans
+    l'ordre de la liste des diagrammes.
+
+    :param views: Les vues de la base de données (voir apply_filters)
+    :type views: Dict[str, Table]
+    :param diagrams: Les diagrammes à générer avec le nom de la vue
+    qu'ils utilisent, par défaut None (ceux du moteur choisi, voir get_diagrams)
+    :type diagrams: Optional[List[Tuple[Callable[[Table], Image.Image], str]]], optional
+    :param pool: Le groupe de processus à utiliser, si None un groupe
+    est créé pour l'occasion, par défaut None
+    :type pool: Optional[ProcessPoolExecutor], optional
+    :param processes: Le nombre de processus du groupe créé, par défaut
+    None (autant que de diagrammes, dans la limite du nombre de cœurs).
+    Avec 1 processus, les diagrammes sont générés dans le processus actuel.
+    :type processes: Optional[int], optional
+    :return: Les images des diagrammes
+    :rtype: List[Image.Image]
+    """
+    if diagrams is None:
+        diagrams = get_diagrams()
+    own_pool = pool is None
+    if own_pool:
+        if processes is None:
+            processes = min(len(diagrams), os.cpu_count() or 1)
+        if processes == 1:
+            # pas de parallélisme, on évite le coût de création des processus
+            init_worker()
+            output = []
+            for diagram, view in diagrams:
+                with span(diagram.__name__, len(views[view])):
+                    output.append(diagram(views[view]))
+            return output
+        pool = create_pool(processes)
+    try:
+        # on envoie tous les diagrammes aux processus avant d'attendre les résultats
+        if not PROFILER.actif:
+            futures = [pool.submit(diagram, views[view]) for diagram, view in diagrams]
+            return [future.result() for future in futures]
+        # les diagrammes sont mesurés dans leur processus, puis leurs
+        # mesures sont ajoutées à celles de ce processus
+        with span("render_diagrams"):
+            futures = [
+                pool.submit(call_profiled, diagram, diagram.__name__, len(views[view]), PROFILER.memoire, views[view])
+                for diagram, view in diagrams
+            ]
+            output = []
+            for future in futures:
+                image, spans = future.result()
+                PROFILER.add(spans)
+                output.append(image)
+            return output
+    finally:
+        if own_pool:
+            pool.shutdown()
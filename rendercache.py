@@ -0,0 +1,209 @@
+""" Ce fichier contient le cache des images générées (diagrammes et
+rapports).
+
+Les mêmes régions et les mêmes dates sont souvent demandées plusieurs
+fois. Les images encodées (png, webp ou jpeg, voir composition.Encoder)
+sont donc gardées en mémoire, et les moins récemment utilisées sont
+retirées quand la taille totale dépasse la limite. Elles peuvent aussi
+être enregistrées dans un dossier pour être retrouvées après un
+redémarrage, avec l'extension de leur format.
+
+La clé d'une image contient l'empreinte du fichier csv (voir
+cache.file_hash) : après le téléchargement d'un nouveau fichier, les
+anciennes images ne sont donc plus jamais utilisées.
+"""
+
+# Importations nécessaire pour le typing
+from typing import Any, Dict, Optional, Tuple, Union
+
+# Importation des modules nécessaires à la gestion des fichiers
+import os
+import glob
+import json
+import hashlib
+import threading
+
+# Importation du dictionnaire ordonné utilisé pour retrouver l'image la
+# moins récemment utilisée
+from collections import OrderedDict
+
+# Importation des module nécessaire à la gestion du temps
+import datetime
+
+# Taille maximale par défaut des images gardées en mémoire (en octets)
+TAILLE_MAX = 64 << 20
+# Extension par défaut des images enregistrées dans le dossier du cache
+EXTENSION = ".png"
+# Noms des fichiers du dossier du cache, quel que soit le format : la clé
+# (voir render_key) suivie de l'extension
+MOTIF_FICHIERS = "?" * 16 + "-" + "?" * 32 + ".*"
+
+def render_key(
+    empreinte: str,
+    nom: str,
+    reg: str,
+    date: Optional[Tuple[Union[datetime.datetime, None]]],
+) -> str:
+    """Retourne la clé d'une image générée
+
+    :param empreinte: L'empreinte du fichier csv utilisé
+    :type empreinte: str
+    :param nom: Le nom de l'image, par exemple "report" ou "diagram-3"
+    :type nom: str
+    :param reg: La région de l'image
+    :type reg: str
+    :param date: Le filtre de date (si None, pas de filtre de date)
+    :type date: Optional[Tuple[Union[datetime.datetime, None]]]
+    :return: La clé, au format "[empreinte]-[hash des paramètres]"
+    :rtype: str
+    """
+    if date is not None:
+        date = [limite.isoformat() if limite is not None else None for limite in date]
+    parametres = json.dumps([nom, reg, date]).encode("utf-8")
+    return f"{_prefix(empreinte)}-{hashlib.sha256(parametres).hexdigest()[:32]}"
+
+def _prefix(empreinte: str) -> str:
+    """Retourne le début des clés des images d'un fichier csv"""
+    return hashlib.sha256(empreinte.encode("utf-8")).hexdigest()[:16]
+
+class RenderCache:
+    """Cache des images générées, en mémoire et éventuellement sur le disque"""
+
+    def __init__(self, taille_max: int = TAILLE_MAX, dossier: Optional[str] = None):
+        """
+        :param taille_max: La taille maximale des images gardées en mémoire, par défaut TAILLE_MAX
+        :type taille_max: int, optional
+        :param dossier: Le dossier où enregistrer les images, si None
+        les images sont seulement gardées en mémoire, par défaut None
+        :type dossier: Optional[str], optional
+        """
+        self.taille_max = taille_max
+        self.dossier = dossier
+        if dossier is not None:
+            os.makedirs(dossier, exist_ok=True)
+        # les images les plus récemment utilisées sont à la fin
+        self.images: "OrderedDict[str, bytes]" = OrderedDict()
+        self.taille = 0
+        self.verrou = threading.Lock()
+        # compteurs exposés par stats()
+        self.hits = 0
+        self.hits_disque = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, cle: str, extension: str = EXTENSION) -> str:
+        """Retourne l'emplacement du fichier d'une image dans le dossier"""
+        return os.path.join(self.dossier, cle + extension)
+
+    def _remember(self, cle: str, contenu: bytes):
+        """Garde une image en mémoire, en retirant les images les moins
+        récemment utilisées si nécessaire (le verrou doit être pris)"""
+        if len(contenu) > self.taille_max: # l'image ne tient pas dans le cache
+            return
+        ancien = self.images.pop(cle, None)
+        if ancien is not None:
+            self.taille -= len(ancien)
+        self.images[cle] = contenu
+        self.taille += len(contenu)
+        while self.taille > self.taille_max:
+            cle_retiree, retiree = self.images.popitem(last=False)
+            self.taille -= len(retiree)
+            self.evictions += 1
+
+    def get(self, cle: str, extension: str = EXTENSION) -> Optional[bytes]:
+        """Retourne l'image associée à la clé, ou None si elle n'est pas
+        dans le cache
+
+        :param cle: La clé de l'image (voir render_key)
+        :type cle: str
+        :param extension: L'extension du format de l'image, utilisée pour
+        le fichier du dossier, par défaut EXTENSION
+        :type extension: str, optional
+        :return: Le contenu de l'image encodée
+        :rtype: Optional[bytes]
+        """
+        with self.verrou:
+            contenu = self.images.get(cle)
+            if contenu is not None:
+                self.images.move_to_end(cle)
+                self.hits += 1
+                return contenu
+        if self.dossier is not None:
+            try:
+                with open(self._path(cle, extension), "rb") as file:
+                    contenu = file.read()
+            except FileNotFoundError:
+                pass
+            else:
+                with self.verrou:
+                    self.hits_disque += 1
+                    self._remember(cle, contenu)
+                return contenu
+        with self.verrou:
+            self.misses += 1
+        return None
+
+    def put(self, cle: str, contenu: bytes, extension: str = EXTENSION):
+        """Ajoute une image au cache
+
+        :param cle: La clé de l'image (voir render_key)
+        :type cle: str
+        :param contenu: Le contenu de l'image encodée
+        :type contenu: bytes
+        :param extension: L'extension du format de l'image, utilisée pour
+        le fichier du dossier, par défaut EXTENSION
+        :type extension: str, optional
+        """
+        with self.verrou:
+            self._remember(cle, contenu)
+        if self.dossier is not None:
+            # le fichier est d'abord écrit à côté puis renommé, une image
+            # à moitié écrite n'est donc jamais lue
+            chemin = self._path(cle, extension)
+            temporaire = f"{chemin}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(temporaire, "wb") as file:
+                    file.write(contenu)
+                os.replace(temporaire, chemin)
+            except OSError: # le dossier n'est peut être pas accessible en écriture
+                pass
+
+    def purge(self, empreinte: str):
+        """Supprime les images qui ne proviennent pas du fichier csv
+        indiqué, elles ne seront plus jamais demandées
+
+        :param empreinte: L'empreinte du fichier csv utilisé
+        :type empreinte: str
+        """
+        prefixe = _prefix(empreinte) + "-"
+        with self.verrou:
+            for cle in [cle for cle in self.images if not cle.startswith(prefixe)]:
+                self.taille -= len(self.images.pop(cle))
+        if self.dossier is not None:
+            # les images de tous les formats, et les fichiers temporaires
+            # laissés par un arrêt pendant l'écriture
+            for chemin in glob.glob(os.path.join(self.dossier, MOTIF_FICHIERS)):
+                if not os.path.basename(chemin).startswith(prefixe):
+                    try:
+                        os.remove(chemin)
+                    except OSError:
+                        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les compteurs du cache
+
+        :return: Le nombre d'images trouvées en mémoire (hits), sur le
+        disque (hits_disque), non trouvées (misses), retirées de la
+        mémoire (evictions), et le nombre et la taille des images en mémoire
+        :rtype: Dict[str, Any]
+        """
+        with self.verrou:
+            return {
+                "hits": self.hits,
+                "hits_disque": self.hits_disque,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entrees": len(self.images),
+                "taille": self.taille,
+                "taille_max": self.taille_max,
+            }
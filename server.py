@@ -0,0 +1,390 @@
+""" Ce fichier contient le mode serveur HTTP du programme.
+
+Le fichier csv est chargé une seule fois au démarrage et reste en
+mémoire avec ses index. Chaque requête ne demande donc plus que la
+génération des diagrammes, qui est faite par un groupe de processus
+pour pouvoir répondre à plusieurs requêtes en même temps.
+
+Les adresses disponibles sont :
+    GET /report.png?reg=11&from=2021-01-01&to=2021-06-01
+    GET /diagram/3.png?reg=11&from=2021-01-01&to=2021-06-01
+Les paramètres from et to sont facultatifs (sans date, les données les
+plus récentes sont utilisées). Les images sont encodées avec les options
+--image-format, --compress-level, --optimize et --quality (voir
+composition.Encoder), l'extension des adresses est celle du format
+choisi (/report.webp par exemple). Les images générées sont gardées dans un
+cache (voir rendercache.py), dont les compteurs sont donnés par :
+    GET /stats
+
+Le dossier est surveillé : quand un nouveau fichier vacsi-s-a-reg-*.csv
+apparaît (ou que le fichier est modifié), il est chargé en arrière-plan
+puis remplace l'ancien d'un seul coup. Les requêtes en cours se terminent
+avec l'ancien fichier.
+"""
+
+# Importations nécessaire pour le typing
+from typing import TYPE_CHECKING, Dict, Optional, Tuple, Union
+
+# Importation des modules nécessaires au serveur
+import os
+import json
+import asyncio
+import argparse
+from urllib.parse import urlsplit, parse_qs
+
+# Importation des module nécessaire à la gestion du temps
+import datetime
+
+# Importation du module de gestion des processus
+from concurrent.futures import ProcessPoolExecutor
+
+from constants import REGIONS
+from table import Table
+import render
+from render import init_worker, render_diagrams, get_diagrams
+from batch import find_file
+from main import COLORS, load_database, build_views, report_date, compose_report
+from rendercache import RenderCache, render_key
+from stats import as_of_cube
+import cache
+
+if TYPE_CHECKING:
+    from composition import Encoder
+
+# Temps (en secondes) entre deux vérifications du dossier
+INTERVALLE = 30
+# Temps (en secondes) après lequel une connexion inactive est fermée
+DELAI_INACTIVITE = 60
+
+# Textes des codes de réponse utilisés
+STATUTS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+# Base de données et paramètres d'encodage utilisés par les processus
+# de génération des diagrammes
+_DATABASE: Optional[Table] = None
+_ENCODER: Optional["Encoder"] = None
+
+class RequestError(Exception):
+    """Erreur à renvoyer au client avec le code de réponse indiqué"""
+
+    def __init__(self, statut: int, message: str):
+        super().__init__(message)
+        self.statut = statut
+
+    def __reduce__(self):
+        # l'erreur est envoyée par les processus du groupe au serveur
+        return (RequestError, (self.statut, str(self)))
+
+def init_server_worker(database: Table, encoder: "Encoder", backend: Optional[str] = None):
+    """Initialise un processus de génération des diagrammes"""
+    global _DATABASE, _ENCODER
+    init_worker(backend)
+    _DATABASE = database
+    _ENCODER = encoder
+
+def render_report_file(reg: str, date: Optional[Tuple[Union[datetime.datetime, None]]]) -> bytes:
+    """Génère le rapport d'une région et retourne le fichier encodé.
+    Cette fonction est exécutée dans les processus du groupe.
+
+    :param reg: La région du rapport
+    :type reg: str
+    :param date: Le filtre de date (si None, pas de filtre de date)
+    :type date: Optional[Tuple[Union[datetime.datetime, None]]]
+    :return: Le contenu du fichier
+    :rtype: bytes
+    """
+    views = build_views(_DATABASE, reg, date)
+    if len(views["fall"]) == 0:
+        raise RequestError(404, "aucune donnée pour ces dates")
+    # les diagrammes d'une requête sont générés dans ce processus, le
+    # parallélisme se fait entre les requêtes
+    diagrams = render_diagrams(views, processes=1)
+    return _ENCODER.encode(compose_report(diagrams, reg, report_date(date, views["fall"])))
+
+def render_diagram_file(numero: int, reg: str, date: Optional[Tuple[Union[datetime.datetime, None]]]) -> bytes:
+    """Génère un seul diagramme d'une région et retourne le fichier encodé.
+    Cette fonction est exécutée dans les processus du groupe.
+
+    :param numero: Le numéro du diagramme (de 1 à 6)
+    :type numero: int
+    :param reg: La région du diagramme
+    :type reg: str
+    :param date: Le filtre de date (si None, pas de filtre de date)
+    :type date: Optional[Tuple[Union[datetime.datetime, None]]]
+    :return: Le contenu du fichier
+    :rtype: bytes
+    """
+    views = build_views(_DATABASE, reg, date)
+    if len(views["fall"]) == 0:
+        raise RequestError(404, "aucune donnée pour ces dates")
+    diagram, view = get_diagrams()[numero - 1]
+    return _ENCODER.encode(diagram(views[view]))
+
+def parse_date_filter(parametres: Dict[str, list]) -> Optional[Tuple[Union[datetime.datetime, None]]]:
+    """Convertit les paramètres from et to de la requête en filtre de date,
+    comme le fait le mode interactif
+
+    :param parametres: Les paramètres de la requête
+    :type parametres: Dict[str, list]
+    :return: Le filtre de date (si None, pas de filtre de date)
+    :rtype: Optional[Tuple[Union[datetime.datetime, None]]]
+    """
+    try:
+        dates = [
+            datetime.datetime.fromisoformat(parametres[nom][0]) if nom in parametres else None
+            for nom in ("from", "to")
+        ]
+    except ValueError as e:
+        raise RequestError(400, f"date invalide : {e}")
+    debut, fin = dates
+    if debut is None and fin is None:
+        return None
+    if fin is None:
+        raise RequestError(400, "le paramètre to est obligatoire avec from")
+    if debut is None:
+        return (None, fin)
+    if debut == fin:
+        raise RequestError(400, "impossible d'afficher un graphique pour une journée")
+    return (min(debut, fin), max(debut, fin))
+
+class Dataset:
+    """Fichier chargé par le serveur, avec le groupe de processus qui
+    génère les diagrammes à partir de ce fichier"""
+
+    def __init__(self, chemin: str, encoder: "Encoder", processes: Optional[int] = None):
+        self.chemin = chemin
+        self.mtime = os.path.getmtime(chemin)
+        self.database = load_database(chemin)
+        # le cube des valeurs à une date est construit (ou lu sur le disque)
+        # avant la création des processus, qui en héritent
+        as_of_cube(self.database)
+        # l'empreinte identifie la version du fichier dans les clés du cache des images
+        self.empreinte = self.database.empreinte or cache.file_hash(chemin)
+        self.pool = ProcessPoolExecutor(processes, initializer=init_server_worker, initargs=(self.database, encoder, render.BACKEND))
+
+class ReportServer:
+    """Serveur HTTP générant les rapports à partir d'un fichier gardé en mémoire"""
+
+    def __init__(
+        self,
+        chemin: Optional[str] = None,
+        processes: Optional[int] = None,
+        intervalle: float = INTERVALLE,
+        images: Optional[RenderCache] = None,
+        encoder: Optional["Encoder"] = None,
+    ):
+        """
+        :param chemin: Le fichier csv à servir, si None le fichier le plus récent du dossier est utilisé, par défaut None
+        :type chemin: Optional[str], optional
+        :param processes: Le nombre de processus de génération, par défaut None (un par cœur)
+        :type processes: Optional[int], optional
+        :param intervalle: Le temps entre deux vérifications du fichier, par défaut INTERVALLE
+        :type intervalle: float, optional
+        :param images: Le cache des images générées, si None un cache en mémoire est créé, par défaut None
+        :type images: Optional[RenderCache], optional
+        :param encoder: Les paramètres d'encodage des images, par défaut None (png)
+        :type encoder: Optional[Encoder], optional
+        """
+        from composition import Encoder
+        self.chemin = chemin
+        self.processes = processes
+        self.intervalle = intervalle
+        self.images = images if images is not None else RenderCache()
+        self.encoder = encoder if encoder is not None else Encoder()
+        self.dataset: Optional[Dataset] = None
+
+    def _source(self) -> Tuple[str, float]:
+        """Retourne le fichier à servir et sa date de modification"""
+        chemin = self.chemin if self.chemin is not None else find_file()
+        return chemin, os.path.getmtime(chemin)
+
+    async def reload(self) -> bool:
+        """Charge le fichier s'il a changé depuis le dernier chargement.
+        Le nouveau fichier remplace l'ancien seulement une fois chargé.
+
+        :return: True si un nouveau fichier a été chargé
+        :rtype: bool
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            chemin, mtime = self._source()
+        except (FileNotFoundError, OSError) as e:
+            if self.dataset is None:
+                raise
+            print(f"{COLORS['fg']['red']}{e}{COLORS['reset']}")
+            return False
+        if self.dataset is not None and (self.dataset.chemin, self.dataset.mtime) == (chemin, mtime):
+            return False
+
+        print(f"Chargement du fichier {chemin}...", flush=True)
+        # le chargement est fait dans un fil d'exécution séparé pour
+        # continuer à répondre aux requêtes avec l'ancien fichier
+        nouveau = await loop.run_in_executor(None, Dataset, chemin, self.encoder, self.processes)
+        ancien, self.dataset = self.dataset, nouveau
+        if ancien is not None:
+            # les requêtes déjà envoyées à l'ancien groupe se terminent normalement
+            ancien.pool.shutdown(wait=False)
+        # les images de l'ancien fichier ne seront plus demandées
+        self.images.purge(nouveau.empreinte)
+        print(f"{COLORS['fg']['green']}Fichier {chemin} chargé{COLORS['reset']}", flush=True)
+        return True
+
+    async def watch(self):
+        """Vérifie régulièrement si un nouveau fichier est disponible"""
+        while True:
+            await asyncio.sleep(self.intervalle)
+            try:
+                await self.reload()
+            except Exception as e: # le serveur continue avec l'ancien fichier
+                print(f"{COLORS['fg']['red']}Impossible de charger le nouveau fichier : {e}{COLORS['reset']}", flush=True)
+
+    async def render(self, chemin: str, parametres: Dict[str, list]) -> Tuple[bytes, str]:
+        """Génère l'image demandée par une requête, ou la retrouve dans
+        le cache des images
+
+        :param chemin: Le chemin de l'adresse demandée
+        :type chemin: str
+        :param parametres: Les paramètres de la requête
+        :type parametres: Dict[str, list]
+        :return: Le contenu de la réponse et son type
+        :rtype: Tuple[bytes, str]
+        """
+        if chemin == "/stats":
+            return json.dumps(self.images.stats()).encode("utf-8"), "application/json"
+        extension = self.encoder.extension
+        if chemin == "/report" + extension:
+            nom, fonction, arguments = "report", render_report_file, ()
+        elif chemin.startswith("/diagram/") and chemin.endswith(extension):
+            numero = chemin[len("/diagram/"):-len(extension)]
+            if not numero.isdigit() or not 1 <= int(numero) <= len(get_diagrams()):
+                raise RequestError(404, f"le diagramme {numero} n'existe pas")
+            nom, fonction, arguments = f"diagram-{int(numero)}", render_diagram_file, (int(numero),)
+        else:
+            raise RequestError(404, f"l'adresse {chemin} n'existe pas")
+
+        dataset = self.dataset # le fichier peut être remplacé pendant la génération
+        if dataset is None:
+            raise RequestError(503, "le fichier n'est pas encore chargé")
+        reg = parametres.get("reg", [None])[0]
+        if reg is None or reg not in REGIONS or not dataset.database.has_region(reg):
+            raise RequestError(400, f"la région {reg} est invalide")
+        date = parse_date_filter(parametres)
+
+        # les images des deux moteurs de dessin et des différents
+        # paramètres d'encodage sont différentes
+        options = json.dumps(self.encoder.options(), sort_keys=True)
+        cle = render_key(dataset.empreinte, f"{render.BACKEND}/{nom}.{self.encoder.format}/{options}", reg, date)
+        contenu = self.images.get(cle, self.encoder.extension)
+        if contenu is None:
+            loop = asyncio.get_running_loop()
+            contenu = await loop.run_in_executor(dataset.pool, fonction, *arguments, reg, date)
+            self.images.put(cle, contenu, self.encoder.extension)
+        return contenu, self.encoder.content_type
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Répond aux requêtes d'une connexion, tant que le client la garde ouverte"""
+        try:
+            while True:
+                try:
+                    ligne = await asyncio.wait_for(reader.readline(), DELAI_INACTIVITE)
+                except asyncio.TimeoutError:
+                    break
+                if not ligne: # le client a fermé la connexion
+                    break
+                try:
+                    methode, adresse, version = ligne.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(writer, 400, b"requete invalide\n", "text/plain", False)
+                    break
+
+                # on lit les en-têtes jusqu'à la ligne vide
+                en_tetes = {}
+                while True:
+                    ligne = await reader.readline()
+                    if ligne in (b"\r\n", b"\n", b""):
+                        break
+                    nom, _, valeur = ligne.decode("latin-1").partition(":")
+                    en_tetes[nom.strip().lower()] = valeur.strip()
+                connexion = en_tetes.get("connection", "").lower()
+                garder = connexion == "keep-alive" if version == "HTTP/1.0" else connexion != "close"
+
+                statut, contenu, type_contenu = 200, b"", self.encoder.content_type
+                if methode not in ("GET", "HEAD"):
+                    statut, contenu, type_contenu = 405, b"seules les methodes GET et HEAD sont acceptees\n", "text/plain"
+                else:
+                    adresse = urlsplit(adresse)
+                    try:
+                        contenu, type_contenu = await self.render(adresse.path, parse_qs(adresse.query))
+                    except RequestError as e:
+                        statut, contenu, type_contenu = e.statut, f"{e}\n".encode("utf-8"), "text/plain; charset=utf-8"
+                    except Exception as e:
+                        statut, contenu, type_contenu = 500, f"{e}\n".encode("utf-8"), "text/plain; charset=utf-8"
+                await self.respond(writer, statut, contenu if methode != "HEAD" else b"", type_contenu, garder, len(contenu))
+                if not garder:
+                    break
+        except ConnectionError:
+            pass # le client est parti avant la réponse
+        finally:
+            writer.close()
+
+    async def respond(
+        self,
+        writer: asyncio.StreamWriter,
+        statut: int,
+        contenu: bytes,
+        type_contenu: str,
+        garder: bool,
+        taille: Optional[int] = None,
+    ):
+        """Envoie une réponse au client"""
+        en_tetes = [
+            f"HTTP/1.1 {statut} {STATUTS[statut]}",
+            f"Content-Type: {type_contenu}",
+            f"Content-Length: {taille if taille is not None else len(contenu)}",
+            f"Connection: {'keep-alive' if garder else 'close'}",
+        ]
+        if type_contenu.startswith("image/"):
+            en_tetes.append("Cache-Control: no-cache")
+        writer.write(("\r\n".join(en_tetes) + "\r\n\r\n").encode("latin-1") + contenu)
+        await writer.drain()
+
+    async def serve(self, host: str, port: int):
+        """Charge le fichier puis répond aux requêtes jusqu'à l'arrêt du programme"""
+        await self.reload()
+        serveur = await asyncio.start_server(self.handle, host, port)
+        print(f"Serveur démarré sur http://{host}:{port}/", flush=True)
+        surveillance = asyncio.create_task(self.watch())
+        try:
+            async with serveur:
+                await serveur.serve_forever()
+        finally:
+            surveillance.cancel()
+            if self.dataset is not None:
+                self.dataset.pool.shutdown(cancel_futures=True)
+
+def run_serve_command(arguments: argparse.Namespace):
+    """Exécute la commande serve avec les arguments de la ligne de commande
+
+    :param arguments: Les arguments lus par main.parse_arguments
+    :type arguments: argparse.Namespace
+    """
+    from composition import encoder_from_arguments
+    try:
+        encoder = encoder_from_arguments(arguments)
+    except ValueError as e:
+        raise SystemExit(f"{COLORS['fg']['red']}{e}{COLORS['reset']}")
+    images = RenderCache(arguments.cache_size << 20, arguments.cache_dir)
+    server = ReportServer(arguments.file, arguments.processes, arguments.interval, images, encoder)
+    try:
+        asyncio.run(server.serve(arguments.host, arguments.port))
+    except FileNotFoundError as e:
+        raise SystemExit(f"{COLORS['fg']['red']}{e}{COLORS['reset']}")
+    except KeyboardInterrupt:
+        print("Arrêt du serveur")
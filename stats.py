@@ -0,0 +1,690 @@
+""" Ce fichier contient les calculs faits sur la base de données, séparés
+des diagrammes pour pouvoir être réutilisés sans matplotlib.
+
+Les fonctions en fin de fichier calculent les données de chaque
+diagramme du rapport : elles sont utilisées par les deux moteurs de
+dessin (diagrams.py et lightdiagrams.py) et par la commande stats, qui
+écrit les mêmes valeurs en json ou en csv sans générer d'image.
+
+Les calculs sont faits avec numpy sur des colonnes entières à la fois
+plutôt que ligne par ligne. Les colonnes de la table sont lues
+directement (sans copie) grâce à np.frombuffer.
+
+Les diagrammes 2, 4, 5 et 6 n'utilisent que la dernière ligne connue à
+une date de certaines régions et classes d'âge. Ces valeurs sont
+précalculées pour chaque jour dans un cube (voir AsOfCube), construit une
+seule fois pour la base de données complète et enregistré à côté du
+cache (voir cache.py) : chaque recherche est ensuite un simple accès au
+tableau, quelles que soient les limites du filtre de date. Au-delà d'une
+certaine taille (voir TAILLE_MAX_CUBE), le cube n'est pas construit et
+les valeurs sont cherchées avec l'index de la table. Les vues envoyées à
+un groupe de processus utilisent le cube de la base de données, reçu une
+seule fois par chaque processus (voir share_cube).
+"""
+
+# Importations nécessaire pour le typing
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+# Importation de la sélection par tas utilisée par les classements
+import heapq
+import weakref
+
+# Importation du module de gestion du cache
+import cache
+
+# Importation des module nécessaire à la gestion du temps
+import datetime
+
+# On indique les modules à importer si l'importation échoue
+try:
+    # Importation du module de calcul sur les tableaux
+    import numpy as np
+except ImportError as e:
+    print("Vous devez installer le module numpy pour utiliser ce programme")
+    print("Pour installer le module, utilisez la commande suivante:")
+    print("pip install numpy")
+
+from constants import (
+    AGES, REGIONS,
+    CUMULE_DOSE1_E, CUMULE_COMPLET_E, CUMULE_RAPPEL_E, CUMULE_2_RAPPEL_E,
+    COUV_DOSE1_E, COUV_COMPLET_E, COUV_RAPPEL_E, COUV_2_RAPPEL_E,
+    COUV_COMPLET_H, COUV_COMPLET_F,
+)
+from table import Table, TYPE_CATEGORIE, TYPE_JOUR, TYPE_VALEUR, day_to_datetime
+
+# Parts de la population dans l'ordre de l'empilement des diagrammes
+NON_VACCINE, UNE_DOSE, DEUX_DOSES, TROIS_DOSES, QUATRE_DOSES = range(5)
+NB_PARTS = 5
+# Noms des parts, utilisés par la commande stats
+PARTS = ["non_vaccine", "une_dose", "deux_doses", "trois_doses", "quatre_doses"]
+
+# Colonnes des nombres cumulés de personnes vaccinées, dans l'ordre du
+# premier diagramme (une, deux, trois et quatre doses)
+CUMULES = [CUMULE_DOSE1_E, CUMULE_COMPLET_E, CUMULE_RAPPEL_E, CUMULE_2_RAPPEL_E]
+# Colonnes des couvertures utilisées pour la répartition selon le nombre
+# de doses (une, deux, trois et quatre doses)
+COUVERTURES = [COUV_DOSE1_E, COUV_COMPLET_E, COUV_RAPPEL_E, COUV_2_RAPPEL_E]
+# Colonnes gardées dans le cube des valeurs à une date
+COLONNES_CUBE = CUMULES + COUVERTURES + [COUV_COMPLET_H, COUV_COMPLET_F]
+# Position des colonnes de COUVERTURES dans le cube
+POSITIONS_COUVERTURES = slice(len(CUMULES), len(CUMULES) + len(COUVERTURES))
+
+def values(table: Table, col: int) -> "np.ndarray":
+    """Retourne une colonne de valeurs de la table sous forme de tableau
+    numpy. Le tableau partage la mémoire de la table, il ne doit donc pas
+    être modifié.
+
+    :param table: La table
+    :type table: Table
+    :param col: L'indice de la colonne
+    :type col: int
+    :return: Les valeurs de la colonne
+    :rtype: np.ndarray
+    """
+    return np.frombuffer(table.valeurs[col], dtype=TYPE_VALEUR)
+
+def dose_breakdown_rows(table: Table) -> "np.ndarray":
+    """Calcule la répartition de la population selon le nombre de doses
+    reçues pour chaque ligne de la table
+
+    :param table: La table
+    :type table: Table
+    :return: Un tableau de taille (nombre de lignes, NB_PARTS) contenant
+    les pourcentages de la population sans dose, avec une, deux, trois
+    et quatre doses
+    :rtype: np.ndarray
+    """
+    return breakdown(np.stack([values(table, col) for col in COUVERTURES], axis=-1))
+
+def breakdown(couvertures: "np.ndarray") -> "np.ndarray":
+    """Calcule la répartition de la population selon le nombre de doses
+    reçues à partir des couvertures vaccinales
+
+    :param couvertures: Les couvertures des colonnes de COUVERTURES, qui
+    doivent être sur le dernier axe
+    :type couvertures: np.ndarray
+    :return: Les pourcentages de chaque part, sur le dernier axe
+    :rtype: np.ndarray
+    """
+    dose1, complet, rappel, rappel_2 = (couvertures[..., i] for i in range(len(COUVERTURES)))
+
+    parts = np.empty(couvertures.shape[:-1] + (NB_PARTS,))
+    # on retire à chaque couverture les personnes ayant reçu plus de doses
+    parts[..., QUATRE_DOSES] = rappel_2
+    parts[..., TROIS_DOSES] = rappel - parts[..., QUATRE_DOSES]
+    parts[..., DEUX_DOSES] = complet - parts[..., TROIS_DOSES] - parts[..., QUATRE_DOSES]
+    parts[..., UNE_DOSE] = dose1 - parts[..., DEUX_DOSES] - parts[..., TROIS_DOSES] - parts[..., QUATRE_DOSES]
+    parts[..., NON_VACCINE] = 100 - dose1
+    return parts
+
+def cumulative(parts: "np.ndarray") -> "np.ndarray":
+    """Retourne les sommes cumulées des parts, utilisées pour empiler les
+    barres des diagrammes (la dernière valeur vaut 100%)
+
+    :param parts: Des répartitions calculées par dose_breakdown_rows,
+    les parts doivent être sur le dernier axe
+    :type parts: np.ndarray
+    :return: Les sommes cumulées, de la même taille que parts
+    :rtype: np.ndarray
+    """
+    return np.cumsum(parts, axis=-1)
+
+def check_days(table: Table):
+    """Vérifie que chaque région et classe d'âge de la table n'a qu'une
+    ligne par jour. Les lignes peuvent être dans n'importe quel ordre.
+
+    :param table: La table
+    :type table: Table
+    :raises ValueError: Si une région et une classe d'âge ont plusieurs lignes le même jour
+    """
+    codes_regions = np.frombuffer(table.reg, dtype=TYPE_CATEGORIE)
+    codes_ages = np.frombuffer(table.age, dtype=TYPE_CATEGORIE)
+    jours = np.frombuffer(table.jour, dtype=TYPE_JOUR)
+    if len(jours) == 0:
+        return
+    # une clé par ligne, égale pour deux lignes du même groupe le même jour
+    cles = (codes_regions.astype(np.int64) * len(table.ages) + codes_ages) << 32 | (jours - jours.min())
+    triees = np.sort(cles)
+    doublons = triees[1:] == triees[:-1]
+    if doublons.any():
+        # on ne sait pas quelle ligne garder, on ne suppose pas que c'est la dernière du fichier
+        ligne = int(np.flatnonzero(cles == triees[1:][doublons][0])[0])
+        raise ValueError(
+            f"la région {table.regions[codes_regions[ligne]]} et la classe d'âge "
+            f"{table.ages[codes_ages[ligne]]} ont plusieurs lignes le "
+            f"{day_to_datetime(int(jours[ligne])):%Y-%m-%d}"
+        )
+
+class AsOfCube:
+    """Dernières valeurs connues à chaque jour, pour chaque région et
+    classe d'âge.
+
+    Les valeurs des colonnes de COLONNES_CUBE sont rangées dans un tableau
+    de taille (nombre de régions, nombre de classes d'âge, nombre de jours,
+    nombre de colonnes), indexé par les codes de région et de classe d'âge
+    de la table et par les jours ayant au moins une ligne dans la table.
+    Chaque case contient les valeurs de la dernière ligne de la région et
+    de la classe d'âge à ce jour ou avant (nan s'il n'y en a aucune) : la
+    recherche de la dernière valeur connue à une date est donc une
+    recherche dichotomique dans les jours puis un simple accès au tableau.
+
+    Les lignes de la table peuvent être dans n'importe quel ordre, mais
+    une région et une classe d'âge ne doivent avoir qu'une ligne par jour
+    (voir check_days).
+    """
+
+    def __init__(
+        self,
+        regions: List[str],
+        ages: List[str],
+        jours: "np.ndarray",
+        valeurs: "np.ndarray",
+        derniers: "np.ndarray",
+    ):
+        """
+        :param regions: Les régions, dans l'ordre du premier axe
+        :type regions: List[str]
+        :param ages: Les classes d'âge, dans l'ordre du second axe
+        :type ages: List[str]
+        :param jours: Les numéros des jours du troisième axe, triés
+        :type jours: np.ndarray
+        :param valeurs: Les dernières valeurs connues à chaque jour
+        :type valeurs: np.ndarray
+        :param derniers: Pour chaque région, classe d'âge et jour, la
+        position du jour de la dernière ligne connue (-1 s'il n'y en a pas)
+        :type derniers: np.ndarray
+        """
+        self.regions = regions
+        self.ages = ages
+        self.jours = jours
+        self.valeurs = valeurs
+        self.derniers = derniers
+        self.index_regions: Dict[str, int] = {reg: i for i, reg in enumerate(regions)}
+        self.index_ages: Dict[str, int] = {age: i for i, age in enumerate(ages)}
+
+    @staticmethod
+    def nbytes(table: Table) -> int:
+        """Retourne la taille (en octets) qu'aurait le cube de la table"""
+        nb_jours = len(np.unique(np.frombuffer(table.jour, dtype=TYPE_JOUR)))
+        return len(table.regions) * len(table.ages) * nb_jours * (len(COLONNES_CUBE) * 8 + 4)
+
+    @classmethod
+    def from_table(cls, table: Table) -> "AsOfCube":
+        """Construit le cube d'une table
+
+        :param table: La table, dont les lignes peuvent être dans n'importe quel ordre
+        :type table: Table
+        :raises ValueError: Si une région et une classe d'âge ont plusieurs lignes le même jour
+        :return: Le cube
+        :rtype: AsOfCube
+        """
+        check_days(table)
+        codes_regions = np.frombuffer(table.reg, dtype=TYPE_CATEGORIE)
+        codes_ages = np.frombuffer(table.age, dtype=TYPE_CATEGORIE)
+        jours, i_jours = np.unique(np.frombuffer(table.jour, dtype=TYPE_JOUR), return_inverse=True)
+        forme = (len(table.regions), len(table.ages), len(jours))
+
+        # on place chaque ligne à son jour
+        positions = (codes_regions.astype(np.int64) * forme[1] + codes_ages) * forme[2] + i_jours
+        valeurs = np.full((int(np.prod(forme)), len(COLONNES_CUBE)), np.nan)
+        valeurs[positions] = np.stack([values(table, col) for col in COLONNES_CUBE], axis=-1)
+        presents = np.full(int(np.prod(forme)), -1, dtype=np.int32)
+        presents[positions] = i_jours
+
+        # puis on reporte chaque ligne sur les jours suivants, jusqu'à la ligne suivante
+        derniers = np.maximum.accumulate(presents.reshape(forme), axis=2)
+        valeurs = np.take_along_axis(
+            valeurs.reshape(forme + (len(COLONNES_CUBE),)),
+            np.maximum(derniers, 0)[..., np.newaxis],
+            axis=2,
+        )
+        valeurs[derniers < 0] = np.nan
+        return cls(list(table.regions), list(table.ages), jours.astype(np.int64), valeurs, derniers)
+
+    def save(self, chemin: str, empreinte: str):
+        """Enregistre le cube à côté du fichier csv (voir cache.save_cube)
+
+        :param chemin: L'emplacement du fichier csv d'où provient le cube
+        :type chemin: str
+        :param empreinte: L'empreinte du fichier csv
+        :type empreinte: str
+        """
+        cache.save_cube(chemin, {
+            "empreinte": empreinte,
+            "regions": self.regions,
+            "ages": self.ages,
+            "forme": list(self.valeurs.shape),
+            "colonnes": COLONNES_CUBE,
+        }, {
+            "jours": memoryview(np.ascontiguousarray(self.jours)).cast("B"),
+            "valeurs": memoryview(np.ascontiguousarray(self.valeurs)).cast("B"),
+            "derniers": memoryview(np.ascontiguousarray(self.derniers)).cast("B"),
+        })
+
+    @classmethod
+    def load(cls, chemin: str, table: Table) -> Optional["AsOfCube"]:
+        """Ouvre le cube enregistré à côté du fichier csv, sans copier ses valeurs
+
+        :param chemin: L'emplacement du fichier csv
+        :type chemin: str
+        :param table: La table lue depuis ce fichier
+        :type table: Table
+        :return: Le cube, ou None s'il n'existe pas ou ne correspond pas à la table
+        :rtype: Optional[AsOfCube]
+        """
+        contenu = cache.load_cube(chemin, table.empreinte)
+        if contenu is None:
+            return None
+        header, blocs = contenu
+        if header["colonnes"] != COLONNES_CUBE or header["regions"] != table.regions or header["ages"] != table.ages:
+            return None
+        if "jours" not in blocs: # cube enregistré par une ancienne version
+            return None
+        forme = tuple(header["forme"])
+        jours = np.frombuffer(blocs["jours"], dtype=np.int64)
+        valeurs = np.frombuffer(blocs["valeurs"], dtype=np.float64).reshape(forme)
+        derniers = np.frombuffer(blocs["derniers"], dtype=np.int32).reshape(forme[:3])
+        return cls(header["regions"], header["ages"], jours, valeurs, derniers)
+
+    def lookup(
+        self,
+        reg: str,
+        age: str,
+        jour: Optional[int] = None,
+        jour_min: Optional[int] = None,
+    ) -> Optional["np.ndarray"]:
+        """Retourne les valeurs de la dernière ligne de la région et de la
+        classe d'âge au jour indiqué ou avant
+
+        :param reg: Le code de la région
+        :type reg: str
+        :param age: Le code de la classe d'âge
+        :type age: str
+        :param jour: Le numéro du jour limite (compris), si None la ligne la plus récente est utilisée, par défaut None
+        :type jour: Optional[int], optional
+        :param jour_min: Le numéro du jour minimum de la ligne (compris), par défaut None
+        :type jour_min: Optional[int], optional
+        :return: Les valeurs des colonnes de COLONNES_CUBE, ou None si aucune ligne ne correspond
+        :rtype: Optional[np.ndarray]
+        """
+        i_region = self.index_regions.get(reg)
+        i_age = self.index_ages.get(age)
+        if i_region is None or i_age is None or len(self.jours) == 0:
+            return None
+        if jour is None:
+            position = len(self.jours) - 1
+        else:
+            # dernier jour du cube avant la date (comprise)
+            position = int(np.searchsorted(self.jours, jour, side="right")) - 1
+        if position < 0: # la date est avant la première ligne
+            return None
+        dernier = self.derniers[i_region, i_age, position]
+        if dernier < 0 or (jour_min is not None and self.jours[dernier] < jour_min):
+            return None
+        return self.valeurs[i_region, i_age, position]
+
+class IndexLookup:
+    """Même recherche que AsOfCube.lookup, faite avec l'index de la table
+    sans rien précalculer. Elle est utilisée pour les tables dont le cube
+    serait trop grand (voir TAILLE_MAX_CUBE)."""
+
+    def __init__(self, table: Table):
+        """
+        :param table: La table, dont les lignes peuvent être dans n'importe quel ordre
+        :type table: Table
+        :raises ValueError: Si une région et une classe d'âge ont plusieurs lignes le même jour
+        """
+        check_days(table)
+        self.table = table
+
+    def lookup(
+        self,
+        reg: str,
+        age: str,
+        jour: Optional[int] = None,
+        jour_min: Optional[int] = None,
+    ) -> Optional["np.ndarray"]:
+        """Voir AsOfCube.lookup"""
+        ligne = self.table.index().latest(reg, age, day_to_datetime(jour) if jour is not None else None)
+        if ligne is None or (jour_min is not None and self.table.jour[ligne] < jour_min):
+            return None
+        return np.array([self.table.valeurs[col][ligne] for col in COLONNES_CUBE])
+
+# Taille maximale (en octets) du cube d'une table, au-delà les valeurs
+# sont cherchées avec l'index de la table (voir IndexLookup)
+TAILLE_MAX_CUBE = 256 << 20
+
+# Cubes des tables déjà utilisées, avec la colonne des jours et le nombre
+# de lignes de la table au moment de leur construction
+_CUBES: "weakref.WeakKeyDictionary[Table, Tuple[Union[AsOfCube, IndexLookup], object, int]]" = weakref.WeakKeyDictionary()
+
+def as_of_cube(table: Table) -> Union[AsOfCube, IndexLookup]:
+    """Retourne le cube de la table, construit à la première utilisation.
+    Si la table a été lue depuis un fichier csv (voir main.load_database),
+    le cube enregistré à côté du fichier est utilisé, ou enregistré pour
+    les prochaines fois. Si le cube dépasse TAILLE_MAX_CUBE, il n'est pas
+    construit et les valeurs sont cherchées avec l'index de la table.
+
+    :param table: La table
+    :type table: Table
+    :return: Le cube, ou la recherche par l'index
+    :rtype: Union[AsOfCube, IndexLookup]
+    """
+    memo = _CUBES.get(table)
+    if memo is not None and memo[1] is table.jour and memo[2] == len(table):
+        return memo[0]
+    persistant = table.chemin is not None and table.empreinte is not None
+    cube = AsOfCube.load(table.chemin, table) if persistant else None
+    if cube is None:
+        if AsOfCube.nbytes(table) > TAILLE_MAX_CUBE:
+            cube = IndexLookup(table)
+        else:
+            cube = AsOfCube.from_table(table)
+            if persistant:
+                try:
+                    cube.save(table.chemin, table.empreinte)
+                except OSError: # le dossier n'est peut être pas accessible en écriture
+                    pass
+    _CUBES[table] = (cube, table.jour, len(table))
+    return cube
+
+# Cubes des bases de données d'un autre processus, par empreinte des
+# bases : les vues reçues de ce processus n'ont plus leur base de données
+# mais son empreinte (voir Table.__getstate__)
+_CUBES_PARTAGES: Dict[str, AsOfCube] = {}
+
+def share_cube(table: Table) -> Optional[Tuple[str, AsOfCube]]:
+    """Retourne le cube de la base de données à envoyer une seule fois aux
+    processus d'un groupe (voir render.create_pool et register_cube)
+
+    :param table: La base de données complète
+    :type table: Table
+    :raises ValueError: Si une région et une classe d'âge ont plusieurs lignes le même jour
+    :return: L'empreinte de la base de données et son cube, ou None si la
+    base n'a pas d'empreinte ou si son cube serait trop grand : chaque
+    vue utilise alors son propre cube
+    :rtype: Optional[Tuple[str, AsOfCube]]
+    """
+    cube = as_of_cube(table)
+    if table.empreinte is None or not isinstance(cube, AsOfCube):
+        return None
+    return table.empreinte, cube
+
+def register_cube(empreinte: str, cube: AsOfCube):
+    """Enregistre dans ce processus le cube d'une base de données d'un
+    autre processus (voir share_cube)
+
+    :param empreinte: L'empreinte de la base de données
+    :type empreinte: str
+    :param cube: Le cube de la base de données
+    :type cube: AsOfCube
+    """
+    _CUBES_PARTAGES[empreinte] = cube
+
+def latest_row(
+    table: Table,
+    reg: str,
+    age: str,
+    date: Optional[datetime.datetime] = None,
+) -> Optional["np.ndarray"]:
+    """Retourne les valeurs de la dernière ligne de la table pour la
+    région et la classe d'âge, à la date indiquée ou avant.
+
+    Si la table est une vue filtrée de la base de données (voir
+    Table.origine), le cube de la base de données est utilisé avec les
+    limites du filtre, sinon celui de la table. Pour une vue reçue d'un
+    autre processus, le cube de la base de données est celui enregistré
+    avec register_cube, s'il existe.
+
+    :param table: La table
+    :type table: Table
+    :param reg: Le code de la région
+    :type reg: str
+    :param age: Le code de la classe d'âge
+    :type age: str
+    :param date: La date limite (comprise), si None la ligne la plus récente est utilisée, par défaut None
+    :type date: Optional[datetime.datetime], optional
+    :return: Les valeurs des colonnes de COLONNES_CUBE (voir COLONNES_CUBE.index),
+    ou None si aucune ligne ne correspond
+    :rtype: Optional[np.ndarray]
+    """
+    jour = date.toordinal() if date is not None else None
+    if table.origine is None:
+        return as_of_cube(table).lookup(reg, age, jour)
+    base, filtre_reg, filtre_age, jour_min, jour_max = table.origine
+    if isinstance(base, Table):
+        cube = as_of_cube(base)
+    else: # vue reçue d'un autre processus, base est l'empreinte de la base de données
+        cube = _CUBES_PARTAGES.get(base)
+        if cube is None:
+            return as_of_cube(table).lookup(reg, age, jour)
+    if (filtre_reg is not None and reg != filtre_reg) or (filtre_age is not None and age != filtre_age):
+        return None
+    if jour_max is not None:
+        jour = jour_max if jour is None else min(jour, jour_max)
+    return cube.lookup(reg, age, jour, jour_min)
+
+def _group(table: Table) -> Tuple[str, str]:
+    """Retourne la région et la classe d'âge d'une table qui n'en contient qu'une
+
+    :raises ValueError: Si la table est vide
+    """
+    if len(table) == 0:
+        raise ValueError("aucune donnée pour ce filtre")
+    return table.regions[table.reg[0]], table.ages[table.age[0]]
+
+class Ranking:
+    """Classement des régions (ou des couples région et classe d'âge)
+    selon une colonne de valeurs, à une date donnée.
+
+    Pour chaque colonne et chaque date, la dernière valeur connue de
+    chaque région est cherchée une seule fois (dans le cube des valeurs
+    à une date pour les colonnes de COLONNES_CUBE, sinon grâce à l'index
+    de la table, qui n'est construit que pour ces autres colonnes), puis
+    gardée pour les classements suivants. Les K premières
+    valeurs sont ensuite sélectionnées avec un tas, sans trier toutes
+    les valeurs.
+    """
+
+    def __init__(self, table: Table):
+        self.table = table
+        # colonne des jours et nombre de lignes de la table au moment où
+        # les valeurs ont été cherchées (comme pour as_of_cube)
+        self.version = (table.jour, len(table))
+        # valeurs déjà cherchées, pour chaque (colonne, jour, par classe d'âge)
+        self.valeurs: Dict[Tuple[int, Optional[int], bool], List[Tuple[str, str, float]]] = {}
+        # classements déjà calculés
+        self.resultats: Dict[Tuple[int, Optional[int], bool, int, bool], List[Tuple[str, str, float]]] = {}
+
+    def _verifier(self):
+        """Oublie les valeurs gardées si la table a été modifiée depuis"""
+        if self.version[0] is not self.table.jour or self.version[1] != len(self.table):
+            self.version = (self.table.jour, len(self.table))
+            self.valeurs.clear()
+            self.resultats.clear()
+
+    def latest_values(
+        self,
+        col: int,
+        date: Optional[datetime.datetime] = None,
+        by_age: bool = False,
+    ) -> List[Tuple[str, str, float]]:
+        """Retourne la dernière valeur connue à la date indiquée de chaque
+        région (toutes classes d'âge confondues), ou de chaque couple
+        région et classe d'âge
+
+        :param col: L'indice de la colonne de valeurs
+        :type col: int
+        :param date: La date limite (comprise), si None les valeurs les plus récentes sont utilisées, par défaut None
+        :type date: Optional[datetime.datetime], optional
+        :param by_age: Si True, chaque classe d'âge est classée séparément, par défaut False
+        :type by_age: bool, optional
+        :return: Les valeurs sous la forme (région, classe d'âge, valeur),
+        dans l'ordre de REGIONS puis de AGES
+        :rtype: List[Tuple[str, str, float]]
+        """
+        self._verifier()
+        cle = (col, date.toordinal() if date is not None else None, by_age)
+        output = self.valeurs.get(cle)
+        if output is None:
+            ages = [code for code, label in AGES] if by_age else ["0"]
+            output = []
+            if col in COLONNES_CUBE:
+                position = COLONNES_CUBE.index(col)
+                for reg in REGIONS:
+                    for age in ages:
+                        ligne = latest_row(self.table, reg, age, date)
+                        if ligne is not None: # pas de données pour ce couple
+                            output.append((reg, age, float(ligne[position])))
+            else:
+                colonne = self.table.valeurs[col]
+                index = self.table.index()
+                for reg in REGIONS:
+                    for age in ages:
+                        ligne = index.latest(reg, age, date)
+                        if ligne is not None:
+                            output.append((reg, age, colonne[ligne]))
+            self.valeurs[cle] = output
+        return output
+
+    def top(
+        self,
+        col: int,
+        k: int = 5,
+        date: Optional[datetime.datetime] = None,
+        by_age: bool = False,
+        smallest: bool = False,
+    ) -> List[Tuple[str, str, float]]:
+        """Retourne les K régions (ou couples région et classe d'âge)
+        ayant les plus grandes valeurs de la colonne à la date indiquée.
+        En cas d'égalité, l'ordre de REGIONS est gardé.
+
+        :param col: L'indice de la colonne de valeurs
+        :type col: int
+        :param k: Le nombre de régions du classement, par défaut 5
+        :type k: int, optional
+        :param date: La date limite (comprise), si None les valeurs les plus récentes sont utilisées, par défaut None
+        :type date: Optional[datetime.datetime], optional
+        :param by_age: Si True, chaque classe d'âge est classée séparément, par défaut False
+        :type by_age: bool, optional
+        :param smallest: Si True, les plus petites valeurs sont retournées, par défaut False
+        :type smallest: bool, optional
+        :return: Le classement sous la forme (région, classe d'âge, valeur)
+        :rtype: List[Tuple[str, str, float]]
+        """
+        valeurs = self.latest_values(col, date, by_age)
+        cle = (col, date.toordinal() if date is not None else None, by_age, k, smallest)
+        output = self.resultats.get(cle)
+        if output is None:
+            selection = heapq.nsmallest if smallest else heapq.nlargest
+            output = self.resultats[cle] = selection(k, valeurs, key=lambda valeur: valeur[2])
+        return output
+
+# Classements des tables déjà utilisées
+_RANKINGS: "weakref.WeakKeyDictionary[Table, Ranking]" = weakref.WeakKeyDictionary()
+
+def ranking(table: Table) -> Ranking:
+    """Retourne le classement de la table, créé à la première utilisation.
+    Le même objet est retourné tant que la table existe, les classements
+    déjà calculés sont donc réutilisés.
+
+    :param table: La table
+    :type table: Table
+    :return: Le classement
+    :rtype: Ranking
+    """
+    output = _RANKINGS.get(table)
+    if output is None:
+        output = _RANKINGS[table] = Ranking(table)
+    return output
+
+# Données des diagrammes du rapport
+def vaccinated_counts(table: Table) -> Tuple[List[datetime.datetime], List[Sequence[float]]]:
+    """Retourne les données du premier diagramme : le nombre cumulé de
+    personnes vaccinées au cours du temps
+
+    :param table: La table, limitée à une région et une classe d'âge
+    :type table: Table
+    :return: Les dates (triées, les lignes de la table peuvent être dans
+    n'importe quel ordre), et pour chaque colonne de CUMULES les valeurs
+    correspondantes
+    :rtype: Tuple[List[datetime.datetime], List[Sequence[float]]]
+    """
+    data = table.take(table.index().rows())
+    return data.dates(), [data.column(col) for col in CUMULES]
+
+def coverage_by_sex(table: Table) -> Tuple[float, float, float]:
+    """Retourne les données du second diagramme : la couverture
+    vaccinale complète des hommes, des femmes et de toute la population
+    à la date la plus récente de la table
+
+    :param table: La table, limitée à une région et une classe d'âge
+    :type table: Table
+    :return: Les couvertures des hommes, des femmes et totale (en %)
+    :rtype: Tuple[float, float, float]
+    :raises ValueError: Si la table est vide
+    """
+    ligne = latest_row(table, *_group(table))
+    return tuple(float(ligne[COLONNES_CUBE.index(col)]) for col in (COUV_COMPLET_H, COUV_COMPLET_F, COUV_COMPLET_E))
+
+def coverage_by_age(table: Table) -> List[Tuple[str, List[datetime.datetime], Sequence[float]]]:
+    """Retourne les données du troisième diagramme : l'évolution de la
+    couverture vaccinale complète de chaque classe d'âge
+
+    :param table: La table, limitée à une région
+    :type table: Table
+    :return: Pour chaque classe d'âge de AGES, son code, les dates et
+    les couvertures correspondantes
+    :rtype: List[Tuple[str, List[datetime.datetime], Sequence[float]]]
+    """
+    index = table.index()
+    output = []
+    for code, label in AGES:
+        data = table.take(index.rows(age=code))
+        output.append((code, data.dates(), data.column(COUV_COMPLET_E)))
+    return output
+
+def dose_breakdown(table: Table) -> "np.ndarray":
+    """Retourne les données du quatrième diagramme : la répartition la
+    plus récente de la population selon le nombre de doses
+
+    :param table: La table, limitée à une région et une classe d'âge
+    :type table: Table
+    :return: Les NB_PARTS pourcentages de la répartition
+    :rtype: np.ndarray
+    :raises ValueError: Si la table est vide
+    """
+    ligne = latest_row(table, *_group(table))
+    return breakdown(ligne[POSITIONS_COUVERTURES])
+
+def dose_breakdown_by_age(table: Table) -> "np.ndarray":
+    """Retourne les données du cinquième diagramme : la répartition la
+    plus récente de chaque classe d'âge selon le nombre de doses
+
+    :param table: La table, limitée à une région
+    :type table: Table
+    :return: Un tableau de taille (nombre de classes d'âge, NB_PARTS),
+    dans l'ordre de AGES, nan pour les classes d'âge sans données
+    :rtype: np.ndarray
+    :raises ValueError: Si la table est vide
+    """
+    reg, age = _group(table)
+    couvertures = np.full((len(AGES), len(COUVERTURES)), np.nan)
+    for i, (code, label) in enumerate(AGES):
+        ligne = latest_row(table, reg, code)
+        if ligne is not None:
+            couvertures[i] = ligne[POSITIONS_COUVERTURES]
+    return breakdown(couvertures)
+
+def top_regions(table: Table, k: int = 5) -> List[Tuple[str, float]]:
+    """Retourne les données du sixième diagramme : les K régions ayant
+    la meilleure couverture vaccinale complète à la date la plus récente
+
+    :param table: La table, avec toutes les régions
+    :type table: Table
+    :param k: Le nombre de régions, par défaut 5
+    :type k: int, optional
+    :return: Le code et la couverture (en %) de chaque région
+    :rtype: List[Tuple[str, float]]
+    """
+    return [(code, couv) for code, age, couv in ranking(table).top(COUV_COMPLET_E, k)]
@@ -0,0 +1,196 @@
+""" Ce fichier contient la commande stats, qui charge et filtre la base
+de données comme pour un rapport, puis affiche un résumé des données et
+la durée de chaque étape, sans générer d'image.
+
+Aucun module de dessin n'est importé : la commande mesure le coût de la
+lecture et du filtrage seuls.
+
+Avec l'option --format json ou csv, la commande écrit à la place les
+valeurs des six diagrammes du rapport (calculées par stats.py), une
+ligne par valeur. Toutes les valeurs sont calculées avant d'écrire la
+première : une erreur de calcul ne laisse pas une sortie à moitié écrite.
+"""
+
+# Importations nécessaire pour le typing
+from typing import Dict, Iterable, Iterator, Optional, TextIO, Tuple, Union
+
+# Importation des modules nécessaires à la mesure
+import os
+import sys
+import csv
+import json
+import math
+import time
+import argparse
+
+# Importation des module nécessaire à la gestion du temps
+import datetime
+
+from constants import AGES, REGIONS
+from table import Table, day_to_datetime
+from batch import find_file
+from main import COLORS, load_database, build_views
+
+def parse_date_range(dates: Optional[str]) -> Optional[Tuple[Union[datetime.datetime, None]]]:
+    """Convertit un intervalle de dates au format AAAA-MM-JJ..AAAA-MM-JJ
+    (ou ..AAAA-MM-JJ, ou une seule date) en filtre de date
+
+    :param dates: L'intervalle, si None pas de filtre de date
+    :type dates: Optional[str]
+    :return: Le filtre de date (si None, pas de filtre de date)
+    :rtype: Optional[Tuple[Union[datetime.datetime, None]]]
+    """
+    if dates is None:
+        return None
+    if ".." not in dates:
+        return (None, datetime.datetime.fromisoformat(dates))
+    debut, fin = dates.split("..")
+    return (
+        datetime.datetime.fromisoformat(debut) if debut else None,
+        datetime.datetime.fromisoformat(fin),
+    )
+
+def describe(database: Table) -> Dict[str, object]:
+    """Retourne un résumé d'une table : nombre de lignes, de régions, de
+    classes d'âge et période couverte"""
+    index = database.index()
+    jours = database.jour
+    return {
+        "lignes": len(database),
+        "regions": len(index.regions),
+        "ages": len({age for reg, age in index.groupes}),
+        "debut": day_to_datetime(min(jours)).date().isoformat() if len(jours) else None,
+        "fin": day_to_datetime(max(jours)).date().isoformat() if len(jours) else None,
+    }
+
+# Colonnes des valeurs écrites en json ou en csv
+CHAMPS = ["diagramme", "serie", "cle", "valeur"]
+# Noms des séries du premier diagramme, dans l'ordre de stats.CUMULES
+SERIES_CUMULES = ["cumule_dose1", "cumule_complet", "cumule_rappel", "cumule_2_rappel"]
+
+def iter_aggregates(views: Dict[str, Table]) -> Iterator[Tuple[int, str, str, float]]:
+    """Calcule les valeurs des diagrammes du rapport, dans l'ordre des
+    diagrammes. Chaque diagramme n'est calculé qu'au moment où ses
+    valeurs sont demandées.
+
+    :param views: Les vues de la base de données (voir main.build_views)
+    :type views: Dict[str, Table]
+    :return: Les valeurs sous la forme (numéro du diagramme, série, clé,
+    valeur). La clé est une date au format AAAA-MM-JJ, une part de la
+    population (voir stats.PARTS) ou un code de région
+    :rtype: Iterator[Tuple[int, str, str, float]]
+    """
+    # le module de calcul n'est importé que si nécessaire (il importe numpy)
+    import stats
+
+    dates, colonnes = stats.vaccinated_counts(views["fall"])
+    for serie, colonne in zip(SERIES_CUMULES, colonnes):
+        for date, valeur in zip(dates, colonne):
+            yield 1, serie, date.date().isoformat(), valeur
+
+    for cle, valeur in zip(["hommes", "femmes", "total"], stats.coverage_by_sex(views["fall"])):
+        yield 2, "couv_complet", cle, valeur
+
+    for code, dates, couv in stats.coverage_by_age(views["fage"]):
+        for date, valeur in zip(dates, couv):
+            yield 3, f"couv_complet_{code}", date.date().isoformat(), valeur
+
+    for part, valeur in zip(stats.PARTS, stats.dose_breakdown(views["fall"])):
+        yield 4, "repartition", part, float(valeur)
+
+    for (code, label), parts in zip(AGES, stats.dose_breakdown_by_age(views["fage"])):
+        for part, valeur in zip(stats.PARTS, parts):
+            yield 5, f"repartition_{code}", part, float(valeur)
+
+    for code, couv in stats.top_regions(views["freg"], 5):
+        yield 6, "couv_complet", code, couv
+
+def write_json(valeurs: Iterable[Tuple[int, str, str, float]], file: TextIO):
+    """Écrit les valeurs dans une liste json, un objet par ligne. Les
+    valeurs manquantes (nan) sont écrites null."""
+    file.write("[")
+    separateur = "\n"
+    for valeur in valeurs:
+        ligne = dict(zip(CHAMPS, valeur))
+        if math.isnan(ligne["valeur"]):
+            ligne["valeur"] = None
+        file.write(separateur + json.dumps(ligne, ensure_ascii=False))
+        separateur = ",\n"
+    file.write("\n]\n")
+
+def write_csv(valeurs: Iterable[Tuple[int, str, str, float]], file: TextIO):
+    """Écrit les valeurs au format csv, avec le même séparateur que le
+    fichier des données. Les valeurs manquantes (nan) sont laissées vides."""
+    writer = csv.writer(file, delimiter=";", lineterminator="\n")
+    writer.writerow(CHAMPS)
+    for diagramme, serie, cle, valeur in valeurs:
+        writer.writerow([diagramme, serie, cle, "" if math.isnan(valeur) else valeur])
+
+# Fonctions d'écriture de chaque format de l'option --format
+FORMATS = {
+    "json": write_json,
+    "csv": write_csv,
+}
+
+def run_stats_command(arguments: argparse.Namespace):
+    """Exécute la commande stats avec les arguments de la ligne de commande
+
+    :param arguments: Les arguments lus par main.parse_arguments
+    :type arguments: argparse.Namespace
+    """
+    try:
+        date = parse_date_range(arguments.dates)
+    except ValueError as e:
+        raise SystemExit(f"{COLORS['fg']['red']}{e}{COLORS['reset']}")
+    if arguments.format != "text" and arguments.region is None:
+        raise SystemExit(f"{COLORS['fg']['red']}L'option --region est obligatoire avec --format {arguments.format}.{COLORS['reset']}")
+    chemin = arguments.file if arguments.file is not None else find_file()
+
+    durees = {}
+    debut = time.perf_counter()
+    database = load_database(chemin)
+    durees["chargement"] = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    index = database.index()
+    durees["index"] = time.perf_counter() - debut
+    if arguments.region is not None and (arguments.region not in REGIONS or not index.has_region(arguments.region)):
+        raise SystemExit(f"{COLORS['fg']['red']}La région {arguments.region} est invalide.{COLORS['reset']}")
+
+    if arguments.format != "text":
+        views = build_views(database, arguments.region, date)
+        if len(views["fall"]) == 0:
+            raise SystemExit(f"{COLORS['fg']['red']}Aucune donnée pour ces dates.{COLORS['reset']}")
+        # toutes les valeurs sont calculées avant d'écrire quoi que ce
+        # soit, une erreur ne laisse donc pas une sortie à moitié écrite
+        try:
+            valeurs = list(iter_aggregates(views))
+        except ValueError as e: # par exemple plusieurs lignes le même jour (voir stats.AsOfCube)
+            raise SystemExit(f"{COLORS['fg']['red']}Le fichier {chemin} est invalide : {e}{COLORS['reset']}")
+        # seules les valeurs sont écrites, pour pouvoir être lues par un
+        # autre programme
+        try:
+            FORMATS[arguments.format](valeurs, sys.stdout)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # le programme qui lit les valeurs s'est arrêté avant la fin
+            # (par exemple head), on redirige la sortie pour que python
+            # n'affiche pas d'erreur en se fermant
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return
+
+    print(f"Fichier {chemin}")
+    resume = describe(database)
+    print(f"  {resume['lignes']} lignes, {resume['regions']} régions, {resume['ages']} classes d'âge, du {resume['debut']} au {resume['fin']}")
+
+    if arguments.region is not None:
+        debut = time.perf_counter()
+        views = build_views(database, arguments.region, date)
+        durees["filtre"] = time.perf_counter() - debut
+        for name, view in views.items():
+            resume = describe(view)
+            print(f"  vue {name} : {resume['lignes']} lignes, du {resume['debut']} au {resume['fin']}")
+
+    print("Durées :")
+    for etape, duree in durees.items():
+        print(f"  {etape:<12}{duree * 1000:>10.1f} ms")
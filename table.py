@@ -0,0 +1,641 @@
+""" Ce fichier contient la table utilisée pour stocker la base de données
+en mémoire. Les données sont rangées par colonnes typées plutôt que
+ligne par ligne, ce qui prend beaucoup moins de place en mémoire et
+évite de convertir plusieurs fois les mêmes valeurs.
+"""
+
+# Importations nécessaire pour le typing
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Importation du module des tableaux typés
+from array import array
+
+# Importation de la recherche dichotomique utilisée par l'index
+from bisect import bisect_right
+
+# Importation des module nécessaire à la gestion du temps
+import datetime
+
+# Position des colonnes qui ne sont pas des nombres
+from constants import REG, AGE, JOUR
+
+# Nombre de colonnes d'un fichier vacsi-s-a-reg
+NB_COLONNES = 39
+
+# Types des tableaux utilisés pour chaque sorte de colonne
+TYPE_CATEGORIE = 'B' # entier non signé sur un octet (moins de 256 régions ou classes d'âge)
+TYPE_JOUR = 'l' # numéro du jour (voir datetime.date.toordinal)
+TYPE_VALEUR = 'd' # nombre flottant sur 64 bits
+
+# Nombre de lignes gardées dans chaque morceau lors d'une lecture en flux
+CHUNK_SIZE = 10000
+
+# Dates déjà converties. Le fichier ne contient que quelques centaines
+# de dates différentes pour des centaines de milliers de lignes, chaque
+# texte n'est donc converti qu'une seule fois.
+_JOURS: Dict[str, int] = {}
+_DATETIMES: Dict[int, datetime.datetime] = {}
+_DATETIMES_TEXTE: Dict[str, datetime.datetime] = {}
+
+def parse_day(raw_date: str) -> int:
+    """Convertit une date au format ISO en numéro de jour, en utilisant
+    le cache des dates déjà converties
+
+    :param raw_date: La date lue dans le fichier
+    :type raw_date: str
+    :return: Le numéro du jour (voir datetime.date.toordinal)
+    :rtype: int
+    """
+    jour = _JOURS.get(raw_date)
+    if jour is None:
+        jour = _JOURS[raw_date] = parse_datetime(raw_date).toordinal()
+    return jour
+
+def day_to_datetime(jour: int) -> datetime.datetime:
+    """Convertit un numéro de jour en date. Le même objet est retourné
+    pour un même jour.
+
+    :param jour: Le numéro du jour
+    :type jour: int
+    :return: La date correspondante, à minuit
+    :rtype: datetime.datetime
+    """
+    date = _DATETIMES.get(jour)
+    if date is None:
+        date = _DATETIMES[jour] = datetime.datetime.fromordinal(jour)
+    return date
+
+def parse_datetime(raw_date: str) -> datetime.datetime:
+    """Convertit une date au format ISO en objet datetime.datetime, en
+    utilisant le cache des dates déjà converties
+
+    :param raw_date: La date lue dans le fichier
+    :type raw_date: str
+    :return: La date correspondante
+    :rtype: datetime.datetime
+    """
+    date = _DATETIMES_TEXTE.get(raw_date)
+    if date is None:
+        date = datetime.datetime.fromisoformat(raw_date)
+        if date.time() == datetime.time(): # on partage l'objet avec day_to_datetime
+            date = day_to_datetime(date.toordinal())
+        _DATETIMES_TEXTE[raw_date] = date
+    return date
+
+def to_float(valeur: str) -> float:
+    """Convertit une valeur du fichier csv en nombre flottant.
+    Les cases vides sont converties en NaN.
+
+    :param valeur: La valeur lue dans le fichier
+    :type valeur: str
+    :return: La valeur convertie
+    :rtype: float
+    """
+    if valeur == "":
+        return float("nan")
+    return float(valeur)
+
+def date_bounds(
+    date: Optional[Tuple[Union[datetime.datetime, None]]],
+) -> Tuple[Optional[int], Optional[int]]:
+    """Convertit un filtre de date en numéros de jours minimum et
+    maximum (compris). Une ligne est datée de minuit, une limite
+    minimum située après minuit exclut donc le jour même.
+
+    :param date: Le filtre de date (si None, pas de filtre de date)
+    :type date: Optional[Tuple[Union[datetime.datetime, None]]]
+    :return: Les numéros de jours minimum et maximum, None s'il n'y a pas de limite
+    :rtype: Tuple[Optional[int], Optional[int]]
+    """
+    if date is None:
+        return None, None
+    debut, fin = date
+    jour_min = None
+    if debut is not None:
+        jour_min = debut.toordinal()
+        if debut != datetime.datetime.fromordinal(jour_min): # la limite n'est pas à minuit
+            jour_min += 1
+    jour_max = fin.toordinal() if fin is not None else None
+    return jour_min, jour_max
+
+def iter_chunks(
+    rows: Iterable[List[str]],
+    reg: Optional[str] = None,
+    date: Optional[Tuple[Union[datetime.datetime, None]]] = None,
+    keep_ages: bool = True,
+    chunk_size: int = CHUNK_SIZE,
+    nb_colonnes: int = NB_COLONNES,
+) -> Iterator["Table"]:
+    """Construit des tables à partir de lignes lues dans le fichier csv,
+    en appliquant les filtres pendant la lecture. Les lignes qui ne
+    passent pas les filtres ne sont jamais converties.
+
+    Les filtres ont le même sens que ceux de filter_check, mais par
+    défaut toutes les classes d'âge sont gardées.
+
+    :param rows: Les lignes du fichier csv, sans les headers
+    :type rows: Iterable[List[str]]
+    :param reg: La région du filtre (si None, pas de filtre de région), par défaut None
+    :type reg: Optional[str], optional
+    :param date: Le filtre de date (si None, pas de filtre de date), par défaut None
+    :type date: Optional[Tuple[Union[datetime.datetime, None]]], optional
+    :param keep_ages: Si False, seule la classe d'âge 0 est gardée, par défaut True
+    :type keep_ages: bool, optional
+    :param chunk_size: Le nombre maximum de lignes par table, par défaut CHUNK_SIZE
+    :type chunk_size: int, optional
+    :param nb_colonnes: Le nombre de colonnes du fichier, par défaut NB_COLONNES
+    :type nb_colonnes: int, optional
+    :return: Les tables successives, qui partagent les mêmes codes de catégories
+    :rtype: Iterator[Table]
+    """
+    jour_min, jour_max = date_bounds(date)
+    check_date = date is not None
+    jours_connus = _JOURS.get # évite de rechercher la fonction à chaque ligne
+
+    chunk = Table(nb_colonnes)
+    for row in rows:
+        # on teste d'abord les filtres qui ne demandent aucune conversion
+        if not keep_ages and row[AGE] != "0":
+            continue
+        if reg is not None and row[REG] != reg:
+            continue
+        jour = jours_connus(row[JOUR])
+        if jour is None: # date jamais rencontrée
+            jour = parse_day(row[JOUR])
+        if check_date:
+            if jour_min is not None and jour < jour_min:
+                continue
+            if jour_max is not None and jour > jour_max:
+                continue
+        chunk.append_row(row, jour)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            # le morceau suivant reprend les catégories déjà connues
+            chunk = chunk.empty_copy()
+    if len(chunk) > 0:
+        yield chunk
+
+class Index:
+    """Index d'une table par région et classe d'âge.
+
+    Pour chaque couple (région, classe d'âge), l'index garde les indices
+    des lignes triées par date. Les lignes d'un couple sont donc
+    retrouvées sans parcourir la table, et la dernière ligne avant une
+    date est trouvée par recherche dichotomique.
+    """
+
+    def __init__(self, table: "Table"):
+        """Construit l'index d'une table
+
+        :param table: La table à indexer
+        :type table: Table
+        """
+        reg, age, jour = table.reg, table.age, table.jour
+        # on trie les lignes par région, classe d'âge puis date (le tri
+        # est stable, l'ordre du fichier est gardé pour une même date)
+        ordre = sorted(range(len(table)), key=lambda i: (reg[i], age[i], jour[i]))
+        self.ordre = array(TYPE_JOUR, ordre)
+        self.jours = array(TYPE_JOUR, [jour[i] for i in ordre])
+
+        # on repère le début et la fin de chaque couple (région, classe d'âge)
+        self.groupes: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        debut = 0
+        for position in range(1, len(ordre) + 1):
+            if position == len(ordre) or (reg[ordre[position]], age[ordre[position]]) != (reg[ordre[debut]], age[ordre[debut]]):
+                cle = (table.regions[reg[ordre[debut]]], table.ages[age[ordre[debut]]])
+                self.groupes[cle] = (debut, position)
+                debut = position
+        self.regions = {reg for reg, age in self.groupes}
+
+    def has_region(self, reg: str) -> bool:
+        """Indique si la table contient des lignes de la région"""
+        return reg in self.regions
+
+    def _bornes(self, reg: Optional[str], age: Optional[str]) -> List[Tuple[int, int]]:
+        """Retourne les positions des groupes correspondants aux critères
+        (un critère à None correspond à toutes les valeurs)"""
+        if reg is not None and age is not None:
+            bornes = self.groupes.get((reg, age))
+            return [bornes] if bornes is not None else []
+        return [
+            bornes for (groupe_reg, groupe_age), bornes in self.groupes.items()
+            if (reg is None or groupe_reg == reg) and (age is None or groupe_age == age)
+        ]
+
+    def rows(self, reg: Optional[str] = None, age: Optional[str] = None) -> List[int]:
+        """Retourne les indices des lignes de la région et de la classe
+        d'âge, triés par date. Un critère à None correspond à toutes les
+        valeurs.
+
+        :param reg: Le code de la région, par défaut None
+        :type reg: Optional[str], optional
+        :param age: Le code de la classe d'âge, par défaut None
+        :type age: Optional[str], optional
+        :return: Les indices des lignes dans la table
+        :rtype: List[int]
+        """
+        bornes = self._bornes(reg, age)
+        if len(bornes) == 1: # un seul groupe, il est déjà trié par date
+            debut, fin = bornes[0]
+            return list(self.ordre[debut:fin])
+        positions = [position for debut, fin in bornes for position in range(debut, fin)]
+        positions.sort(key=lambda position: self.jours[position])
+        return [self.ordre[position] for position in positions]
+
+    def latest(
+        self,
+        reg: Optional[str] = None,
+        age: Optional[str] = None,
+        date: Optional[datetime.datetime] = None,
+    ) -> Optional[int]:
+        """Retourne l'indice de la ligne la plus récente de la région et
+        de la classe d'âge, à la date indiquée ou avant.
+
+        :param reg: Le code de la région, par défaut None
+        :type reg: Optional[str], optional
+        :param age: Le code de la classe d'âge, par défaut None
+        :type age: Optional[str], optional
+        :param date: La date limite (comprise), si None la ligne la plus récente est retournée, par défaut None
+        :type date: Optional[datetime.datetime], optional
+        :return: L'indice de la ligne dans la table, ou None si aucune ligne ne correspond
+        :rtype: Optional[int]
+        """
+        jour_max = date.toordinal() if date is not None else None
+        meilleur = None
+        for debut, fin in self._bornes(reg, age):
+            if jour_max is None:
+                position = fin - 1
+            else:
+                # recherche dichotomique de la dernière ligne avant la date
+                position = bisect_right(self.jours, jour_max, debut, fin) - 1
+            if position < debut: # aucune ligne avant la date
+                continue
+            if meilleur is None or self.jours[position] > self.jours[meilleur]:
+                meilleur = position
+        if meilleur is None:
+            return None
+        return self.ordre[meilleur]
+
+class Table:
+    """Base de données stockée par colonnes.
+
+    Les codes de région et de classe d'âge sont remplacés par des petits
+    entiers (leur indice dans ``regions`` et ``ages``), les dates sont
+    stockées sous forme de numéro de jour et toutes les autres colonnes
+    sont stockées sous forme de nombres flottants.
+
+    Une ligne de la table (obtenue avec ``table[i]`` ou en itérant sur
+    la table) a le même format qu'une ligne convertie avec
+    ``convert_database`` : région et classe d'âge sous forme de texte,
+    date sous forme de ``datetime.datetime`` et le reste en flottants.
+    """
+
+    def __init__(
+        self,
+        nb_colonnes: int = NB_COLONNES,
+        regions: Optional[List[str]] = None,
+        ages: Optional[List[str]] = None,
+    ):
+        """Crée une table vide
+
+        :param nb_colonnes: Le nombre de colonnes de la table, par défaut NB_COLONNES
+        :type nb_colonnes: int, optional
+        :param regions: Les catégories de région déjà connues, par défaut None
+        :type regions: Optional[List[str]], optional
+        :param ages: Les catégories de classe d'âge déjà connues, par défaut None
+        :type ages: Optional[List[str]], optional
+        """
+        self.nb_colonnes = nb_colonnes
+        # valeurs des catégories, l'indice dans la liste est le code stocké
+        self.regions: List[str] = list(regions) if regions is not None else []
+        self.ages: List[str] = list(ages) if ages is not None else []
+        # dictionnaires inverses pour retrouver rapidement le code d'une valeur
+        self.codes_regions: Dict[str, int] = {reg: i for i, reg in enumerate(self.regions)}
+        self.codes_ages: Dict[str, int] = {age: i for i, age in enumerate(self.ages)}
+
+        self.reg = array(TYPE_CATEGORIE)
+        self.age = array(TYPE_CATEGORIE)
+        self.jour = array(TYPE_JOUR)
+        self.valeurs: Dict[int, array] = {
+            col: array(TYPE_VALEUR) for col in range(JOUR + 1, nb_colonnes)
+        }
+        self._index: Optional[Index] = None
+        # empreinte du fichier d'où proviennent les données (voir cache.py)
+        self.empreinte: Optional[str] = None
+        # emplacement du fichier csv d'où provient la base de données complète
+        self.chemin: Optional[str] = None
+        # pour une vue filtrée : la base de données d'origine (ou son
+        # empreinte, pour une vue reçue d'un autre processus) et le filtre
+        # (région, classe d'âge, jours minimum et maximum), voir stats.latest_row
+        self.origine: Optional[Tuple[Union["Table", str, None], Optional[str], Optional[str], Optional[int], Optional[int]]] = None
+
+    def columns(self) -> Dict[str, Sequence[Any]]:
+        """Retourne toutes les colonnes stockées de la table, avec leur nom.
+        Les colonnes de valeurs sont nommées par leur indice.
+
+        :return: Associe le nom de chaque colonne au tableau la contenant
+        :rtype: Dict[str, Sequence[Any]]
+        """
+        output = {"reg": self.reg, "age": self.age, "jour": self.jour}
+        for col, colonne in self.valeurs.items():
+            output[str(col)] = colonne
+        return output
+
+    def set_columns(self, colonnes: Dict[str, Sequence[Any]]):
+        """Remplace toutes les colonnes stockées de la table. Les
+        colonnes peuvent être des tableaux ou des memoryview (par exemple
+        d'un fichier ouvert avec mmap), qui seront copiés en tableaux
+        si des lignes sont ajoutées.
+
+        :param colonnes: Les colonnes, au format de columns()
+        :type colonnes: Dict[str, Sequence[Any]]
+        """
+        self.reg = colonnes["reg"]
+        self.age = colonnes["age"]
+        self.jour = colonnes["jour"]
+        for col in self.valeurs:
+            self.valeurs[col] = colonnes[str(col)]
+        self._index = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Prépare la table pour être envoyée à un autre processus. Les
+        colonnes lues depuis le cache sont copiées et l'index n'est pas
+        envoyé, il sera reconstruit si nécessaire. La base de données
+        d'origine d'une vue n'est pas envoyée non plus, elle est remplacée
+        par son empreinte (voir stats.register_cube). La table elle-même
+        n'est pas modifiée."""
+        state = self.__dict__.copy()
+        state["_index"] = None
+        if self.origine is not None:
+            base = self.origine[0]
+            state["origine"] = (base.empreinte if isinstance(base, Table) else base,) + self.origine[1:]
+        if isinstance(self.jour, memoryview):
+            colonnes = self._copy_columns()
+            state["reg"], state["age"], state["jour"] = colonnes["reg"], colonnes["age"], colonnes["jour"]
+            state["valeurs"] = {col: colonnes[str(col)] for col in self.valeurs}
+        return state
+
+    def _copy_columns(self) -> Dict[str, array]:
+        """Retourne une copie des colonnes lues depuis le cache dans des
+        tableaux modifiables, au format de columns()"""
+        colonnes = {}
+        for nom, colonne in self.columns().items():
+            copie = array(colonne.format)
+            copie.frombytes(colonne.cast("B"))
+            colonnes[nom] = copie
+        return colonnes
+
+    def _make_writable(self):
+        """Copie les colonnes en lecture seule dans des tableaux modifiables"""
+        if not isinstance(self.jour, memoryview):
+            return
+        self.set_columns(self._copy_columns())
+
+    # Gestion des catégories
+    def code_region(self, reg: str) -> int:
+        """Retourne le code de la région, en l'ajoutant si nécessaire"""
+        code = self.codes_regions.get(reg)
+        if code is None:
+            code = len(self.regions)
+            self.regions.append(reg)
+            self.codes_regions[reg] = code
+        return code
+
+    def code_age(self, age: str) -> int:
+        """Retourne le code de la classe d'âge, en l'ajoutant si nécessaire"""
+        code = self.codes_ages.get(age)
+        if code is None:
+            code = len(self.ages)
+            self.ages.append(age)
+            self.codes_ages[age] = code
+        return code
+
+    def has_region(self, reg: str) -> bool:
+        """Indique si la région fait partie des catégories de la table,
+        sans construire l'index. Pour une table lue depuis un fichier,
+        ce sont exactement les régions qui ont des lignes (une vue
+        filtrée garde en revanche toutes les catégories de sa base)."""
+        return reg in self.codes_regions
+
+    # Remplissage de la table
+    def append_row(self, row: List[str], jour: Optional[int] = None):
+        """Ajoute une ligne lue dans le fichier csv à la table
+
+        :param row: La ligne à ajouter, sous forme de texte
+        :type row: List[str]
+        :param jour: Le numéro du jour de la ligne s'il est déjà connu, par défaut None
+        :type jour: Optional[int], optional
+        """
+        if jour is None:
+            jour = parse_day(row[JOUR])
+        self._make_writable()
+        self.reg.append(self.code_region(row[REG]))
+        self.age.append(self.code_age(row[AGE]))
+        self.jour.append(jour)
+        self._index = None # l'index doit être reconstruit
+        for col, colonne in self.valeurs.items():
+            colonne.append(to_float(row[col]))
+
+    def extend(self, other: "Table"):
+        """Ajoute toutes les lignes d'une autre table à la fin de celle-ci
+
+        :param other: La table à ajouter
+        :type other: Table
+        """
+        self._make_writable()
+        # on traduit les codes de l'autre table vers les codes de cette table
+        traduction_reg = [self.code_region(reg) for reg in other.regions]
+        traduction_age = [self.code_age(age) for age in other.ages]
+        if traduction_reg == list(range(len(traduction_reg))):
+            self.reg.extend(other.reg) # les codes sont identiques, pas besoin de les traduire
+        else:
+            self.reg.extend(array(TYPE_CATEGORIE, [traduction_reg[code] for code in other.reg]))
+        if traduction_age == list(range(len(traduction_age))):
+            self.age.extend(other.age)
+        else:
+            self.age.extend(array(TYPE_CATEGORIE, [traduction_age[code] for code in other.age]))
+        self.jour.extend(other.jour)
+        self._index = None
+        for col, colonne in self.valeurs.items():
+            colonne.extend(other.valeurs[col])
+
+    def index(self) -> Index:
+        """Retourne l'index de la table par région et classe d'âge.
+        L'index n'est construit qu'une seule fois.
+
+        :return: L'index de la table
+        :rtype: Index
+        """
+        if self._index is None:
+            self._index = Index(self)
+        return self._index
+
+    def empty_copy(self) -> "Table":
+        """Retourne une table vide partageant les mêmes catégories"""
+        return Table(self.nb_colonnes, self.regions, self.ages)
+
+    def take(self, indices: Iterable[int]) -> "Table":
+        """Retourne une nouvelle table contenant uniquement les lignes indiquées
+
+        :param indices: Les indices des lignes à garder, dans l'ordre voulu
+        :type indices: Iterable[int]
+        :return: La nouvelle table
+        :rtype: Table
+        """
+        indices = list(indices)
+        output = self.empty_copy()
+        output.reg = array(TYPE_CATEGORIE, [self.reg[i] for i in indices])
+        output.age = array(TYPE_CATEGORIE, [self.age[i] for i in indices])
+        output.jour = array(TYPE_JOUR, [self.jour[i] for i in indices])
+        for col, colonne in self.valeurs.items():
+            output.valeurs[col] = array(TYPE_VALEUR, [colonne[i] for i in indices])
+        return output
+
+    # Accès aux données
+    def __len__(self) -> int:
+        return len(self.jour)
+
+    def row(self, i: int) -> List[Any]:
+        """Retourne la ligne d'indice i au format d'une ligne convertie
+
+        :param i: L'indice de la ligne
+        :type i: int
+        :return: La ligne
+        :rtype: List[Any]
+        """
+        output = [None] * self.nb_colonnes
+        output[REG] = self.regions[self.reg[i]]
+        output[AGE] = self.ages[self.age[i]]
+        output[JOUR] = day_to_datetime(self.jour[i])
+        for col, colonne in self.valeurs.items():
+            output[col] = colonne[i]
+        return output
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[List[Any], "Table"]:
+        if isinstance(key, slice):
+            return self.take(range(*key.indices(len(self))))
+        return self.row(key)
+
+    def __iter__(self) -> Iterator[List[Any]]:
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def column(self, col: int) -> Sequence[Any]:
+        """Retourne une colonne de la table.
+
+        Pour les colonnes de valeurs, le tableau typé est retourné
+        directement (sans copie), il ne doit donc pas être modifié.
+
+        :param col: L'indice de la colonne
+        :type col: int
+        :return: La colonne, sous forme de tableau de flottants pour les
+        valeurs, de texte pour la région et la classe d'âge et de dates
+        pour le jour
+        :rtype: Sequence[Any]
+        """
+        if col == REG:
+            return [self.regions[code] for code in self.reg]
+        if col == AGE:
+            return [self.ages[code] for code in self.age]
+        if col == JOUR:
+            return self.dates()
+        return self.valeurs[col]
+
+    def dates(self) -> List[datetime.datetime]:
+        """Retourne la colonne des dates sous forme d'objets datetime.datetime"""
+        # plusieurs lignes ont la même date, on ne crée qu'un objet par jour
+        return [day_to_datetime(jour) for jour in self.jour]
+
+    def indices_where(
+        self,
+        reg: Optional[str] = None,
+        age: Optional[str] = None,
+        debut: Optional[datetime.datetime] = None,
+        fin: Optional[datetime.datetime] = None,
+    ) -> List[int]:
+        """Retourne les indices des lignes correspondant aux critères.
+        Un critère à None n'est pas appliqué.
+
+        :param reg: Le code de la région, par défaut None
+        :type reg: Optional[str], optional
+        :param age: Le code de la classe d'âge, par défaut None
+        :type age: Optional[str], optional
+        :param debut: La date minimum (comprise), par défaut None
+        :type debut: Optional[datetime.datetime], optional
+        :param fin: La date maximum (comprise), par défaut None
+        :type fin: Optional[datetime.datetime], optional
+        :return: Les indices des lignes correspondantes
+        :rtype: List[int]
+        """
+        return self.indices_views({None: (reg, age, (debut, fin))})[None]
+
+    def indices_views(
+        self,
+        views: Dict[Any, Tuple[Optional[str], Optional[str], Optional[Tuple[Union[datetime.datetime, None]]]]],
+    ) -> Dict[Any, List[int]]:
+        """Retourne les indices des lignes correspondant à plusieurs
+        ensembles de critères, en ne parcourant la table qu'une seule fois.
+
+        :param views: Associe un nom de vue à ses critères : le code de la
+        région, le code de la classe d'âge et le filtre de date (un critère
+        à None n'est pas appliqué)
+        :type views: Dict[Any, Tuple[Optional[str], Optional[str], Optional[Tuple[Union[datetime.datetime, None]]]]]
+        :return: Associe chaque nom de vue aux indices des lignes correspondantes
+        :rtype: Dict[Any, List[int]]
+        """
+        output = {name: [] for name in views}
+        # on traduit les critères de chaque vue en codes et numéros de jours
+        criteres = []
+        for name, (reg, age, date) in views.items():
+            code_reg = None
+            if reg is not None:
+                code_reg = self.codes_regions.get(reg)
+                if code_reg is None: # la région n'existe pas dans la table, la vue reste vide
+                    continue
+            code_age = None
+            if age is not None:
+                code_age = self.codes_ages.get(age)
+                if code_age is None:
+                    continue
+            jour_min, jour_max = date_bounds(date)
+            criteres.append((output[name], code_reg, code_age, jour_min, jour_max))
+
+        if len(criteres) == 0:
+            return output
+
+        for i, (row_reg, row_age, row_jour) in enumerate(zip(self.reg, self.age, self.jour)):
+            # chaque ligne est lue une seule fois puis testée pour chaque vue
+            for indices, code_reg, code_age, jour_min, jour_max in criteres:
+                if code_reg is not None and row_reg != code_reg:
+                    continue
+                if code_age is not None and row_age != code_age:
+                    continue
+                if jour_min is not None and row_jour < jour_min:
+                    continue
+                if jour_max is not None and row_jour > jour_max:
+                    continue
+                indices.append(i)
+        return output
+
+    # Opérations compatibles avec selection et projection
+    def select(self, test: Callable[[List[Any]], bool]) -> "Table":
+        """Effectue une sélection sur la table, le test étant appliqué
+        sur chaque ligne au format d'une ligne convertie
+
+        :param test: Le test à effectuer sur chaque ligne
+        :type test: Callable[[List[Any]], bool]
+        :return: La table contenant les lignes validant le test
+        :rtype: Table
+        """
+        return self.take(i for i, row in enumerate(self) if test(row))
+
+    def project(self, listeNumCol: Tuple[int]) -> List[List[Any]]:
+        """Effectue une projection sur la table
+
+        :param listeNumCol: Contient les indices des colonnes à garder
+        :type listeNumCol: Tuple[int]
+        :return: La projection, sous forme de liste de listes
+        :rtype: List[List[Any]]
+        """
+        colonnes = [self.column(col) for col in listeNumCol]
+        return [list(values) for values in zip(*colonnes)]
@@ -0,0 +1,73 @@
+""" Vérifie la mise à jour incrémentale de la base de données depuis le
+cache (voir main.update_database) : le résultat doit toujours être celui
+d'une lecture complète du fichier csv.
+"""
+
+# Importations nécessaire pour le typing
+from typing import Any, List, Optional, Tuple
+
+# Importation des modules nécessaires à l'écriture des fichiers
+import csv
+import os
+import sys
+
+# on permet l'importation des fichiers du programme depuis ce dossier
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import main
+from table import Table
+from synthetic import CLASSES_AGE, generate_row, headers
+
+# Nombre de jours utilisé pour calculer les valeurs, les fichiers plus
+# courts ont donc les mêmes lignes pour les mêmes jours
+NB_JOURS = 40
+REGIONS = ["01", "11", "84"]
+
+def write_file(chemin: str, nb_jours: int, modifiee: Optional[Tuple[str, str, int]] = None):
+    """Écrit un fichier trié par région, classe d'âge puis date, comme le
+    vrai fichier. La ligne modifiee (région, classe d'âge, jour) a une
+    autre couverture vaccinale."""
+    with open(chemin, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file, delimiter=";")
+        writer.writerow(headers())
+        for reg in REGIONS:
+            for age in CLASSES_AGE:
+                for jour in range(nb_jours):
+                    row = generate_row(reg, age, jour, NB_JOURS)
+                    if (reg, age, jour) == modifiee:
+                        row[-1] = "99.9"
+                    writer.writerow(row)
+
+def rows(table: Table) -> List[Tuple[Any, ...]]:
+    """Retourne les lignes de la table triées, pour ignorer leur ordre"""
+    return sorted(
+        (table.regions[table.reg[i]], table.ages[table.age[i]], table.jour[i])
+        + tuple(colonne[i] for colonne in table.valeurs.values())
+        for i in range(len(table))
+    )
+
+def test_update_reads_only_new_days(tmp_path, monkeypatch):
+    chemin = str(tmp_path / "vacsi-s-a-reg-test.csv")
+    write_file(chemin, 10)
+    main.load_database(chemin)
+
+    write_file(chemin, 12)
+    def load_file(*args, **kwargs):
+        raise AssertionError("le fichier ne devrait pas être relu entièrement")
+    monkeypatch.setattr(main, "load_file", load_file)
+    data = main.load_database(chemin)
+    monkeypatch.undo()
+
+    assert rows(data) == rows(main.load_file(chemin))
+
+def test_update_rereads_modified_old_row(tmp_path):
+    chemin = str(tmp_path / "vacsi-s-a-reg-test.csv")
+    write_file(chemin, 10)
+    main.load_database(chemin)
+
+    # une ancienne date est corrigée en même temps que les nouvelles dates sont ajoutées
+    write_file(chemin, 12, modifiee=("11", "0", 3))
+    data = main.load_database(chemin)
+
+    assert rows(data) == rows(main.load_file(chemin))
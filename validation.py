@@ -0,0 +1,136 @@
+""" Ce fichier contient la commande validate, qui vérifie un fichier csv
+sans générer de rapport.
+
+Le fichier est lu ligne par ligne : le nombre de colonnes, les dates et
+les valeurs de chaque ligne sont vérifiées, ainsi que les dates de chaque
+région et classe d'âge. Une région et une classe d'âge ne doivent avoir
+qu'une ligne par jour (sinon la dernière valeur connue à une date n'est
+pas définie, voir stats.AsOfCube) ; les dates qui ne sont pas croissantes
+sont seulement signalées. Aucun module de dessin n'est importé.
+"""
+
+# Importations nécessaire pour le typing
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Importation des modules nécessaires à la lecture du fichier
+import csv
+import argparse
+
+from constants import AGES, REGIONS, REG, AGE, JOUR
+from table import NB_COLONNES, parse_day, to_float, day_to_datetime
+
+# Nombre maximum d'erreurs affichées
+MAX_ERREURS = 20
+
+def validate_rows(
+    rows: Iterable[List[str]],
+    nb_colonnes: int = NB_COLONNES,
+) -> Tuple[int, List[str], List[str]]:
+    """Vérifie les lignes d'un fichier csv
+
+    :param rows: Les lignes du fichier csv, sans les headers
+    :type rows: Iterable[List[str]]
+    :param nb_colonnes: Le nombre de colonnes attendu, par défaut NB_COLONNES
+    :type nb_colonnes: int, optional
+    :return: Le nombre de lignes lues, les erreurs (qui empêchent la
+    lecture du fichier) et les avertissements
+    :rtype: Tuple[int, List[str], List[str]]
+    """
+    codes_ages = {code for code, label in AGES} | {"0"}
+    erreurs, avertissements = [], []
+    inconnus = set()
+    # dernier jour lu et jours déjà lus pour chaque (région, classe d'âge)
+    derniers: Dict[Tuple[str, str], int] = {}
+    jours_lus: Dict[Tuple[str, str], Set[int]] = {}
+    desordre = set()
+    nb_lignes = 0
+    for numero, row in enumerate(rows, start=2): # la ligne 1 contient les headers
+        nb_lignes += 1
+        if len(row) != nb_colonnes:
+            erreurs.append(f"ligne {numero} : {len(row)} colonnes au lieu de {nb_colonnes}")
+            continue
+        try:
+            jour = parse_day(row[JOUR])
+        except ValueError:
+            erreurs.append(f"ligne {numero} : date {row[JOUR]!r} invalide")
+            continue
+        for col in range(nb_colonnes):
+            if col in (REG, AGE, JOUR):
+                continue
+            try:
+                to_float(row[col])
+            except ValueError:
+                erreurs.append(f"ligne {numero}, colonne {col + 1} : valeur {row[col]!r} invalide")
+                break
+
+        # les régions et classes d'âge inconnues sont lues, mais ne sont
+        # pas affichées dans les rapports
+        for code, connus, nom in ((row[REG], REGIONS, "région"), (row[AGE], codes_ages, "classe d'âge")):
+            if code not in connus and (nom, code) not in inconnus:
+                inconnus.add((nom, code))
+                avertissements.append(f"ligne {numero} : {nom} {code!r} inconnue")
+
+        cle = (row[REG], row[AGE])
+        jours = jours_lus.setdefault(cle, set())
+        if jour in jours:
+            erreurs.append(
+                f"ligne {numero} : le {day_to_datetime(jour):%Y-%m-%d} est présent plusieurs fois "
+                f"pour la région {cle[0]} et la classe d'âge {cle[1]}"
+            )
+            continue
+        jours.add(jour)
+        dernier = derniers.get(cle)
+        if dernier is not None and jour < dernier:
+            # un seul avertissement par région et classe d'âge
+            if cle not in desordre:
+                desordre.add(cle)
+                avertissements.append(
+                    f"ligne {numero} : le {day_to_datetime(jour):%Y-%m-%d} est avant le "
+                    f"{day_to_datetime(dernier):%Y-%m-%d} pour la région {cle[0]} et la classe d'âge {cle[1]}"
+                )
+        else:
+            derniers[cle] = jour
+    return nb_lignes, erreurs, avertissements
+
+def validate_file(chemin: str) -> Tuple[int, List[str], List[str]]:
+    """Vérifie un fichier csv (voir validate_rows)
+
+    :param chemin: L'emplacement du fichier
+    :type chemin: str
+    :return: Le nombre de lignes lues, les erreurs et les avertissements
+    :rtype: Tuple[int, List[str], List[str]]
+    """
+    with open(chemin, encoding="utf-8", newline="") as file:
+        reader = csv.reader(file, delimiter=";")
+        headers = next(reader, None)
+        if headers is None:
+            return 0, ["le fichier est vide"], []
+        nb_lignes, erreurs, avertissements = validate_rows(reader)
+        if len(headers) != NB_COLONNES:
+            erreurs.insert(0, f"ligne 1 : {len(headers)} colonnes au lieu de {NB_COLONNES}")
+        return nb_lignes, erreurs, avertissements
+
+def run_validate_command(arguments: argparse.Namespace):
+    """Exécute la commande validate avec les arguments de la ligne de
+    commande. Le programme s'arrête avec le code 1 si le fichier contient
+    des erreurs.
+
+    :param arguments: Les arguments lus par main.parse_arguments
+    :type arguments: argparse.Namespace
+    """
+    from batch import find_file
+    from main import COLORS
+
+    chemin = arguments.file if arguments.file is not None else find_file()
+    print(f"Vérification du fichier {chemin}...", end=" ", flush=True)
+    nb_lignes, erreurs, avertissements = validate_file(chemin)
+    print(f"{nb_lignes} lignes lues")
+    for avertissement in avertissements[:MAX_ERREURS]:
+        print(f"{COLORS['fg']['orange']}{avertissement}{COLORS['reset']}")
+    for erreur in erreurs[:MAX_ERREURS]:
+        print(f"{COLORS['fg']['red']}{erreur}{COLORS['reset']}")
+    if len(erreurs) > MAX_ERREURS:
+        print(f"{COLORS['fg']['red']}... et {len(erreurs) - MAX_ERREURS} autres erreurs{COLORS['reset']}")
+    if erreurs:
+        raise SystemExit(1)
+    print(f"{COLORS['fg']['green']}Le fichier est valide{COLORS['reset']}")